@@ -23,6 +23,7 @@ datastore.
 """
 
 import base64
+import collections
 import time
 
 from oslo.config import cfg
@@ -1052,12 +1053,18 @@ class CloudController(object):
         return {'instancesSet': instances_set}
 
     def _format_instance_bdm(self, context, instance_uuid, root_device_name,
-                             result):
-        """Format InstanceBlockDeviceMappingResponseItemType."""
+                             result, bdms=None, volumes=None):
+        """Format InstanceBlockDeviceMappingResponseItemType.
+
+        bdms are the block device mappings of the instance, and volumes
+        its volumes by id, when they were already looked up.
+        """
         root_device_type = 'instance-store'
         mapping = []
-        for bdm in db.block_device_mapping_get_all_by_instance(context,
-                                                               instance_uuid):
+        if bdms is None:
+            bdms = db.block_device_mapping_get_all_by_instance(context,
+                                                               instance_uuid)
+        for bdm in bdms:
             volume_id = bdm['volume_id']
             if (volume_id is None or bdm['no_device']):
                 continue
@@ -1067,7 +1074,9 @@ class CloudController(object):
                 assert not bdm['virtual_name']
                 root_device_type = 'ebs'
 
-            vol = self.volume_api.get(context, volume_id)
+            vol = (volumes or {}).get(volume_id)
+            if vol is None:
+                vol = self.volume_api.get(context, volume_id)
             LOG.debug(_("vol = %s\n"), vol)
             # TODO(yamahata): volume attach time
             ebs = {'volumeId': ec2utils.id_to_ec2_vol_id(volume_id),
@@ -1101,6 +1110,32 @@ class CloudController(object):
         result['groupSet'] = utils.convert_to_list_dict(
             security_group_names, 'groupId')
 
+    def _get_volumes(self, context, volume_ids):
+        """Return the volumes of volume_ids by id, listing the volumes of
+        the project once rather than getting them one at a time when there
+        are several.  Volumes missing from the list are left out.
+        """
+        volume_ids = set(volume_ids)
+        if len(volume_ids) < 2:
+            return {}
+        return dict((volume['id'], volume)
+                    for volume in self.volume_api.get_all(context)
+                    if volume['id'] in volume_ids)
+
+    def _get_instance_metadata(self, context, instance):
+        """Return the metadata of an instance, from the instance when it
+        was read with it.
+        """
+        metadata = instance.get('metadata')
+        if metadata is None:
+            return self.compute_api.get_instance_metadata(context, instance)
+        # The metadata is not read through compute_api, so check its
+        # policy here.
+        compute_api.check_policy(context, 'get_instance_metadata', instance)
+        if isinstance(metadata, dict):
+            return metadata
+        return utils.metadata_to_dict(metadata)
+
     def _format_instances(self, context, instance_id=None, use_v6=False,
             instances_cache=None, **search_opts):
         # TODO(termie): this method is poorly named as its name does not imply
@@ -1136,13 +1171,31 @@ class CloudController(object):
             except exception.NotFound:
                 instances = []
 
+        if not context.is_admin:
+            instances = [instance for instance in instances
+                         if not pipelib.is_vpn_image(instance['image_ref'])]
+
+        # NOTE: The ec2 ids, block device mappings, volumes and
+        #       availability zones of the instances are looked up for all
+        #       of them at once rather than for each one.
+        instance_uuids = [instance['uuid'] for instance in instances]
+        ec2_ids = ec2utils.ids_to_ec2_inst_ids(instance_uuids)
+        bdms = collections.defaultdict(list)
+        for bdm in db.block_device_mapping_get_all_by_instances(
+                context, instance_uuids):
+            bdms[bdm['instance_uuid']].append(bdm)
+        volumes = self._get_volumes(context,
+                                    [bdm['volume_id']
+                                     for instance_bdms in bdms.values()
+                                     for bdm in instance_bdms
+                                     if bdm['volume_id'] is not None and
+                                     not bdm['no_device']])
+        zones = {}
+
         for instance in instances:
-            if not context.is_admin:
-                if pipelib.is_vpn_image(instance['image_ref']):
-                    continue
             i = {}
             instance_uuid = instance['uuid']
-            ec2_id = ec2utils.id_to_ec2_inst_id(instance_uuid)
+            ec2_id = ec2_ids[instance_uuid]
             i['instanceId'] = ec2_id
             image_uuid = instance['image_ref']
             i['imageId'] = ec2utils.glance_id_to_ec2_id(context, image_uuid)
@@ -1170,8 +1223,8 @@ class CloudController(object):
             i['dnsName'] = i['publicDnsName'] or i['privateDnsName']
             i['keyName'] = instance['key_name']
             i['tagSet'] = []
-            for k, v in self.compute_api.get_instance_metadata(
-                    context, instance).iteritems():
+            for k, v in self._get_instance_metadata(context,
+                                                    instance).iteritems():
                 i['tagSet'].append({'key': k, 'value': v})
 
             if context.is_admin:
@@ -1185,10 +1238,13 @@ class CloudController(object):
             i['amiLaunchIndex'] = instance['launch_index']
             self._format_instance_root_device_name(instance, i)
             self._format_instance_bdm(context, instance['uuid'],
-                                      i['rootDeviceName'], i)
+                                      i['rootDeviceName'], i,
+                                      bdms=bdms[instance_uuid],
+                                      volumes=volumes)
             host = instance['host']
-            zone = ec2utils.get_availability_zone_by_host(host)
-            i['placement'] = {'availabilityZone': zone}
+            if host not in zones:
+                zones[host] = ec2utils.get_availability_zone_by_host(host)
+            i['placement'] = {'availabilityZone': zones[host]}
             if instance['reservation_id'] not in reservations:
                 r = {}
                 r['reservationId'] = instance['reservation_id']
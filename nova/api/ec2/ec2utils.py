@@ -23,9 +23,9 @@ from nova import availability_zones
 from nova import context
 from nova import db
 from nova import exception
+from nova import memorycache
 from nova.network import model as network_model
 from nova.openstack.common import log as logging
-from nova.openstack.common import memorycache
 from nova.openstack.common import timeutils
 from nova.openstack.common import uuidutils
 
@@ -35,18 +35,26 @@ _CACHE_TIME = 7 * 24 * 60 * 60
 _CACHE = None
 
 
+def _get_cache():
+    global _CACHE
+    if not _CACHE:
+        _CACHE = memorycache.get_client()
+    return _CACHE
+
+
+def _memoize_key(func_name, reqid):
+    return str("%s:%s" % (func_name, reqid))
+
+
 def memoize(func):
     @functools.wraps(func)
     def memoizer(context, reqid):
-        global _CACHE
-        if not _CACHE:
-            _CACHE = memorycache.get_client()
-        key = "%s:%s" % (func.__name__, reqid)
-        key = str(key)
-        value = _CACHE.get(key)
+        cache = _get_cache()
+        key = _memoize_key(func.__name__, reqid)
+        value = cache.get(key)
         if value is None:
             value = func(context, reqid)
-            _CACHE.set(key, value, time=_CACHE_TIME)
+            cache.set(key, value, time=_CACHE_TIME)
         return value
     return memoizer
 
@@ -185,6 +193,16 @@ def id_to_ec2_inst_id(instance_id):
         return id_to_ec2_id(instance_id)
 
 
+def ids_to_ec2_inst_ids(instance_uuids):
+    """Get or create the ec2 instance IDs of many uuids at once, returned
+    by uuid.
+    """
+    ctxt = context.get_admin_context()
+    int_ids = get_int_ids_from_instance_uuids(ctxt, instance_uuids)
+    return dict((instance_uuid, id_to_ec2_id(int_id))
+                for instance_uuid, int_id in int_ids.iteritems())
+
+
 def ec2_inst_id_to_uuid(context, ec2_id):
     """"Convert an instance id to uuid."""
     int_id = ec2_id_to_id(ec2_id)
@@ -278,6 +296,33 @@ def get_int_id_from_instance_uuid(context, instance_uuid):
         return db.ec2_instance_create(context, instance_uuid)['id']
 
 
+def get_int_ids_from_instance_uuids(context, instance_uuids):
+    """Like get_int_id_from_instance_uuid() for many uuids, looking the
+    ones which are not cached up at once.
+    """
+    cache = _get_cache()
+    int_ids = {}
+    missing = []
+    for instance_uuid in set(instance_uuids):
+        int_id = cache.get(_memoize_key('get_int_id_from_instance_uuid',
+                                        instance_uuid))
+        if int_id is None:
+            missing.append(instance_uuid)
+        else:
+            int_ids[instance_uuid] = int_id
+    if missing:
+        found = db.get_ec2_instance_ids_by_uuids(context, missing)
+        for instance_uuid in missing:
+            int_id = found.get(instance_uuid)
+            if int_id is None:
+                int_id = db.ec2_instance_create(context, instance_uuid)['id']
+            cache.set(_memoize_key('get_int_id_from_instance_uuid',
+                                   instance_uuid),
+                      int_id, time=_CACHE_TIME)
+            int_ids[instance_uuid] = int_id
+    return int_ids
+
+
 @memoize
 def get_int_id_from_volume_uuid(context, volume_uuid):
     if volume_uuid is None:
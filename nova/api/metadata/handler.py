@@ -26,10 +26,12 @@ import webob.dec
 import webob.exc
 
 from nova.api.metadata import base
+from nova.api.metadata import store
 from nova import conductor
 from nova import exception
+from nova import memorycache
 from nova.openstack.common import log as logging
-from nova.openstack.common import memorycache
+from nova.openstack.common import loopingcall
 from nova import wsgi
 
 CACHE_EXPIRATION = 15  # in seconds
@@ -49,7 +51,23 @@ metadata_proxy_opts = [
          help='Shared secret to validate proxies Quantum metadata requests')
 ]
 
+metadata_store_opts = [
+    cfg.ListOpt('metadata_prebuild_hosts',
+                default=[],
+                help='Hosts whose instances have their metadata built '
+                     'ahead of the requests for it, such as the host of the '
+                     'metadata service in multi_host deployments. Other '
+                     'instances have their metadata built on request'),
+    cfg.IntOpt('metadata_prebuild_interval',
+               default=60,
+               help='Number of seconds between two rebuilds of the metadata '
+                    'of the instances of metadata_prebuild_hosts. Prebuilt '
+                    'metadata is served for at most this long plus 15 '
+                    'seconds'),
+]
+
 CONF.register_opts(metadata_proxy_opts)
+CONF.register_opts(metadata_store_opts)
 
 LOG = logging.getLogger(__name__)
 
@@ -60,11 +78,35 @@ class MetadataRequestHandler(wsgi.Application):
     def __init__(self):
         self._cache = memorycache.get_client()
         self.conductor_api = conductor.API()
+        self._store = None
+        if CONF.metadata_prebuild_hosts:
+            self._store = store.MetadataStore(
+                    self.conductor_api,
+                    CONF.metadata_prebuild_interval + CACHE_EXPIRATION)
+            self._store_refresher = loopingcall.FixedIntervalLoopingCall(
+                    self._refresh_store)
+            self._store_refresher.start(CONF.metadata_prebuild_interval)
+
+    def _refresh_store(self):
+        for host in CONF.metadata_prebuild_hosts:
+            try:
+                count = self._store.refresh_host(host)
+            except Exception:
+                LOG.exception(_('Failed to build the metadata of the '
+                                'instances of host %s'), host)
+                continue
+            LOG.debug(_('Built the metadata of %(count)d instance(s) of '
+                        'host %(host)s'), {'count': count, 'host': host})
 
     def get_metadata_by_remote_address(self, address):
         if not address:
             raise exception.FixedIpNotFoundForAddress(address=address)
 
+        if self._store is not None:
+            data = self._store.get_by_address(address)
+            if data:
+                return data
+
         cache_key = 'metadata-%s' % address
         data = self._cache.get(cache_key)
         if data:
@@ -80,6 +122,11 @@ class MetadataRequestHandler(wsgi.Application):
         return data
 
     def get_metadata_by_instance_id(self, instance_id, address):
+        if self._store is not None:
+            data = self._store.get_by_instance_id(instance_id, address)
+            if data:
+                return data
+
         cache_key = 'metadata-%s' % instance_id
         data = self._cache.get(cache_key)
         if data:
@@ -0,0 +1,117 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Metadata documents built ahead of the requests for them."""
+
+from nova.api.metadata import base
+from nova import context
+from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
+
+LOG = logging.getLogger(__name__)
+
+
+class MetadataStore(object):
+    """InstanceMetadata of the instances of some hosts, kept in memory.
+
+    Documents are indexed by instance uuid and by the fixed address they
+    were built for, and are served for up to ttl seconds after they were
+    built.  refresh_host() rebuilds the documents of all the instances of
+    a host at once.
+    """
+
+    def __init__(self, conductor_api, ttl):
+        self.conductor_api = conductor_api
+        self.ttl = ttl
+        # uuid -> (expires, host, InstanceMetadata)
+        self._documents = {}
+        # fixed address -> uuid
+        self._addresses = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def get_by_address(self, address):
+        """Return the InstanceMetadata built for a fixed address, or
+        None.
+        """
+        instance_id = self._addresses.get(address)
+        if instance_id is None:
+            return None
+        return self.get_by_instance_id(instance_id, address)
+
+    def get_by_instance_id(self, instance_id, address):
+        """Return the InstanceMetadata of an instance, or None if there is
+        none or it was built for another address.
+        """
+        entry = self._documents.get(instance_id)
+        if entry is None:
+            return None
+        expires, _host, meta_data = entry
+        if expires <= timeutils.utcnow_ts():
+            self.remove(instance_id)
+            return None
+        if meta_data.address != address:
+            return None
+        return meta_data
+
+    def add(self, meta_data, host=None):
+        """Store an InstanceMetadata, replacing the one of the same
+        instance.
+        """
+        self.remove(meta_data.uuid)
+        expires = timeutils.utcnow_ts() + self.ttl
+        self._documents[meta_data.uuid] = (expires, host, meta_data)
+        if meta_data.address:
+            self._addresses[meta_data.address] = meta_data.uuid
+
+    def remove(self, instance_id):
+        """Drop the InstanceMetadata of an instance, if there is one."""
+        entry = self._documents.pop(instance_id, None)
+        if entry is None:
+            return
+        address = entry[2].address
+        if self._addresses.get(address) == instance_id:
+            del self._addresses[address]
+
+    def refresh_host(self, host):
+        """Rebuild the documents of all the instances of a host.
+
+        Returns the number of documents built.
+        """
+        ctxt = context.get_admin_context()
+        instances = self.conductor_api.instance_get_all_by_host(ctxt, host)
+        built = set()
+        for instance in instances:
+            try:
+                meta_data = base.InstanceMetadata(
+                        instance, conductor_api=self.conductor_api)
+                # NOTE: like a request from the instance would, use its
+                # first fixed IPv4 address as the address of the document.
+                fixed_ips = meta_data.ip_info['fixed_ips']
+                meta_data.address = fixed_ips[0] if fixed_ips else None
+            except Exception:
+                LOG.exception(_('Failed to build metadata for instance %s'),
+                              instance['uuid'])
+                continue
+            self.add(meta_data, host)
+            built.add(meta_data.uuid)
+        # Forget the instances that are gone from the host.
+        for instance_id, entry in self._documents.items():
+            if entry[1] == host and instance_id not in built:
+                self.remove(instance_id)
+        return len(built)
@@ -553,9 +553,8 @@ class Controller(wsgi.Controller):
         limit, marker = common.get_limit_and_marker(req)
         try:
             instance_list = self.compute_api.get_all(context,
-                                                     search_opts=search_opts,
-                                                     limit=limit,
-                                                     marker=marker)
+                    search_opts=search_opts, limit=limit, marker=marker,
+                    columns_to_join=self._get_columns_to_join(is_detail))
         except exception.MarkerNotFound as e:
             msg = _('marker [%s] not found') % marker
             raise exc.HTTPBadRequest(explanation=msg)
@@ -572,6 +571,20 @@ class Controller(wsgi.Controller):
         req.cache_db_instances(instance_list)
         return response
 
+    def _get_columns_to_join(self, is_detail):
+        """Return the joined fields of the instances read by the list or
+        detail views of servers and by the extensions loaded.
+        """
+        columns_to_join = []
+        if is_detail:
+            # addresses, metadata and flavor
+            columns_to_join += ['info_cache', 'metadata', 'system_metadata']
+            if self.ext_mgr.is_loaded('os-security-groups'):
+                columns_to_join.append('security_groups')
+        elif self.ext_mgr.is_loaded('rax-si-image-schedule'):
+            columns_to_join.append('system_metadata')
+        return columns_to_join
+
     def _get_server(self, context, req, instance_uuid):
         """Utility function for looking up an instance by uuid."""
         try:
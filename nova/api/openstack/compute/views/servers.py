@@ -18,14 +18,28 @@
 
 import hashlib
 
+from oslo.config import cfg
+
 from nova.api.openstack import common
 from nova.api.openstack.compute.views import addresses as views_addresses
 from nova.api.openstack.compute.views import flavors as views_flavors
 from nova.api.openstack.compute.views import images as views_images
 from nova.compute import flavors
+from nova import db
 from nova.openstack.common import log as logging
 from nova.openstack.common import timeutils
 
+servers_view_opts = [
+    cfg.BoolOpt('osapi_servers_keyset_markers',
+                default=False,
+                help='Put an opaque marker holding the sort keys of the last '
+                     'server in the next links of server lists, instead of '
+                     'its id, so that the next page is listed without '
+                     'looking the marker server up'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(servers_view_opts)
 
 LOG = logging.getLogger(__name__)
 
@@ -140,6 +154,23 @@ class ViewBuilder(common.ViewBuilder):
 
         return servers_dict
 
+    def _get_collection_links(self, request, items, collection_name,
+                              id_key="uuid"):
+        if (not CONF.osapi_servers_keyset_markers or
+                (items and items[-1].get("_is_precooked"))):
+            return super(ViewBuilder, self)._get_collection_links(
+                    request, items, collection_name, id_key=id_key)
+        links = []
+        limit = int(request.params.get("limit", 0))
+        if limit and limit == len(items):
+            marker = db.instance_pagination_marker(items[-1])
+            links.append({
+                "rel": "next",
+                "href": self._get_next_link(request, marker,
+                                            collection_name),
+            })
+        return links
+
     @staticmethod
     def _get_metadata(instance):
         metadata = instance.get("metadata", [])
@@ -18,7 +18,7 @@
 from oslo.config import cfg
 
 from nova import db
-from nova.openstack.common import memorycache
+from nova import memorycache
 
 # NOTE(vish): azs don't change that often, so cache them for an hour to
 #             avoid hitting the db multiple times on every request.
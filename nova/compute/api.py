@@ -1366,7 +1366,8 @@ class API(base.Base):
         return inst
 
     def get_all(self, context, search_opts=None, sort_key='created_at',
-                sort_dir='desc', limit=None, marker=None):
+                sort_dir='desc', limit=None, marker=None,
+                columns_to_join=None):
         """Get all instances filtered by one of the given parameters.
 
         If there is no filter and the context is an admin, it will retrieve
@@ -1378,6 +1379,10 @@ class API(base.Base):
         The results will be returned sorted in the order specified by the
         'sort_dir' parameter using the key specified in the 'sort_key'
         parameter.
+
+        columns_to_join lists the joined fields of the instances to fetch,
+        among info_cache, security_groups, metadata and system_metadata.
+        All of them are fetched when it is None.
         """
 
         #TODO(bcwaldon): determine the best argument for target here
@@ -1444,13 +1449,16 @@ class API(base.Base):
                         return []
 
         inst_models = self._get_instances_by_filters(context, filters,
-                                                     sort_key, sort_dir,
-                                                     limit=limit,
-                                                     marker=marker)
+                sort_key, sort_dir, limit=limit, marker=marker,
+                columns_to_join=columns_to_join)
 
         # Convert the models to dictionaries
         instances = []
         for inst_model in inst_models:
+            if isinstance(inst_model, dict):
+                # NOTE: the db api already returns new dicts.
+                instances.append(inst_model)
+                continue
             instance = dict(inst_model.iteritems())
             # NOTE(comstud): Doesn't get returned by iteritems
             instance['name'] = inst_model['name']
@@ -1461,7 +1469,8 @@ class API(base.Base):
     def _get_instances_by_filters(self, context, filters,
                                   sort_key, sort_dir,
                                   limit=None,
-                                  marker=None):
+                                  marker=None,
+                                  columns_to_join=None):
         if 'ip6' in filters or 'ip' in filters:
             res = self.network_api.get_instance_uuids_by_ip_filter(context,
                                                                    filters)
@@ -1471,8 +1480,9 @@ class API(base.Base):
             filters['uuid'] = uuids
 
         return self.db.instance_get_all_by_filters(context, filters,
-                                                   sort_key, sort_dir,
-                                                   limit=limit, marker=marker)
+                                    sort_key, sort_dir, limit=limit,
+                                    marker=marker,
+                                    columns_to_join=columns_to_join)
 
     @wrap_check_policy
     @check_instance_state(vm_state=[vm_states.ACTIVE, vm_states.STOPPED])
@@ -3209,47 +3219,36 @@ class SecurityGroupAPI(base.Base, security_group_base.SecurityGroupBase):
         """Called when a rule is added to or removed from a security_group."""
 
         security_group = self.db.security_group_get(context, id)
-
-        for instance in security_group['instances']:
-            if instance['host'] is not None:
-                self.security_group_rpcapi.refresh_instance_security_rules(
-                        context, instance['host'], instance)
+        self._refresh_instances_security_rules(context,
+                                               security_group['instances'])
 
     def trigger_members_refresh(self, context, group_ids):
         """Called when a security group gains a new or loses a member.
 
-        Sends an update request to each compute node for each instance for
+        Sends an update request to each compute node for the instances for
         which this is relevant.
         """
-        # First, we get the security group rules that reference these groups as
-        # the grantee..
-        security_group_rules = set()
-        for group_id in group_ids:
-            security_group_rules.update(
-                self.db.security_group_rule_get_by_security_group_grantee(
-                                                                     context,
-                                                                     group_id))
-
-        # ..then we distill the rules into the groups to which they belong..
-        security_groups = set()
-        for rule in security_group_rules:
-            security_group = self.db.security_group_get(
-                                                    context,
-                                                    rule['parent_group_id'])
-            security_groups.add(security_group)
-
-        # ..then we find the instances that are members of these groups..
-        instances = {}
-        for security_group in security_groups:
-            for instance in security_group['instances']:
-                if instance['uuid'] not in instances:
-                    instances[instance['uuid']] = instance
-
-        # ..then we send a request to refresh the rules for each instance.
-        for instance in instances.values():
-            if instance['host']:
-                self.security_group_rpcapi.refresh_instance_security_rules(
-                        context, instance['host'], instance)
+        # The instances which are members of the groups with rules that
+        # reference these groups as the grantee.
+        instances = self.db.instance_get_all_by_grantee_security_groups(
+                context, group_ids)
+        self._refresh_instances_security_rules(context, instances)
+
+    def _refresh_instances_security_rules(self, context, instances):
+        """Send one request to refresh the rules of its instances to each
+        compute node running some of the instances.
+        """
+        instances_by_host = {}
+        for instance in instances:
+            if not instance['host']:
+                continue
+            host_instances = instances_by_host.setdefault(instance['host'],
+                                                          {})
+            host_instances.setdefault(instance['uuid'], instance)
+
+        for host, host_instances in instances_by_host.iteritems():
+            self.security_group_rpcapi.refresh_instances_security_rules(
+                    context, host, host_instances.values())
 
     def get_instance_security_groups(self, context, instance_id,
                                      instance_uuid=None, detailed=False):
@@ -124,6 +124,10 @@ interval_opts = [
                default=60,
                help="Number of seconds between instance info_cache self "
                         "healing updates"),
+    cfg.IntOpt("heal_instance_info_cache_batch_size",
+               default=20,
+               help="Number of instances whose info_cache is healed at "
+                    "each info_cache self healing update"),
     cfg.IntOpt('host_state_interval',
                default=120,
                help='Interval in seconds for querying the host status'),
@@ -373,7 +377,7 @@ class ComputeVirtAPI(virtapi.VirtAPI):
 class ComputeManager(manager.SchedulerDependentManager):
     """Manages the running instances from creation to destruction."""
 
-    RPC_API_VERSION = '2.29'
+    RPC_API_VERSION = '2.30'
 
     def __init__(self, compute_driver=None, *args, **kwargs):
         """Load configuration options and connect to the hypervisor."""
@@ -744,6 +748,42 @@ class ComputeManager(manager.SchedulerDependentManager):
         Synchronise the call beacuse we may still be in the middle of
         creating the instance.
         """
+        return self._refresh_instance_security_rules(instance)
+
+    @exception.wrap_exception(notifier=notifier, publisher_id=publisher_id())
+    def refresh_instances_security_rules(self, context, instances):
+        """Tell the virtualization driver to refresh security rules for
+        several instances, applying the resulting firewall rules once.
+
+        Firewall changes of the whole host are held back while the apply
+        is deferred, so the instances whose lock is taken, e.g. by a build
+        in progress, are refreshed one at a time once it is applied.
+        """
+        busy = []
+        self.driver.filter_defer_apply_on()
+        try:
+            for instance in instances:
+                # NOTE: nothing yields between this check and taking the
+                # lock in _refresh_instance_security_rules.
+                if utils.synchronized_held(instance['uuid']):
+                    busy.append(instance)
+                    continue
+                self._refresh_instance_security_rules_safe(instance)
+        finally:
+            self.driver.filter_defer_apply_off()
+        for instance in busy:
+            self._refresh_instance_security_rules_safe(instance)
+
+    def _refresh_instance_security_rules_safe(self, instance):
+        try:
+            self._refresh_instance_security_rules(instance)
+        except Exception:
+            LOG.exception(_('Failed to refresh security rules'),
+                          instance=instance)
+
+    def _refresh_instance_security_rules(self, instance):
+        # Synchronised because we may still be in the middle of creating
+        # the instance.
         @utils.synchronized(instance['uuid'])
         def _sync_refresh():
             return self.driver.refresh_instance_security_rules(instance)
@@ -3631,14 +3671,17 @@ class ComputeManager(manager.SchedulerDependentManager):
     @periodic_task.periodic_task
     def _heal_instance_info_cache(self, context):
         """Called periodically.  On every call, try to update the
-        info_cache's network information for another instance by
-        calling to the network manager.
+        info_cache's network information for another batch of instances
+        by calling to the network manager.
 
         This is implemented by keeping a cache of uuids of instances
-        that live on this host.  On each call, we pop one off of a
-        list, pull the DB record, and try the call to the network API.
-        If anything errors, we don't care.  It's possible the instance
-        has been deleted, etc.
+        that live on this host.  On each call, we pop up to
+        heal_instance_info_cache_batch_size of them off of a list, pull
+        the DB records of those still on this host, and make one call to
+        the network API for all of them, which updates their info_caches
+        at once.  If that call is not available or fails, the instances
+        are updated one at a time instead.  Failures are only logged; it's
+        possible the instances have been deleted, etc.
         """
         heal_interval = CONF.heal_instance_info_cache_interval
         if not heal_interval:
@@ -3649,37 +3692,59 @@ class ComputeManager(manager.SchedulerDependentManager):
         self._last_info_cache_heal = curr_time
 
         instance_uuids = getattr(self, '_instance_uuids_to_heal', None)
-        instance = None
+        if not instance_uuids:
+            # No more in our copy of uuids.  Pull from the DB.
+            db_instances = self.conductor_api.instance_get_all_by_host(
+                    context, self.host, columns_to_join=[])
+            instance_uuids = [inst['uuid'] for inst in db_instances]
+            self._instance_uuids_to_heal = instance_uuids
+            if not instance_uuids:
+                # None.. just return.
+                return
 
-        while not instance or instance['host'] != self.host:
-            if instance_uuids:
-                try:
-                    instance = self.conductor_api.instance_get_by_uuid(context,
-                        instance_uuids.pop(0))
-                except exception.InstanceNotFound:
-                    # Instance is gone.  Try to grab another.
-                    continue
-            else:
-                # No more in our copy of uuids.  Pull from the DB.
-                db_instances = self.conductor_api.instance_get_all_by_host(
-                        context, self.host, columns_to_join=[])
-                if not db_instances:
-                    # None.. just return.
-                    return
-                instance = db_instances.pop(0)
-                instance_uuids = [inst['uuid'] for inst in db_instances]
-                self._instance_uuids_to_heal = instance_uuids
+        batch_size = max(1, CONF.heal_instance_info_cache_batch_size)
+        batch = instance_uuids[:batch_size]
+        del instance_uuids[:batch_size]
+
+        # Instances that are gone or moved to another host are skipped.
+        filters = {'uuid': batch, 'deleted': False}
+        instances = [instance for instance in
+                     self.conductor_api.instance_get_all_by_filters(
+                         context, filters,
+                         columns_to_join=['system_metadata'])
+                     if instance['host'] == self.host]
+        if not instances:
+            return
 
-        # We have an instance now and it's ours
-        try:
-            # Call to network API to get instance info.. this will
-            # force an update to the instance's info_cache
-            self._get_instance_nw_info(context, instance)
-            LOG.debug(_('Updated the info_cache for instance'),
-                      instance=instance)
-        except Exception:
-            # We don't care about any failures
-            pass
+        # Network APIs without the bulk call, like the deprecated one, and
+        # network managers too old for it heal one instance at a time.
+        get_instances_nw_info = getattr(self.network_api,
+                                        'get_instances_nw_info', None)
+        if get_instances_nw_info is not None:
+            try:
+                # Call to network API to get the instances' info.. this
+                # will force an update to their info_caches
+                nw_infos = get_instances_nw_info(
+                        context, instances, conductor_api=self.conductor_api)
+                LOG.debug(_('Updated the info_cache for %(updated)d of '
+                            '%(count)d instances'),
+                          {'updated': len(nw_infos),
+                           'count': len(instances)})
+                return
+            except Exception:
+                LOG.exception(_('Failed to update the info_cache of '
+                                '%d instances at once, updating them one '
+                                'at a time'), len(instances))
+
+        for instance in instances:
+            try:
+                self._get_instance_nw_info(context, instance)
+                LOG.debug(_('Updated the info_cache for instance'),
+                          instance=instance)
+            except Exception:
+                # The instance may have been deleted meanwhile.
+                LOG.warn(_('Failed to update the info_cache of the '
+                           'instance'), instance=instance, exc_info=True)
 
     @periodic_task.periodic_task
     def _poll_rebooting_instances(self, context):
@@ -3981,11 +4046,11 @@ class ComputeManager(manager.SchedulerDependentManager):
     def _sync_power_states(self, context):
         """Align power states between the database and the hypervisor.
 
-        To sync power state data we make a DB call to get the number of
-        virtual machines known by the hypervisor and if the number matches the
-        number of virtual machines known by the database, we proceed in a lazy
-        loop, one database record at a time, checking if the hypervisor has the
-        same power state as is in the database.
+        To sync power state data we make a DB call to get the instances of
+        the host, ask the hypervisor for the power states of all of them at
+        once, and make a single DB call to save the power states that
+        changed.  The vm_state of each instance is then checked against
+        its power state.
         """
         db_instances = self.conductor_api.instance_get_all_by_host(
             context, self.host, columns_to_join=[])
@@ -3997,22 +4062,26 @@ class ComputeManager(manager.SchedulerDependentManager):
             LOG.warn(_("Found %(num_db_instances)s in the database and "
                        "%(num_vm_instances)s on the hypervisor.") % locals())
 
+        instances = []
         for db_instance in db_instances:
             if db_instance['task_state'] is not None:
                 LOG.info(_("During sync_power_state the instance has a "
                            "pending task. Skip."), instance=db_instance)
                 continue
-            # No pending tasks. Now try to figure out the real vm_power_state.
-            try:
-                vm_instance = self.driver.get_info(db_instance)
-                vm_power_state = vm_instance['state']
-            except exception.InstanceNotFound:
-                vm_power_state = power_state.NOSTATE
-            # Note(maoy): the above get_info call might take a long time,
-            # for example, because of a broken libvirt driver.
-            self._sync_instance_power_state(context,
-                                            db_instance,
-                                            vm_power_state)
+            instances.append(db_instance)
+        if not instances:
+            return
+
+        # Note(maoy): the call below might take a long time, for example,
+        # because of a broken libvirt driver.
+        vm_power_states = self.driver.get_power_states(instances)
+        # NOTE: the instances that moved to another host or got a task
+        # since they were read are left out.
+        synced_instances = self.conductor_api.instance_sync_power_states(
+            context, self.host, vm_power_states)
+        for db_instance in synced_instances:
+            self._sync_instance_vm_state(context, db_instance,
+                                         vm_power_states[db_instance['uuid']])
 
     def _sync_instance_power_state(self, context, db_instance, vm_power_state):
         """Align instance power state between the database and hypervisor.
@@ -4026,7 +4095,6 @@ class ComputeManager(manager.SchedulerDependentManager):
                                                     db_instance['uuid'],
                                                     columns_to_join=[])
         db_power_state = u["power_state"]
-        vm_state = u['vm_state']
 
         if self.host != u['host']:
             # on the sending end of nova-compute _sync_power_state
@@ -4058,7 +4126,14 @@ class ComputeManager(manager.SchedulerDependentManager):
             self._instance_update(context,
                                   db_instance['uuid'],
                                   power_state=vm_power_state)
-            db_power_state = vm_power_state
+
+        self._sync_instance_vm_state(context, u, vm_power_state)
+
+    def _sync_instance_vm_state(self, context, db_instance, vm_power_state):
+        """Resolve the discrepancy between the vm_state of an instance and
+        its power state on the hypervisor.
+        """
+        vm_state = db_instance['vm_state']
 
         # Note(maoy): Now resolve the discrepancy between vm_state and
         # vm_power_state. We go through all possible vm_states.
@@ -167,6 +167,7 @@ class ComputeAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                soft_delete_instance()
         2.28 - Adds check_instance_shared_storage()
         2.29 - [rax] Adds create and delete_vifs_for_instance calls
+        2.30 - Adds refresh_instances_security_rules()
     '''
 
     #
@@ -661,6 +662,7 @@ class SecurityGroupAPI(nova.openstack.common.rpc.proxy.RpcProxy):
         1.41 - Adds refresh_instance_security_rules()
 
         2.0 - Remove 1.x backwards compat
+        2.30 - Adds refresh_instances_security_rules()
     '''
 
     #
@@ -695,3 +697,10 @@ class SecurityGroupAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                 instance=instance_p),
                 topic=_compute_topic(self.topic, ctxt, instance['host'],
                 instance))
+
+    def refresh_instances_security_rules(self, ctxt, host, instances):
+        instances_p = jsonutils.to_primitive(instances)
+        self.cast(ctxt, self.make_msg('refresh_instances_security_rules',
+                instances=instances_p),
+                topic=_compute_topic(self.topic, ctxt, host, None),
+                version='2.30')
@@ -33,6 +33,10 @@ conductor_opts = [
     cfg.StrOpt('manager',
                default='nova.conductor.manager.ConductorManager',
                help='full class name for the Manager for conductor'),
+    cfg.IntOpt('heartbeat_flush_interval',
+               default=5,
+               help='Seconds to coalesce the service heartbeats received '
+                    'for before writing them to the database at once'),
 ]
 conductor_group = cfg.OptGroup(name='conductor',
                                title='Conductor Options')
@@ -61,6 +65,14 @@ class LocalAPI(object):
         return self._manager.instance_update(context, instance_uuid,
                                              updates, 'compute')
 
+    def instance_sync_power_states(self, context, host, power_states):
+        """Set the power states found on the hypervisor of the instances
+        of a host that have no pending task, and return those instances.
+        """
+        return self._manager.instance_sync_power_states(context, host,
+                                                        power_states,
+                                                        'compute')
+
     def instance_get(self, context, instance_id):
         return self._manager.instance_get(context, instance_id)
 
@@ -106,6 +118,10 @@ class LocalAPI(object):
         return self._manager.instance_info_cache_update(context, instance,
                 values, update_cells=update_cells)
 
+    def instance_info_cache_update_many(self, context, network_infos):
+        return self._manager.instance_info_cache_update_many(context,
+                                                             network_infos)
+
     def instance_info_cache_delete(self, context, instance):
         return self._manager.instance_info_cache_delete(context, instance)
 
@@ -282,6 +298,9 @@ class LocalAPI(object):
     def service_update(self, context, service, values):
         return self._manager.service_update(context, service, values)
 
+    def service_heartbeat(self, context, service, timeout=None):
+        return self._manager.service_heartbeat(context, service['id'])
+
     def task_log_get(self, context, task_name, begin, end, host, state=None):
         return self._manager.task_log_get(context, task_name, begin, end,
                                           host, state)
@@ -389,6 +408,13 @@ class API(object):
         return self.conductor_rpcapi.instance_update(context, instance_uuid,
                                                      updates, 'conductor')
 
+    def instance_sync_power_states(self, context, host, power_states):
+        """Set the power states found on the hypervisor of the instances
+        of a host that have no pending task, and return those instances.
+        """
+        return self.conductor_rpcapi.instance_sync_power_states(
+                context, host, power_states, 'conductor')
+
     def instance_destroy(self, context, instance):
         return self.conductor_rpcapi.instance_destroy(context, instance)
 
@@ -433,6 +459,10 @@ class API(object):
         return self.conductor_rpcapi.instance_info_cache_update(context,
                 instance, values, update_cells=update_cells)
 
+    def instance_info_cache_update_many(self, context, network_infos):
+        return self.conductor_rpcapi.instance_info_cache_update_many(
+                context, network_infos)
+
     def instance_info_cache_delete(self, context, instance):
         return self.conductor_rpcapi.instance_info_cache_delete(context,
                                                                 instance)
@@ -621,6 +651,10 @@ class API(object):
     def service_update(self, context, service, values):
         return self.conductor_rpcapi.service_update(context, service, values)
 
+    def service_heartbeat(self, context, service, timeout=None):
+        return self.conductor_rpcapi.service_heartbeat(context, service,
+                                                       timeout=timeout)
+
     def task_log_get(self, context, task_name, begin, end, host, state=None):
         return self.conductor_rpcapi.task_log_get(context, task_name, begin,
                                                   end, host, state)
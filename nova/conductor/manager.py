@@ -14,6 +14,10 @@
 
 """Handles database requests from other nova services."""
 
+import time
+
+from oslo.config import cfg
+
 from nova.api.ec2 import ec2utils
 from nova.compute import api as compute_api
 from nova.compute import utils as compute_utils
@@ -24,10 +28,13 @@ from nova.network.security_group import openstack_driver
 from nova import notifications
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
+from nova.openstack.common import periodic_task
 from nova.openstack.common.rpc import common as rpc_common
 from nova.openstack.common import timeutils
 from nova import quota
 
+CONF = cfg.CONF
+
 LOG = logging.getLogger(__name__)
 
 # Instead of having a huge list of arguments to instance_update(), we just
@@ -49,7 +56,7 @@ datetime_fields = ['launched_at', 'terminated_at', 'updated_at']
 class ConductorManager(manager.Manager):
     """Mission: TBD."""
 
-    RPC_API_VERSION = '1.49'
+    RPC_API_VERSION = '1.52'
 
     def __init__(self, *args, **kwargs):
         super(ConductorManager, self).__init__(service_name='conductor',
@@ -58,6 +65,8 @@ class ConductorManager(manager.Manager):
             openstack_driver.get_openstack_security_group_driver())
         self._network_api = None
         self._compute_api = None
+        self._service_heartbeats = set()
+        self._last_heartbeat_flush = 0
         self.quotas = quota.QUOTAS
 
     @property
@@ -99,6 +108,17 @@ class ConductorManager(manager.Manager):
         notifications.send_update(context, old_ref, instance_ref, service)
         return jsonutils.to_primitive(instance_ref)
 
+    def instance_sync_power_states(self, context, host, power_states,
+                                   service=None):
+        instances = []
+        for old_ref, instance_ref in self.db.instance_sync_power_states(
+                context.elevated(), host, power_states):
+            if old_ref['power_state'] != instance_ref['power_state']:
+                notifications.send_update(context, old_ref, instance_ref,
+                                          service)
+            instances.append(instance_ref)
+        return jsonutils.to_primitive(instances)
+
     @rpc_common.client_exceptions(exception.InstanceNotFound)
     def instance_get(self, context, instance_id):
         return jsonutils.to_primitive(
@@ -300,6 +320,9 @@ class ConductorManager(manager.Manager):
                                            values,
                                            update_cells=update_cells)
 
+    def instance_info_cache_update_many(self, context, network_infos):
+        self.db.instance_info_cache_update_many(context, network_infos)
+
     def instance_type_get(self, context, instance_type_id):
         result = self.db.instance_type_get(context, instance_type_id)
         return jsonutils.to_primitive(result)
@@ -377,6 +400,32 @@ class ConductorManager(manager.Manager):
         svc = self.db.service_update(context, service['id'], values)
         return jsonutils.to_primitive(svc)
 
+    def service_heartbeat(self, context, service_id):
+        """Record a heartbeat of a service, to be written with the others
+        received within heartbeat_flush_interval.
+        """
+        self._service_heartbeats.add(service_id)
+        if (time.time() - self._last_heartbeat_flush >=
+                CONF.conductor.heartbeat_flush_interval):
+            self._flush_service_heartbeats(context)
+
+    @periodic_task.periodic_task
+    def _flush_service_heartbeats(self, context):
+        """Write the service heartbeats recorded since the last flush with
+        one update.
+        """
+        self._last_heartbeat_flush = time.time()
+        service_ids = self._service_heartbeats
+        if not service_ids:
+            return
+        self._service_heartbeats = set()
+        try:
+            self.db.service_update_heartbeats(context.elevated(),
+                                              list(service_ids))
+        except Exception:
+            LOG.exception(_('Failed to write %d service heartbeats'),
+                          len(service_ids))
+
     def task_log_get(self, context, task_name, begin, end, host, state=None):
         result = self.db.task_log_get(context, task_name, begin, end, host,
                                       state)
@@ -88,6 +88,9 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                  instance_get_all_by_filters
     1.48 - Added compute_unrescue
     1.49 - Added columns_to_join to instance_get_by_uuid
+    1.50 - Added instance_sync_power_states
+    1.51 - Added instance_info_cache_update_many
+    1.52 - Added service_heartbeat
     """
 
     BASE_RPC_API_VERSION = '1.0'
@@ -107,6 +110,12 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                                        service=service),
                          version='1.38')
 
+    def instance_sync_power_states(self, context, host, power_states,
+                                   service=None):
+        msg = self.make_msg('instance_sync_power_states', host=host,
+                            power_states=power_states, service=service)
+        return self.call(context, msg, version='1.50')
+
     def instance_get(self, context, instance_id):
         msg = self.make_msg('instance_get',
                             instance_id=instance_id)
@@ -333,6 +342,11 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                             update_cells=update_cells)
         return self.call(context, msg, version='1.26')
 
+    def instance_info_cache_update_many(self, context, network_infos):
+        msg = self.make_msg('instance_info_cache_update_many',
+                            network_infos=network_infos)
+        return self.call(context, msg, version='1.51')
+
     def service_create(self, context, values):
         msg = self.make_msg('service_create', values=values)
         return self.call(context, msg, version='1.27')
@@ -361,6 +375,10 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
         msg = self.make_msg('service_update', service=service_p, values=values)
         return self.call(context, msg, version='1.34')
 
+    def service_heartbeat(self, context, service, timeout=None):
+        msg = self.make_msg('service_heartbeat', service_id=service['id'])
+        return self.call(context, msg, version='1.52', timeout=timeout)
+
     def task_log_get(self, context, task_name, begin, end, host, state=None):
         msg = self.make_msg('task_log_get', task_name=task_name,
                             begin=begin, end=end, host=host, state=state)
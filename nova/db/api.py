@@ -171,6 +171,11 @@ def service_update(context, service_id, values):
     return IMPL.service_update(context, service_id, values)
 
 
+def service_update_heartbeats(context, service_ids):
+    """Record a heartbeat of each of the given services at once."""
+    return IMPL.service_update_heartbeats(context, service_ids)
+
+
 ###################
 
 
@@ -185,6 +190,15 @@ def compute_node_get_all(context):
     return IMPL.compute_node_get_all(context)
 
 
+@timing.timequeries
+def compute_node_get_all_changed_since(context, since):
+    """Get computeNodes created, updated or deleted since a timestamp.
+
+    Deleted computeNodes are included in the result.
+    """
+    return IMPL.compute_node_get_all_changed_since(context, since)
+
+
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     """Get computeNodes given a hypervisor hostname match string."""
     return IMPL.compute_node_search_by_hypervisor(context, hypervisor_match)
@@ -211,6 +225,18 @@ def compute_node_delete(context, compute_id):
     return IMPL.compute_node_delete(context, compute_id)
 
 
+def compute_node_claim(context, compute_id, generation, memory_mb, disk_gb,
+                       vcpus):
+    """Take resources from a computeNode and increment its generation.
+
+    Raises ComputeNodeClaimConflict, without changing anything, if the
+    computeNode is not at the given generation anymore.  Returns the new
+    generation.
+    """
+    return IMPL.compute_node_claim(context, compute_id, generation,
+                                   memory_mb, disk_gb, vcpus)
+
+
 def compute_node_statistics(context):
     return IMPL.compute_node_statistics(context)
 
@@ -621,6 +647,11 @@ def instance_get_all_by_filters(context, filters, sort_key='created_at',
                                             columns_to_join=columns_to_join)
 
 
+def instance_pagination_marker(instance, sort_key='created_at'):
+    """Return a marker to list the instances after an instance."""
+    return IMPL.instance_pagination_marker(instance, sort_key=sort_key)
+
+
 def instance_get_active_by_window_joined(context, begin, end=None,
                                          project_id=None, host=None):
     """Get instances and joins active during a certain time window.
@@ -637,6 +668,26 @@ def instance_get_all_by_host(context, host, columns_to_join=None):
     return IMPL.instance_get_all_by_host(context, host, columns_to_join)
 
 
+def instance_sync_power_states(context, host, power_states):
+    """Set the power states found on the hypervisor of the instances of a
+    host that have no pending task.
+    """
+    rv = IMPL.instance_sync_power_states(context, host, power_states)
+    for old_instance, instance in rv:
+        if old_instance['power_state'] == instance['power_state']:
+            continue
+        try:
+            cells_rpcapi.CellsAPI().instance_update_at_top(context, instance)
+        except Exception:
+            LOG.exception(_("Failed to notify cells of instance update"))
+    return rv
+
+
+def instance_get_all_hosts_by_group(context, group):
+    """Get the hosts of the instances of a scheduler group."""
+    return IMPL.instance_get_all_hosts_by_group(context, group)
+
+
 def instance_get_all_by_host_and_node(context, host, node):
     """Get all instances belonging to a node."""
     return IMPL.instance_get_all_by_host_and_node(context, host, node)
@@ -647,6 +698,11 @@ def instance_get_all_by_host_and_not_type(context, host, type_id=None):
     return IMPL.instance_get_all_by_host_and_not_type(context, host, type_id)
 
 
+def instance_get_all_hosts_by_not_type(context, type_id):
+    """Get the hosts that have instances with a different type_id."""
+    return IMPL.instance_get_all_hosts_by_not_type(context, type_id)
+
+
 def instance_get_floating_address(context, instance_id):
     """Get the first floating ip address of an instance."""
     return IMPL.instance_get_floating_address(context, instance_id)
@@ -739,6 +795,16 @@ def instance_info_cache_update(context, instance_uuid, values,
     return rv
 
 
+def instance_info_cache_update_many(context, network_infos):
+    """Set the network info of the info caches of many instances at once.
+
+    :param network_infos: = dict of the network info by instance uuid
+
+    The API cell is not updated.
+    """
+    return IMPL.instance_info_cache_update_many(context, network_infos)
+
+
 def instance_info_cache_delete(context, instance_uuid):
     """Deletes an existing instance_info_cache record
 
@@ -979,6 +1045,38 @@ def reservation_rollback(context, reservations, project_id=None):
                                      project_id=project_id)
 
 
+def quota_reserve_atomic(context, resources, quotas, deltas, expire,
+                         until_refresh, max_age, project_id=None):
+    """Check quotas and create appropriate reservations, without locking
+    the usages of the project.
+    """
+    return IMPL.quota_reserve_atomic(context, resources, quotas, deltas,
+                                     expire, until_refresh, max_age,
+                                     project_id=project_id)
+
+
+def reservation_commit_atomic(context, reservations, project_id=None):
+    """Commit quota reservations, without locking the usages."""
+    return IMPL.reservation_commit_atomic(context, reservations,
+                                          project_id=project_id)
+
+
+def reservation_rollback_atomic(context, reservations, project_id=None):
+    """Roll back quota reservations, without locking the usages."""
+    return IMPL.reservation_rollback_atomic(context, reservations,
+                                            project_id=project_id)
+
+
+def reservation_commit_many(context, reservations):
+    """Commit the reservations of many reservation sets at once."""
+    return IMPL.reservation_commit_many(context, reservations)
+
+
+def reservation_rollback_many(context, reservations):
+    """Roll back the reservations of many reservation sets at once."""
+    return IMPL.reservation_rollback_many(context, reservations)
+
+
 def quota_destroy_all_by_project(context, project_id):
     """Destroy all quotas associated with a given project."""
     return IMPL.quota_destroy_all_by_project(context, project_id)
@@ -1064,6 +1162,12 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid):
                                                          instance_uuid)
 
 
+def block_device_mapping_get_all_by_instances(context, instance_uuids):
+    """Get all block device mapping belonging to a list of instances."""
+    return IMPL.block_device_mapping_get_all_by_instances(context,
+                                                          instance_uuids)
+
+
 # TODO(clayg): this method is only used in tests near as I can tell, and it
 # scares me because I don't know if bmd_id will match between cells
 def block_device_mapping_destroy(context, bdm_id):
@@ -1186,6 +1290,14 @@ def security_group_rule_get_by_security_group_grantee(context,
                                                              security_group_id)
 
 
+def instance_get_all_by_grantee_security_groups(context, group_ids):
+    """Get all instances which are members of a security group with a rule
+    granting access to one of the given security groups.
+    """
+    return IMPL.instance_get_all_by_grantee_security_groups(context,
+                                                            group_ids)
+
+
 def security_group_rule_destroy(context, security_group_rule_id):
     """Deletes a security group rule."""
     return IMPL.security_group_rule_destroy(context, security_group_rule_id)
@@ -1571,6 +1683,16 @@ def aggregate_metadata_get_by_host(context, host, key=None):
     return IMPL.aggregate_metadata_get_by_host(context, host, key)
 
 
+def aggregate_metadata_get_all_by_host(context):
+    """Get the metadata of all aggregates, for every host in an aggregate.
+
+    Returns a dictionary where each key is a hostname and each value is
+    a dictionary like the one aggregate_metadata_get_by_host() returns.
+    return value:  {machine: {key: set(value1, value2)}}
+    """
+    return IMPL.aggregate_metadata_get_all_by_host(context)
+
+
 def aggregate_host_get_by_metadata_key(context, key):
     """Get hosts with a specific metadata key metadata for all aggregates.
 
@@ -1696,6 +1818,13 @@ def get_ec2_instance_id_by_uuid(context, instance_id):
     return IMPL.get_ec2_instance_id_by_uuid(context, instance_id)
 
 
+def get_ec2_instance_ids_by_uuids(context, instance_uuids):
+    """Get the ec2 ids of a list of uuids from instance_id_mappings table,
+    returned by uuid.
+    """
+    return IMPL.get_ec2_instance_ids_by_uuids(context, instance_uuids)
+
+
 def get_instance_uuid_by_ec2_id(context, ec2_id):
     """Get uuid through ec2 id from instance_id_mappings table."""
     return IMPL.get_instance_uuid_by_ec2_id(context, ec2_id)
@@ -19,17 +19,21 @@
 
 """Implementation of SQLAlchemy backend."""
 
+import base64
 import collections
 import copy
 import datetime
 import functools
+import string
 import sys
 import time
 import uuid
 
 from oslo.config import cfg
 from sqlalchemy import and_
+from sqlalchemy import bindparam
 from sqlalchemy import Boolean
+from sqlalchemy import DateTime
 from sqlalchemy.exc import DataError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import NoSuchTableError
@@ -56,6 +60,7 @@ from nova import exception
 from nova.openstack.common.db import exception as db_exc
 from nova.openstack.common.db.sqlalchemy import session as db_session
 from nova.openstack.common.db.sqlalchemy import utils as sqlalchemyutils
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import timeutils
 from nova.openstack.common import uuidutils
@@ -82,6 +87,9 @@ get_session = db_session.get_session
 
 _SHADOW_TABLE_PREFIX = 'shadow_'
 
+# Characters of the regexes regex_filter() turns into indexed lookups.
+_REGEX_LITERAL_CHARS = string.ascii_letters + string.digits + '-_'
+
 
 def get_backend():
     """The backend is this module itself."""
@@ -442,6 +450,20 @@ def service_update(context, service_id, values):
     return service_ref
 
 
+@require_admin_context
+def service_update_heartbeats(context, service_ids):
+    """Bump the report count and the updated_at time of the given services
+    with one update, skipping the deleted ones.
+    """
+    if not service_ids:
+        return 0
+    return model_query(context, models.Service, read_deleted='no').\
+            filter(models.Service.id.in_(service_ids)).\
+            update({'report_count': models.Service.report_count + 1,
+                    'updated_at': timeutils.utcnow()},
+                   synchronize_session=False)
+
+
 ###################
 
 def compute_node_get(context, compute_id):
@@ -469,6 +491,23 @@ def compute_node_get_all(context):
             all()
 
 
+@require_admin_context
+def compute_node_get_all_changed_since(context, since):
+    """Return compute nodes created, updated or deleted at or after since.
+
+    Deleted rows are included so callers can drop them from any cached
+    view of the compute nodes.
+    """
+    changed = or_(models.ComputeNode.created_at >= since,
+                  models.ComputeNode.updated_at >= since,
+                  models.ComputeNode.deleted_at >= since)
+    return model_query(context, models.ComputeNode, read_deleted="yes").\
+            options(joinedload('service')).\
+            options(joinedload('stats')).\
+            filter(changed).\
+            all()
+
+
 @require_admin_context
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     field = models.ComputeNode.hypervisor_hostname
@@ -557,6 +596,33 @@ def compute_node_update(context, compute_id, values, prune_stats=False):
     return compute_ref
 
 
+@require_admin_context
+def compute_node_claim(context, compute_id, generation, memory_mb, disk_gb,
+                       vcpus):
+    compute_node = models.ComputeNode
+    values = {
+        'generation': compute_node.generation + 1,
+        'free_ram_mb': compute_node.free_ram_mb - memory_mb,
+        'memory_mb_used': compute_node.memory_mb_used + memory_mb,
+        'free_disk_gb': compute_node.free_disk_gb - disk_gb,
+        'local_gb_used': compute_node.local_gb_used + disk_gb,
+        'disk_available_least': (compute_node.disk_available_least -
+                                 disk_gb),
+        'vcpus_used': compute_node.vcpus_used + vcpus,
+        # NOTE: let the other schedulers know the node changed.
+        'updated_at': timeutils.utcnow(),
+    }
+    result = model_query(context, models.ComputeNode).\
+             filter_by(id=compute_id).\
+             filter_by(generation=generation).\
+             update(values, synchronize_session=False)
+
+    if not result:
+        raise exception.ComputeNodeClaimConflict(compute_id=compute_id)
+
+    return generation + 1
+
+
 @require_admin_context
 def compute_node_delete(context, compute_id):
     """Delete a ComputeNode record."""
@@ -1701,10 +1767,8 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
 
     # paginate query
     if marker is not None:
-        try:
-            marker = _instance_get_by_uuid(context, marker, session=session)
-        except exception.InstanceNotFound:
-            raise exception.MarkerNotFound(marker)
+        marker = _instance_marker_get(context, marker, sort_key,
+                                      session=session)
     query_prefix = sqlalchemyutils.paginate_query(query_prefix,
                            models.Instance, limit,
                            [sort_key, 'created_at', 'id'],
@@ -1790,6 +1854,105 @@ def tag_filter(query, model, tag_model, tag_model_col, filters):
     return query
 
 
+def _instance_marker_keys(sort_key):
+    keys = [sort_key]
+    for key in ('created_at', 'id'):
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+def instance_pagination_marker(instance, sort_key='created_at'):
+    """Return an opaque marker holding the sort key values of an instance.
+
+    instance_get_all_by_filters() lists the instances after it without
+    looking the instance up.
+    """
+    values = [sort_key]
+    for key in _instance_marker_keys(sort_key):
+        value = instance[key]
+        if isinstance(value, datetime.datetime):
+            value = timeutils.strtime(value)
+        values.append(value)
+    # NOTE: the padding is dropped to keep markers url safe.
+    return base64.urlsafe_b64encode(jsonutils.dumps(values)).rstrip('=')
+
+
+def _instance_marker_decode(marker, sort_key):
+    """Return the sort key values held by a marker, or None."""
+    try:
+        marker = str(marker)
+        marker += '=' * (-len(marker) % 4)
+        values = jsonutils.loads(base64.urlsafe_b64decode(marker))
+    except (TypeError, ValueError):
+        return None
+    keys = _instance_marker_keys(sort_key)
+    if (not isinstance(values, list) or len(values) != len(keys) + 1 or
+            values[0] != sort_key):
+        return None
+    columns = models.Instance.__table__.c
+    result = {}
+    for key, value in zip(keys, values[1:]):
+        if key not in columns:
+            return None
+        if value is not None and isinstance(columns[key].type, DateTime):
+            try:
+                value = timeutils.parse_strtime(value)
+            except (TypeError, ValueError):
+                return None
+        result[key] = value
+    return result
+
+
+def _instance_marker_get(context, marker, sort_key, session=None):
+    """Return the sort key values of the instance a marker refers to.
+
+    A marker is either the uuid of an instance, which only the sort key
+    columns are read of, or one from instance_pagination_marker().
+    """
+    keys = _instance_marker_keys(sort_key)
+    if uuidutils.is_uuid_like(marker):
+        try:
+            columns = [getattr(models.Instance, key) for key in keys]
+        except AttributeError:
+            raise sqlalchemyutils.InvalidSortKey()
+        row = model_query(context, *columns, base_model=models.Instance,
+                          session=session, project_only=True).\
+                filter(models.Instance.uuid == marker).\
+                first()
+        if not row:
+            raise exception.MarkerNotFound(marker)
+        values = dict(zip(keys, row))
+    else:
+        values = _instance_marker_decode(marker, sort_key)
+        if values is None:
+            raise exception.MarkerNotFound(marker)
+    return models.Instance(**values)
+
+
+def _regex_filter_indexed(column_attr, regex):
+    """Return a clause that can use an index on the column and matches at
+    least the values regex matches, or None.
+
+    Only regexes anchored at the start and made of letters, digits, '-'
+    and '_' are handled: '^name$' is turned into an equality and '^prefix'
+    into a LIKE 'prefix%'.  Depending on the collation of the column these
+    can match more values than the regex, e.g. ignoring the case or the
+    trailing spaces, so the regex still has to be applied.
+    """
+    if not regex.startswith('^'):
+        return None
+    literal = regex[1:]
+    exact = literal.endswith('$')
+    if exact:
+        literal = literal[:-1]
+    if not literal or literal.strip(_REGEX_LITERAL_CHARS):
+        return None
+    if exact:
+        return column_attr == literal
+    return column_attr.like(literal.replace('_', '!_') + '%', escape='!')
+
+
 def regex_filter(query, model, filters):
     """Applies regular expression filtering to a query.
 
@@ -1815,8 +1978,12 @@ def regex_filter(query, model, filters):
             continue
         if 'property' == type(column_attr).__name__:
             continue
-        query = query.filter(column_attr.op(db_regexp_op)(
-                                    str(filters[filter_name])))
+        regex = str(filters[filter_name])
+        clause = column_attr.op(db_regexp_op)(regex)
+        indexed_clause = _regex_filter_indexed(column_attr, regex)
+        if indexed_clause is not None:
+            clause = and_(indexed_clause, clause)
+        query = query.filter(clause)
     return query
 
 
@@ -1859,6 +2026,91 @@ def instance_get_all_by_host(context, host, columns_to_join=None):
                                 manual_joins=columns_to_join)
 
 
+@require_admin_context
+def instance_sync_power_states(context, host, power_states):
+    """Set the power states of the instances of a host with no task.
+
+    power_states maps instance uuids to the power states found on the
+    hypervisor.  Only the instances whose power state changed are updated,
+    with an update per power state, in one transaction.
+
+    Returns (old_instance, instance) pairs for the instances of the host
+    with no task among power_states, whether their power state changed or
+    not.
+    """
+    if not power_states:
+        return []
+    session = get_session()
+    with session.begin():
+        # Lock the instances so they don't get a task or move until their
+        # power states are updated.
+        ids = model_query(context, models.Instance.id,
+                          base_model=models.Instance, session=session).\
+                filter_by(host=host).\
+                filter_by(task_state=None).\
+                filter(models.Instance.uuid.in_(power_states.keys())).\
+                with_lockmode('update').\
+                all()
+        if not ids:
+            return []
+        instances = model_query(context, models.Instance, session=session).\
+                options(joinedload('info_cache')).\
+                filter(models.Instance.id.in_([row[0] for row in ids])).\
+                all()
+        instances = _instances_fill_metadata(context, instances,
+                                             manual_joins=['system_metadata'])
+
+        now = timeutils.utcnow()
+        ids_by_power_state = collections.defaultdict(list)
+        result = []
+        for old_instance in instances:
+            instance = old_instance
+            vm_power_state = power_states[instance['uuid']]
+            if instance['power_state'] != vm_power_state:
+                ids_by_power_state[vm_power_state].append(instance['id'])
+                instance = dict(old_instance, power_state=vm_power_state,
+                                updated_at=now)
+            result.append((old_instance, instance))
+
+        skipped_ids = set()
+        for vm_power_state, ids in ids_by_power_state.iteritems():
+            query = model_query(context, models.Instance, session=session).\
+                    filter(models.Instance.id.in_(ids)).\
+                    filter_by(host=host).\
+                    filter_by(task_state=None)
+            updated = query.update({'power_state': vm_power_state,
+                                    'updated_at': now},
+                                   synchronize_session=False)
+            # NOTE: if with_lockmode isn't supported, as in sqlite, the
+            # instances that moved away or got a task since they were read
+            # are skipped by the update, and must not be returned.
+            if updated != len(ids):
+                updated_ids = query.with_entities(models.Instance.id).all()
+                skipped_ids.update(set(ids) -
+                                   set(row[0] for row in updated_ids))
+    return [(old_instance, instance) for old_instance, instance in result
+            if old_instance['id'] not in skipped_ids]
+
+
+@require_admin_context
+def instance_get_all_hosts_by_group(context, group):
+    """Return the hosts of the instances whose 'group' system metadata is
+    group, without loading the instances.
+    """
+    query = model_query(context, models.Instance.host, read_deleted="no",
+                        base_model=models.Instance).\
+                join(models.InstanceSystemMetadata,
+                     models.InstanceSystemMetadata.instance_uuid ==
+                     models.Instance.uuid).\
+                filter(models.InstanceSystemMetadata.key == 'group').\
+                filter(models.InstanceSystemMetadata.value == group).\
+                filter(models.InstanceSystemMetadata.deleted == 0).\
+                filter(models.Instance.vm_state != vm_states.SOFT_DELETED).\
+                filter(models.Instance.host != None).\
+                distinct()
+    return [row[0] for row in query.all()]
+
+
 @require_admin_context
 def _instance_get_all_uuids_by_host(context, host, session=None):
     """Return a list of the instance uuids on a given host.
@@ -1889,6 +2141,16 @@ def instance_get_all_by_host_and_not_type(context, host, type_id=None):
                    filter(models.Instance.instance_type_id != type_id).all())
 
 
+@require_admin_context
+def instance_get_all_hosts_by_not_type(context, type_id):
+    query = model_query(context, models.Instance.host,
+                        base_model=models.Instance).\
+                filter(models.Instance.instance_type_id != type_id).\
+                filter(models.Instance.host != None).\
+                distinct()
+    return [row[0] for row in query.all()]
+
+
 # NOTE(jkoelker) This is only being left here for compat with floating
 #                ips. Currently the network_api doesn't return floaters
 #                in network_info. Once it starts return the model. This
@@ -2129,6 +2391,51 @@ def instance_info_cache_update(context, instance_uuid, values):
     return info_cache
 
 
+@require_context
+def instance_info_cache_update_many(context, network_infos):
+    """Set the network info of the info caches of many instances.
+
+    network_infos maps instance uuids to the network info to store.  The
+    existing info caches are updated with one statement executed for all
+    of them, and the missing ones are created, in one transaction.
+    Deleted info caches are left alone.
+    """
+    if not network_infos:
+        return
+    session = get_session()
+    with session.begin():
+        rows = model_query(context, models.InstanceInfoCache.instance_uuid,
+                           base_model=models.InstanceInfoCache,
+                           session=session, read_deleted='yes').\
+                filter(models.InstanceInfoCache.instance_uuid.in_(
+                    network_infos.keys())).\
+                all()
+        existing = set(row[0] for row in rows)
+
+        now = timeutils.utcnow()
+        updates = []
+        for instance_uuid, network_info in network_infos.iteritems():
+            if instance_uuid in existing:
+                updates.append({'_instance_uuid': instance_uuid,
+                                'network_info': network_info,
+                                'updated_at': now})
+            else:
+                # NOTE: re-create a missing cache entry like
+                # instance_info_cache_update() does.
+                info_cache = models.InstanceInfoCache()
+                info_cache.update({'instance_uuid': instance_uuid,
+                                   'network_info': network_info})
+                session.add(info_cache)
+
+        if updates:
+            table = models.InstanceInfoCache.__table__
+            session.execute(table.update().
+                    where(table.c.instance_uuid ==
+                          bindparam('_instance_uuid')).
+                    where(table.c.deleted == 0),
+                    updates)
+
+
 @require_context
 def instance_info_cache_delete(context, instance_uuid):
     """Deletes an existing instance_info_cache record
@@ -2910,6 +3217,64 @@ def reservation_rollback(context, reservations, project_id=None):
         reservation_query.soft_delete(synchronize_session=False)
 
 
+def _reservations_settle(context, session, criterion, commit):
+    """Soft delete the reservations matching criterion, and apply their
+    deltas to the usages, summed by usage: committed reservations move
+    from the reserved to the in_use counts, the other ones are taken out
+    of the reserved counts.
+
+    Only the reservations are locked while they are read, the usages are
+    updated with SQL increments in the order of their ids.
+    """
+    rows = model_query(context, models.Reservation.id,
+                       models.Reservation.usage_id,
+                       models.Reservation.delta,
+                       base_model=models.Reservation,
+                       read_deleted="no", session=session).\
+                   filter(criterion).\
+                   with_lockmode('update').\
+                   all()
+    usage_deltas = collections.defaultdict(lambda: [0, 0])
+    for _reservation_id, usage_id, delta in rows:
+        if commit:
+            usage_deltas[usage_id][0] += delta
+        if delta >= 0:
+            usage_deltas[usage_id][1] -= delta
+    _quota_usages_apply(context, session, usage_deltas)
+
+    reservation_ids = [row[0] for row in rows]
+    for start in xrange(0, len(reservation_ids), 500):
+        model_query(context, models.Reservation, read_deleted="no",
+                    session=session).\
+                filter(models.Reservation.id.in_(
+                    reservation_ids[start:start + 500])).\
+                soft_delete(synchronize_session=False)
+
+
+@require_context
+def reservation_commit_many(context, reservations):
+    """Commit the reservations of many reservation sets, possibly of
+    several projects, in one transaction.
+    """
+    session = get_session()
+    with session.begin():
+        _reservations_settle(context, session,
+                             models.Reservation.uuid.in_(reservations),
+                             commit=True)
+
+
+@require_context
+def reservation_rollback_many(context, reservations):
+    """Roll back the reservations of many reservation sets, possibly of
+    several projects, in one transaction.
+    """
+    session = get_session()
+    with session.begin():
+        _reservations_settle(context, session,
+                             models.Reservation.uuid.in_(reservations),
+                             commit=False)
+
+
 @require_admin_context
 def quota_destroy_all_by_project(context, project_id):
     session = get_session()
@@ -2935,16 +3300,234 @@ def reservation_expire(context):
     session = get_session()
     with session.begin():
         current_time = timeutils.utcnow()
-        reservation_query = model_query(context, models.Reservation,
-                                        session=session, read_deleted="no").\
-                            filter(models.Reservation.expire < current_time)
+        _reservations_settle(context, session,
+                             models.Reservation.expire < current_time,
+                             commit=False)
 
-        for reservation in reservation_query.join(models.QuotaUsage).all():
-            if reservation.delta >= 0:
-                reservation.usage.reserved -= reservation.delta
-                reservation.usage.save(session=session)
 
-        reservation_query.soft_delete(synchronize_session=False)
+# NOTE: The atomic quota functions below do not lock the quota_usages
+# rows while deciding anything.  Usages are refreshed in a transaction of
+# their own, and the reserved and in_use counts are then changed by
+# UPDATEs which compute the new values in SQL.  The quota checks are
+# conditions of those UPDATEs, so row locks are only held by the short
+# transactions running them.
+
+def _quota_usage_values(usage_ref):
+    return dict((key, usage_ref[key]) for key in
+                ('id', 'resource', 'in_use', 'reserved', 'until_refresh',
+                 'created_at', 'updated_at'))
+
+
+def _quota_usages_refresh(context, resources, deltas, until_refresh,
+                          max_age, project_id):
+    """Create the missing usages of the resources of deltas, refresh the
+    stale ones, and return the values of the usages of the project by
+    resource.
+    """
+    elevated = context.elevated()
+    session = get_session()
+    with session.begin():
+        rows = model_query(context, models.QuotaUsage, read_deleted="no",
+                           session=session).\
+                filter_by(project_id=project_id).\
+                all()
+        usages = dict((row.resource, _quota_usage_values(row))
+                      for row in rows)
+
+        def _usage_update(usage, values):
+            model_query(context, models.QuotaUsage, read_deleted="no",
+                        session=session).\
+                    filter_by(id=usage['id']).\
+                    update(values, synchronize_session=False)
+
+        def _usage_create(resource):
+            usages[resource] = _quota_usage_values(
+                    _quota_usage_create(elevated, project_id, resource, 0, 0,
+                                        until_refresh or None,
+                                        session=session))
+
+        work = set(deltas.keys())
+        while work:
+            resource = work.pop()
+
+            # Do we need to refresh the usage?
+            refresh = False
+            usage = usages.get(resource)
+            if usage is None:
+                _usage_create(resource)
+                refresh = True
+            elif usage['in_use'] < 0:
+                # Negative in_use count indicates a desync, so try to
+                # heal from that...
+                refresh = True
+            elif usage['until_refresh'] is not None:
+                _usage_update(usage, {'until_refresh':
+                                      models.QuotaUsage.until_refresh - 1})
+                usage['until_refresh'] -= 1
+                refresh = usage['until_refresh'] <= 0
+            elif max_age and timeutils.is_older_than(
+                    usage['updated_at'] or usage['created_at'], max_age):
+                refresh = True
+
+            if refresh:
+                sync = resources[resource].sync
+                updates = sync(elevated, project_id, session)
+                for res, in_use in updates.items():
+                    if res not in usages:
+                        _usage_create(res)
+                    values = {'in_use': in_use,
+                              'until_refresh': until_refresh or None}
+                    _usage_update(usages[res], values)
+                    usages[res].update(values)
+                    # Don't sync the resources refreshed by this sync
+                    # routine again.
+                    work.discard(res)
+    return usages
+
+
+@require_context
+def quota_reserve_atomic(context, resources, quotas, deltas, expire,
+                         until_refresh, max_age, project_id=None):
+    """Like quota_reserve(), without locking the usages of the project.
+
+    The reserved counts are raised by UPDATEs which only match while the
+    new totals are within the quotas, so concurrent reservations can't
+    go over quota together.
+    """
+    if project_id is None:
+        project_id = context.project_id
+
+    usages = _quota_usages_refresh(context, resources, deltas,
+                                   until_refresh, max_age, project_id)
+
+    # Check for deltas that would go negative
+    unders = [resource for resource, delta in deltas.items()
+              if delta < 0 and
+              delta + usages[resource]['in_use'] < 0]
+    if unders:
+        LOG.warning(_("Change will make usage less than 0 for the following "
+                      "resources: %(unders)s") % locals())
+
+    session = get_session()
+    try:
+        with session.begin():
+            # NOTE: The usages are updated in the order of their resources
+            #       so that concurrent reservations don't deadlock.
+            overs = []
+            for resource in sorted(deltas.keys()):
+                delta = deltas[resource]
+                if delta < 0:
+                    continue
+                query = model_query(context, models.QuotaUsage,
+                                    read_deleted="no", session=session).\
+                            filter_by(id=usages[resource]['id'])
+                if quotas[resource] >= 0:
+                    query = query.filter(models.QuotaUsage.in_use +
+                                         models.QuotaUsage.reserved + delta <=
+                                         quotas[resource])
+                if not query.update({'reserved':
+                                     models.QuotaUsage.reserved + delta},
+                                    synchronize_session=False):
+                    overs.append(resource)
+            if overs:
+                # Raised within the transaction to undo the reserved
+                # counts already raised.
+                raise exception.OverQuota(overs=sorted(overs), quotas=quotas,
+                                          usages={})
+
+            now = timeutils.utcnow()
+            reservations = []
+            rows = []
+            for resource, delta in deltas.items():
+                reservation_uuid = str(uuid.uuid4())
+                reservations.append(reservation_uuid)
+                rows.append({'uuid': reservation_uuid,
+                             'usage_id': usages[resource]['id'],
+                             'project_id': project_id,
+                             'resource': resource,
+                             'delta': delta,
+                             'expire': expire,
+                             'created_at': now})
+            session.execute(models.Reservation.__table__.insert(), rows)
+    except exception.OverQuota as exc:
+        rows = model_query(context, models.QuotaUsage, read_deleted="no").\
+                filter_by(project_id=project_id).\
+                all()
+        usages = dict((row.resource, dict(in_use=row.in_use,
+                                          reserved=row.reserved))
+                      for row in rows)
+        raise exception.OverQuota(overs=exc.kwargs['overs'], quotas=quotas,
+                                  usages=usages)
+
+    return reservations
+
+
+def _reservations_claim(context, session, reservations):
+    """Soft delete the listed reservations, and return the usage ids and
+    the deltas of the ones soft deleted by this call.
+    """
+    rows = model_query(context, models.Reservation.id,
+                       models.Reservation.usage_id,
+                       models.Reservation.delta,
+                       base_model=models.Reservation,
+                       read_deleted="no", session=session).\
+                   filter(models.Reservation.uuid.in_(reservations)).\
+                   all()
+    claimed = []
+    for reservation_id, usage_id, delta in rows:
+        # NOTE: Only one of concurrent commits or rollbacks of a
+        #       reservation soft deletes it, and applies it.
+        if model_query(context, models.Reservation, read_deleted="no",
+                       session=session).\
+                filter_by(id=reservation_id).\
+                soft_delete(synchronize_session=False):
+            claimed.append((usage_id, delta))
+    return claimed
+
+
+def _quota_usages_apply(context, session, usage_deltas):
+    """Apply the changes of the in_use and reserved counts of usages,
+    given by usage id, in the order of the usage ids.
+    """
+    for usage_id in sorted(usage_deltas.keys()):
+        in_use, reserved = usage_deltas[usage_id]
+        values = {}
+        if in_use:
+            values['in_use'] = models.QuotaUsage.in_use + in_use
+        if reserved:
+            values['reserved'] = models.QuotaUsage.reserved + reserved
+        if values:
+            model_query(context, models.QuotaUsage, read_deleted="no",
+                        session=session).\
+                    filter_by(id=usage_id).\
+                    update(values, synchronize_session=False)
+
+
+@require_context
+def reservation_commit_atomic(context, reservations, project_id=None):
+    """Like reservation_commit(), without locking the usages."""
+    session = get_session()
+    with session.begin():
+        usage_deltas = collections.defaultdict(lambda: [0, 0])
+        for usage_id, delta in _reservations_claim(context, session,
+                                                   reservations):
+            usage_deltas[usage_id][0] += delta
+            if delta >= 0:
+                usage_deltas[usage_id][1] -= delta
+        _quota_usages_apply(context, session, usage_deltas)
+
+
+@require_context
+def reservation_rollback_atomic(context, reservations, project_id=None):
+    """Like reservation_rollback(), without locking the usages."""
+    session = get_session()
+    with session.begin():
+        usage_deltas = collections.defaultdict(lambda: [0, 0])
+        for usage_id, delta in _reservations_claim(context, session,
+                                                   reservations):
+            if delta >= 0:
+                usage_deltas[usage_id][1] -= delta
+        _quota_usages_apply(context, session, usage_deltas)
 
 
 ###################
@@ -3115,6 +3698,16 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid):
                  all()
 
 
+@require_context
+def block_device_mapping_get_all_by_instances(context, instance_uuids):
+    if not instance_uuids:
+        return []
+    return _block_device_mapping_get_query(context).\
+                 filter(models.BlockDeviceMapping.instance_uuid.in_(
+                     instance_uuids)).\
+                 all()
+
+
 @require_context
 def block_device_mapping_destroy(context, bdm_id):
     _block_device_mapping_get_query(context).\
@@ -3369,6 +3962,18 @@ def security_group_rule_get_by_security_group_grantee(context,
                          all()
 
 
+@require_context
+def instance_get_all_by_grantee_security_groups(context, group_ids):
+    if not group_ids:
+        return []
+    grants = models.SecurityGroup.rules.any(
+        models.SecurityGroupIngressRule.group_id.in_(group_ids))
+    return model_query(context, models.Instance).\
+                    join(models.Instance.security_groups).\
+                    filter(grants).\
+                    all()
+
+
 @require_context
 def security_group_rule_create(context, values):
     security_group_rule_ref = models.SecurityGroupIngressRule()
@@ -4573,6 +5178,18 @@ def aggregate_metadata_get_by_host(context, host, key=None):
     return dict(metadata)
 
 
+@require_admin_context
+def aggregate_metadata_get_all_by_host(context):
+    rows = _aggregate_get_query(context, models.Aggregate).all()
+    metadata = {}
+    for agg in rows:
+        for agghost in agg._hosts:
+            host_metadata = metadata.setdefault(agghost.host, {})
+            for kv in agg._metadata:
+                host_metadata.setdefault(kv['key'], set()).add(kv['value'])
+    return metadata
+
+
 @require_admin_context
 def aggregate_host_get_by_metadata_key(context, key):
     query = model_query(context, models.Aggregate).join(
@@ -4941,6 +5558,22 @@ def get_ec2_instance_id_by_uuid(context, instance_id, session=None):
     return result['id']
 
 
+@require_context
+def get_ec2_instance_ids_by_uuids(context, instance_uuids):
+    if not instance_uuids:
+        return {}
+    rows = model_query(context, models.InstanceIdMapping.uuid,
+                       models.InstanceIdMapping.id,
+                       base_model=models.InstanceIdMapping,
+                       read_deleted='yes').\
+                    filter(models.InstanceIdMapping.uuid.in_(
+                        instance_uuids)).\
+                    order_by(desc(models.InstanceIdMapping.id)).\
+                    all()
+    # NOTE: A uuid mapped more than once gets its lowest id.
+    return dict(rows)
+
+
 @require_context
 def get_instance_uuid_by_ec2_id(context, ec2_id, session=None):
     result = _ec2_instance_get_query(context,
@@ -0,0 +1,37 @@
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Index, MetaData, Table
+
+
+TABLE_NAME = 'instance_system_metadata'
+IDX_NAME = 'instance_system_metadata_key_value_idx'
+
+
+def upgrade(migrate_engine):
+    """Add an index to make the scheduler lookups of the members of an
+    instance group more efficient.
+    """
+    meta = MetaData(bind=migrate_engine)
+    sys_meta = Table(TABLE_NAME, meta, autoload=True)
+    idx = Index(IDX_NAME, sys_meta.c.key, sys_meta.c.value)
+    idx.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    sys_meta = Table(TABLE_NAME, meta, autoload=True)
+    idx = Index(IDX_NAME, sys_meta.c.key, sys_meta.c.value)
+    idx.drop(migrate_engine)
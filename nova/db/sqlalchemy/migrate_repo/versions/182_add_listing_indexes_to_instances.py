@@ -0,0 +1,48 @@
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Index, MetaData, Table
+
+
+TABLE_NAME = 'instances'
+INDEXES = [
+    # Based on instance_get_all_by_filters listing the instances of a
+    # project, or of all the projects, a page at a time in the order they
+    # were created.
+    ('instances_project_id_deleted_created_at_idx',
+     ('project_id', 'deleted', 'created_at', 'id')),
+    ('instances_deleted_created_at_idx', ('deleted', 'created_at', 'id')),
+    # Based on the exact and prefix name filters of
+    # instance_get_all_by_filters.
+    ('instances_display_name_idx', ('display_name',)),
+]
+
+
+def _get_indexes(meta):
+    instances = Table(TABLE_NAME, meta, autoload=True)
+    return [Index(name, *[getattr(instances.c, column) for column in columns])
+            for name, columns in INDEXES]
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    for index in _get_indexes(meta):
+        index.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    for index in _get_indexes(meta):
+        index.drop(migrate_engine)
@@ -0,0 +1,45 @@
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Index, MetaData, Table
+
+
+TABLE_NAME = 'reservations'
+INDEXES = [
+    # Based on the reservations being committed and rolled back by uuid.
+    ('reservations_uuid_idx', ('uuid',)),
+    # Based on reservation_expire looking up the reservations which are
+    # not deleted yet and expired.
+    ('reservations_deleted_expire_idx', ('deleted', 'expire')),
+]
+
+
+def _get_indexes(meta):
+    reservations = Table(TABLE_NAME, meta, autoload=True)
+    return [Index(name,
+                  *[getattr(reservations.c, column) for column in columns])
+            for name, columns in INDEXES]
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    for index in _get_indexes(meta):
+        index.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    for index in _get_indexes(meta):
+        index.drop(migrate_engine)
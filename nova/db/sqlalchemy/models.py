@@ -97,6 +97,9 @@ class ComputeNode(BASE, NovaBase):
     cpu_info = Column(Text, nullable=True)
     disk_available_least = Column(Integer)
 
+    # Incremented by schedulers each time they claim resources on the node.
+    generation = Column(Integer, default=0)
+
 
 class ComputeNodeStat(BASE, NovaBase):
     """Stats related to the current workload of a compute host that are
@@ -715,6 +715,11 @@ class ComputeHostNotFound(HostNotFound):
     message = _("Compute host %(host)s could not be found.")
 
 
+class ComputeNodeClaimConflict(NovaException):
+    message = _("Compute node %(compute_id)s was changed by someone else "
+                "while claiming resources on it.")
+
+
 class HostBinaryNotFound(NotFound):
     message = _("Could not find binary %(binary)s on host %(host)s.")
 
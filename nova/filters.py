@@ -19,6 +19,7 @@ Filter support
 
 from nova import loadables
 from nova.openstack.common import log as logging
+from nova import timing
 
 LOG = logging.getLogger(__name__)
 
@@ -49,13 +50,19 @@ class BaseFilterHandler(loadables.BaseLoader):
     This class should be subclassed where one needs to use filters.
     """
 
+    def __init__(self, loadable_cls_type):
+        super(BaseFilterHandler, self).__init__(loadable_cls_type)
+        # Time taken by each filter class, by class name.
+        self.timings = timing.Timings()
+
     def get_filtered_objects(self, filter_classes, objs,
             filter_properties):
         list_objs = list(objs)
         LOG.debug("Starting with %d host(s)", len(list_objs))
         for filter_cls in filter_classes:
-            list_objs = list(filter_cls().filter_all(list_objs,
-                             filter_properties))
+            with self.timings.timer(filter_cls.__name__):
+                list_objs = list(filter_cls().filter_all(list_objs,
+                                 filter_properties))
             LOG.debug("Filter %s returned %d host(s)",
                       filter_cls.__name__, len(list_objs))
         return list_objs
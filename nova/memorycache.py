@@ -0,0 +1,177 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Bounded in process memcache client.
+
+Same interface as nova.openstack.common.memorycache, but the in process
+cache is a least recently used cache with a maximum number of entries,
+and get() and set() don't look at every entry to expire the old ones.
+"""
+
+import heapq
+
+from oslo.config import cfg
+
+from nova.openstack.common import timeutils
+
+memorycache_opts = [
+    cfg.IntOpt('memorycache_max_entries',
+               default=10000,
+               help='Maximum number of entries kept by the in process '
+                    'cache. The least recently used entries are evicted '
+                    'when it is full. 0 means no limit.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(memorycache_opts)
+CONF.import_opt('memcached_servers', 'nova.openstack.common.memorycache')
+
+# Indexes in the nodes of the linked list of entries.
+PREV, NEXT, KEY, TIMEOUT, VALUE = range(5)
+
+
+def get_client(memcached_servers=None):
+    client_cls = Client
+
+    if not memcached_servers:
+        memcached_servers = CONF.memcached_servers
+    if memcached_servers:
+        try:
+            import memcache
+            client_cls = memcache.Client
+        except ImportError:
+            pass
+
+    return client_cls(memcached_servers, debug=0)
+
+
+class Client(object):
+    """Replicates a tiny subset of memcached client interface.
+
+    Entries are kept in a dict and in a doubly linked list in least
+    recently used order, and the ones that expire are tracked in a heap
+    ordered by expiry time.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Ignores the passed in args."""
+        # Maps the keys to their [prev, next, key, timeout, value] node.
+        self.cache = {}
+        # Sentinel of the circular list, its next node is the least
+        # recently used one.
+        self._root = root = []
+        root[:] = [root, root, None, 0, None]
+        self.max_entries = kwargs.get('max_entries',
+                                      CONF.memorycache_max_entries)
+        # (timeout, key) of the entries that expire.  Entries that were
+        # deleted or set again are left in the heap until they're popped.
+        self._expiry_heap = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _unlink(self, node):
+        node[PREV][NEXT] = node[NEXT]
+        node[NEXT][PREV] = node[PREV]
+
+    def _append(self, node):
+        """Links a node as the most recently used one."""
+        root = self._root
+        last = root[PREV]
+        node[PREV] = last
+        node[NEXT] = root
+        last[NEXT] = root[PREV] = node
+
+    def _remove(self, key):
+        self._unlink(self.cache.pop(key))
+
+    def _expire(self, now):
+        """Removes the entries whose timeout has passed."""
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            timeout, key = heapq.heappop(heap)
+            node = self.cache.get(key)
+            if node is not None and node[TIMEOUT] == timeout:
+                self._remove(key)
+        # Don't let the heap grow without bound when the same keys keep
+        # being set again.
+        if len(heap) > 2 * len(self.cache) + 64:
+            self._expiry_heap = [(node[TIMEOUT], key)
+                                 for key, node in self.cache.iteritems()
+                                 if node[TIMEOUT]]
+            heapq.heapify(self._expiry_heap)
+
+    def get(self, key):
+        """Retrieves the value for a key or None.
+
+        this expunges expired keys during each get"""
+
+        self._expire(timeutils.utcnow_ts())
+        node = self.cache.get(key)
+        if node is None:
+            self.misses += 1
+            return None
+        self._unlink(node)
+        self._append(node)
+        self.hits += 1
+        return node[VALUE]
+
+    def set(self, key, value, time=0, min_compress_len=0):
+        """Sets the value for a key."""
+        now = timeutils.utcnow_ts()
+        self._expire(now)
+        timeout = 0
+        if time != 0:
+            timeout = now + time
+            heapq.heappush(self._expiry_heap, (timeout, key))
+        if key in self.cache:
+            self._remove(key)
+        node = [None, None, key, timeout, value]
+        self.cache[key] = node
+        self._append(node)
+        if self.max_entries > 0:
+            while len(self.cache) > self.max_entries:
+                self._remove(self._root[NEXT][KEY])
+                self.evictions += 1
+        return True
+
+    def add(self, key, value, time=0, min_compress_len=0):
+        """Sets the value for a key if it doesn't exist."""
+        if self.get(key) is not None:
+            return False
+        return self.set(key, value, time, min_compress_len)
+
+    def incr(self, key, delta=1):
+        """Increments the value for a key."""
+        value = self.get(key)
+        if value is None:
+            return None
+        new_value = int(value) + delta
+        self.cache[key][VALUE] = str(new_value)
+        return new_value
+
+    def delete(self, key, time=0):
+        """Deletes the value associated with a key."""
+        if key in self.cache:
+            self._remove(key)
+
+    def get_stats(self):
+        """Returns the cache statistics, like memcache.Client does."""
+        return [('memorycache', {'get_hits': self.hits,
+                                 'get_misses': self.misses,
+                                 'evictions': self.evictions,
+                                 'curr_items': len(self.cache)})]
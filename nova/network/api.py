@@ -107,6 +107,25 @@ def update_instance_cache_with_nw_info(api, context, instance,
         LOG.exception(_('Failed storing info cache'), instance=instance)
 
 
+def update_instance_caches_with_nw_info(api, context, nw_infos,
+                                         conductor_api=None):
+    """Store the network info of many instances in their info caches.
+
+    nw_infos maps instance uuids to NetworkInfo.  The info caches are
+    written in one go, and the API cell is not updated.
+    """
+    try:
+        network_infos = dict((instance_uuid, nw_info.json())
+                             for instance_uuid, nw_info in nw_infos.items())
+        if conductor_api:
+            conductor_api.instance_info_cache_update_many(context,
+                                                          network_infos)
+        else:
+            api.db.instance_info_cache_update_many(context, network_infos)
+    except Exception:
+        LOG.exception(_('Failed storing info caches'))
+
+
 def wrap_check_policy(func):
     """Check policy corresponding to the wrapped methods prior to execution."""
 
@@ -404,19 +423,45 @@ class API(base.Base):
 
     def _get_instance_nw_info(self, context, instance):
         """Returns all network info related to an instance."""
+        nw_info = self._call_nw_info(self.network_rpcapi.get_instance_nw_info,
+                                     context,
+                                     **self._get_nw_info_args(instance))
+        return network_model.NetworkInfo.hydrate(nw_info)
+
+    @wrap_check_policy
+    def get_instances_nw_info(self, context, instances, conductor_api=None):
+        """Returns the network info of many instances by instance uuid.
+
+        The network info is fetched with one call to the network manager,
+        and the info caches of the instances are updated at once.
+        Instances whose network info could not be built are left out.
+        """
+        if not instances:
+            return {}
+        args = [self._get_nw_info_args(instance) for instance in instances]
+        nw_infos = self._call_nw_info(
+                self.network_rpcapi.get_instances_nw_info, context,
+                instances=args)
+        result = dict((instance_uuid, network_model.NetworkInfo.hydrate(nw))
+                      for instance_uuid, nw in nw_infos.iteritems())
+        update_instance_caches_with_nw_info(self, context, result,
+                                            conductor_api)
+        return result
+
+    def _get_nw_info_args(self, instance):
         instance_type = flavors.extract_instance_type(instance)
-        args = {'instance_id': instance['uuid'],
+        return {'instance_id': instance['uuid'],
                 'rxtx_factor': instance_type['rxtx_factor'],
                 'host': instance['host'],
                 'project_id': instance['project_id']}
 
+    def _call_nw_info(self, method, context, **kwargs):
+        """Calls a network manager nw_info method, retrying on errors."""
         num_tries = 1 + max(CONF.get_nwinfo_timeout_retries,
             CONF.get_nwinfo_error_retries)
         for i in xrange(num_tries):
             try:
-                nw_info = self.network_rpcapi.get_instance_nw_info(context,
-                                                                   **args)
-                break
+                return method(context, **kwargs)
             except rpc_common.Timeout, e:
                 tries_left = num_tries - i - 1
                 if not tries_left:
@@ -435,8 +480,6 @@ class API(base.Base):
                         "retry in %(sleep_time)d second(s)") % locals())
             time.sleep(sleep_time)
 
-        return network_model.NetworkInfo.hydrate(nw_info)
-
     @wrap_check_policy
     def validate_networks(self, context, requested_networks):
         """validate the networks passed at the time of creating
@@ -20,6 +20,7 @@
 """Implements vlans, bridges, and iptables rules using linux utilities."""
 
 import calendar
+import hashlib
 import inspect
 import netaddr
 import os
@@ -122,6 +123,17 @@ linux_net_opts = [
                default='DROP',
                help=('The table that iptables to jump to when a packet is '
                      'to be dropped.')),
+    cfg.BoolOpt('iptables_incremental_apply',
+                default=False,
+                help='Only rewrite the chains of this service whose rules '
+                     'changed since the last apply, instead of saving and '
+                     'restoring all the iptables rules each time'),
+    cfg.IntOpt('iptables_resync_interval',
+               default=300,
+               help='Seconds after which iptables_incremental_apply saves '
+                    'and restores all the iptables rules again, repairing '
+                    'the rules of this service changed outside of it. 0 '
+                    'applies all the rules each time'),
     ]
 
 CONF = cfg.CONF
@@ -333,6 +345,11 @@ class IptablesManager(object):
 
         self.iptables_apply_deferred = False
 
+        # The hashes of the rules last applied with each command, see
+        # _table_model(), and when all the rules were last applied.
+        self._applied_models = {}
+        self._last_full_applies = {}
+
         # Add a nova-filter-top chain. It's intended to be shared
         # among the various nova components. It sits at the very top
         # of FORWARD and OUTPUT.
@@ -410,19 +427,152 @@ class IptablesManager(object):
             s += [('ip6tables', self.ipv6)]
 
         for cmd, tables in s:
-            all_tables, _err = self.execute('%s-save' % (cmd,), '-c',
-                                                run_as_root=True,
-                                                attempts=5)
-            all_lines = all_tables.split('\n')
-            for table_name, table in tables.iteritems():
-                start, end = self._find_table(all_lines, table_name)
-                all_lines[start:end] = self._modify_rules(
-                        all_lines[start:end], table, table_name)
-            self.execute('%s-restore' % (cmd,), '-c', run_as_root=True,
-                         process_input='\n'.join(all_lines),
-                         attempts=5)
+            # The models are taken before _modify_rules() flushes the
+            # removal lists of the tables.
+            models = dict((table_name, self._table_model(table))
+                          for table_name, table in tables.iteritems())
+            if not (CONF.iptables_incremental_apply and
+                    self._apply_changed_chains(cmd, tables, models)):
+                self._apply_all(cmd, tables)
+                self._last_full_applies[cmd] = timeutils.utcnow()
+            self._applied_models[cmd] = dict(
+                    (table_name, hashes)
+                    for table_name, (hashes, _lines) in models.iteritems())
         LOG.debug(_("IPTablesManager.apply completed with success"))
 
+    def _apply_all(self, cmd, tables):
+        """Rewrite our rules in all the rules saved by iptables-save."""
+        all_tables, _err = self.execute('%s-save' % (cmd,), '-c',
+                                            run_as_root=True,
+                                            attempts=5)
+        all_lines = all_tables.split('\n')
+        for table_name, table in tables.iteritems():
+            start, end = self._find_table(all_lines, table_name)
+            all_lines[start:end] = self._modify_rules(
+                    all_lines[start:end], table, table_name)
+        self.execute('%s-restore' % (cmd,), '-c', run_as_root=True,
+                     process_input='\n'.join(all_lines),
+                     attempts=5)
+
+    def _apply_changed_chains(self, cmd, tables, models):
+        """Rewrite only the wrapped chains whose rules changed since the
+        last apply, with iptables-restore --noflush.
+
+        Returns False when a full apply is needed instead: nothing was
+        applied yet, iptables_resync_interval passed since the last full
+        apply, the unwrapped chains or rules changed, or the rules in the
+        kernel drifted from the last applied ones.
+
+        """
+        applied_models = self._applied_models.get(cmd)
+        if applied_models is None or set(applied_models) != set(models):
+            return False
+        interval = CONF.iptables_resync_interval
+        if (interval <= 0 or
+            timeutils.is_older_than(self._last_full_applies[cmd], interval)):
+            return False
+
+        restore_lines = []
+        for table_name, table in tables.iteritems():
+            if table.remove_chains or table.remove_rules:
+                return False
+            hashes, chain_lines = models[table_name]
+            applied_hashes = applied_models[table_name]
+            if hashes['unwrapped'] != applied_hashes['unwrapped']:
+                return False
+
+            changed = sorted(name
+                             for name, digest in hashes['chains'].iteritems()
+                             if applied_hashes['chains'].get(name) != digest)
+            removed = sorted(name for name in applied_hashes['chains']
+                             if name not in hashes['chains'])
+            if not changed and not removed:
+                continue
+
+            # Declaring an existing chain flushes it, and removed chains
+            # must be empty to be deleted.
+            restore_lines.append('*%s' % (table_name,))
+            restore_lines += [':%s-%s - [0:0]' % (binary_name, name)
+                              for name in changed + removed]
+            for name in changed:
+                restore_lines += chain_lines[name]
+            restore_lines += ['-X %s-%s' % (binary_name, name)
+                              for name in removed]
+            restore_lines.append('COMMIT')
+
+        if self._rules_drifted(cmd, tables['filter']):
+            LOG.warn(_('The %s rules were changed outside of nova, '
+                       'applying all the rules'), cmd)
+            return False
+
+        if restore_lines:
+            try:
+                self.execute('%s-restore' % (cmd,), '-c', '--noflush',
+                             run_as_root=True,
+                             process_input='\n'.join(restore_lines) + '\n')
+            except processutils.ProcessExecutionError:
+                LOG.warn(_('Failed to apply the changed %s chains, '
+                           'applying all the rules'), cmd)
+                return False
+        return True
+
+    def _rules_drifted(self, cmd, table):
+        """Check that the FORWARD chain still jumps to our chains.
+
+        Restarting or reloading the firewall, or flushing FORWARD, drops
+        these jumps and leaves the instances unfiltered, while the chains
+        which weren't changed keep the hashes of the last apply. Other
+        changes made outside of nova are only repaired by the next full
+        apply, see iptables_resync_interval.
+
+        """
+        jumps = set('-A FORWARD %s' % (rule.rule,) for rule in table.rules
+                    if rule.chain == 'FORWARD' and not rule.wrap and
+                    rule.rule.startswith('-j ') and ' ' not in rule.rule[3:])
+        try:
+            out, _err = self.execute(cmd, '-t', 'filter', '-S', 'FORWARD',
+                                     run_as_root=True)
+        except processutils.ProcessExecutionError:
+            return True
+        return not jumps.issubset(out.split('\n'))
+
+    def _table_model(self, table):
+        """Hash the rules of a table.
+
+        Returns a dict of the hash of the unwrapped chains and rules, which
+        need a full apply to change, and of the hashes of the rules of each
+        wrapped chain, along with the lines of the rules of each wrapped
+        chain in the order _modify_rules() applies them.
+
+        """
+        chain_rules = dict((name, ([], [])) for name in table.chains)
+        unwrapped = sorted(table.unwrapped_chains)
+        for rule in table.rules:
+            if rule.wrap:
+                top_rules, rules = chain_rules.setdefault(rule.chain,
+                                                          ([], []))
+                (top_rules if rule.top else rules).append(str(rule))
+            else:
+                unwrapped.append('%s %s' % (rule.top, rule))
+
+        chain_lines = {}
+        chain_hashes = {}
+        for name, (top_rules, rules) in chain_rules.iteritems():
+            # The last occurrence of duplicated rules takes precedence.
+            lines = []
+            seen_lines = set()
+            for line in reversed(top_rules + rules):
+                if line not in seen_lines:
+                    seen_lines.add(line)
+                    lines.append(line)
+            lines.reverse()
+            chain_lines[name] = lines
+            chain_hashes[name] = hashlib.sha1('\n'.join(lines)).hexdigest()
+
+        hashes = {'unwrapped': hashlib.sha1('\n'.join(unwrapped)).hexdigest(),
+                  'chains': chain_hashes}
+        return hashes, chain_lines
+
     def _find_table(self, lines, table_name):
         if len(lines) < 3:
             # length only <2 when fake iptables
@@ -457,19 +607,17 @@ class IptablesManager(object):
 
         if CONF.iptables_top_regex:
             regex = re.compile(CONF.iptables_top_regex)
-            temp_filter = filter(lambda line: regex.search(line), new_filter)
-            for rule_str in temp_filter:
-                new_filter = filter(lambda s: s.strip() != rule_str.strip(),
-                                    new_filter)
-            top_rules = temp_filter
+            top_rules = filter(lambda line: regex.search(line), new_filter)
+            top_lines = set(line.strip() for line in top_rules)
+            new_filter = filter(lambda s: s.strip() not in top_lines,
+                                new_filter)
 
         if CONF.iptables_bottom_regex:
             regex = re.compile(CONF.iptables_bottom_regex)
-            temp_filter = filter(lambda line: regex.search(line), new_filter)
-            for rule_str in temp_filter:
-                new_filter = filter(lambda s: s.strip() != rule_str.strip(),
-                    new_filter)
-            bottom_rules = temp_filter
+            bottom_rules = filter(lambda line: regex.search(line), new_filter)
+            bottom_lines = set(line.strip() for line in bottom_rules)
+            new_filter = filter(lambda s: s.strip() not in bottom_lines,
+                                new_filter)
 
         seen_chains = False
         rules_index = 0
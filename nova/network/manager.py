@@ -271,7 +271,7 @@ class NetworkManager(manager.Manager):
         The one at a time part is to flatten the layout to help scale
     """
 
-    RPC_API_VERSION = '1.9'
+    RPC_API_VERSION = '1.10'
 
     # If True, this manager requires VIF to create a bridge.
     SHOULD_CREATE_BRIDGE = False
@@ -562,19 +562,55 @@ class NetworkManager(manager.Manager):
         instance_uuid = instance_id
 
         host = kwargs.get('host')
+        return self._build_instance_nw_info(context, instance_uuid,
+                                            rxtx_factor, host, {})
+
+    def _build_instance_nw_info(self, context, instance_uuid, rxtx_factor,
+                                host, networks_by_id):
+        """Builds the network info list of an instance, looking up its
+        networks in networks_by_id first and adding the missing ones.
+        """
         vifs = self.db.virtual_interface_get_by_instance(context,
                                                          instance_uuid)
         networks = {}
 
         for vif in vifs:
-            if vif.get('network_id') is not None:
-                network = self._get_network_by_id(context, vif['network_id'])
-                networks[vif['uuid']] = network
+            network_id = vif.get('network_id')
+            if network_id is not None:
+                if network_id not in networks_by_id:
+                    networks_by_id[network_id] = self._get_network_by_id(
+                            context, network_id)
+                networks[vif['uuid']] = networks_by_id[network_id]
 
         nw_info = self.build_network_info_model(context, vifs, networks,
                                                          rxtx_factor, host)
         return nw_info
 
+    def get_instances_nw_info(self, context, instances):
+        """Creates the network info lists of many instances at once.
+
+        instances is a list of dicts with the instance_id, rxtx_factor and
+        host arguments of get_instance_nw_info().  The networks are looked
+        up once for all the instances.
+
+        :returns: dict of the network info lists by instance uuid, without
+                  the instances whose network info could not be built
+        """
+        result = {}
+        networks_by_id = {}
+        for instance in instances:
+            instance_uuid = instance['instance_id']
+            try:
+                # NOTE: like get_instance_nw_info(), leave the dhcp
+                # address of multi_host networks to this host.
+                result[instance_uuid] = self._build_instance_nw_info(
+                        context, instance_uuid, instance['rxtx_factor'],
+                        None, networks_by_id)
+            except Exception:
+                LOG.exception(_('Failed to get nw_info'),
+                              instance_uuid=instance_uuid)
+        return result
+
     def build_network_info_model(self, context, vifs, networks,
                                  rxtx_factor, instance_host):
         """Builds a NetworkInfo object containing all network information
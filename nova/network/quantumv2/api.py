@@ -80,6 +80,7 @@ NET_EXTERNAL = 'router:external'
 
 refresh_cache = network_api.refresh_cache
 update_instance_info_cache = network_api.update_instance_cache_with_nw_info
+update_instance_info_caches = network_api.update_instance_caches_with_nw_info
 
 
 class API(base.Base):
@@ -369,6 +370,29 @@ class API(base.Base):
                                    conductor_api)
         return result
 
+    def get_instances_nw_info(self, context, instances, conductor_api=None):
+        """Return the network information of many instances by instance
+           uuid and update their caches at once.
+        """
+        # NOTE: quantum has no call returning the ports of many devices
+        # with their subnets, so only the network lists of the projects
+        # are shared between the instances.
+        networks_by_project = {}
+        result = {}
+        for instance in instances:
+            project_id = instance['project_id']
+            try:
+                if project_id not in networks_by_project:
+                    networks_by_project[project_id] = (
+                            self._get_available_networks(context,
+                                                         project_id))
+                result[instance['uuid']] = self._get_instance_nw_info(
+                        context, instance, networks_by_project[project_id])
+            except Exception:
+                LOG.exception(_('Failed to get nw_info'), instance=instance)
+        update_instance_info_caches(self, context, result, conductor_api)
+        return result
+
     def _get_instance_nw_info(self, context, instance, networks=None):
         LOG.debug(_('get_instance_nw_info() for %s'),
                   instance['display_name'])
@@ -79,13 +79,21 @@ quota_opts = [
                help='number of seconds between subsequent usage refreshes'),
     cfg.StrOpt('quota_driver',
                default='nova.quota.DbQuotaDriver',
-               help='default driver to use for quota checks'),
+               help='default driver to use for quota checks (valid options '
+                    'are nova.quota.DbQuotaDriver, '
+                    'nova.quota.AtomicDbQuotaDriver and '
+                    'nova.quota.NoopQuotaDriver)'),
     ]
 
 CONF = cfg.CONF
 CONF.register_opts(quota_opts)
 
 
+def _flatten(reservation_sets):
+    return [reservation for reservations in reservation_sets
+            for reservation in reservations]
+
+
 class DbQuotaDriver(object):
     """
     Driver to perform necessary checks to enforce quotas and obtain
@@ -349,6 +357,11 @@ class DbQuotaDriver(object):
         #            which means access to the session.  Since the
         #            session isn't available outside the DBAPI, we
         #            have to do the work there.
+        return self._reserve(context, resources, quotas, deltas, expire,
+                             project_id)
+
+    def _reserve(self, context, resources, quotas, deltas, expire,
+                 project_id):
         return db.quota_reserve(context, resources, quotas, deltas, expire,
                                 CONF.until_refresh, CONF.max_age,
                                 project_id=project_id)
@@ -385,6 +398,26 @@ class DbQuotaDriver(object):
 
         db.reservation_rollback(context, reservations, project_id=project_id)
 
+    def commit_many(self, context, reservation_sets):
+        """Commit many sets of reservations at once.
+
+        :param context: The request context, for access checks.
+        :param reservation_sets: A list of lists of reservation UUIDs,
+                                 as returned by the reserve() method,
+                                 possibly of several projects.
+        """
+        db.reservation_commit_many(context, _flatten(reservation_sets))
+
+    def rollback_many(self, context, reservation_sets):
+        """Roll back many sets of reservations at once.
+
+        :param context: The request context, for access checks.
+        :param reservation_sets: A list of lists of reservation UUIDs,
+                                 as returned by the reserve() method,
+                                 possibly of several projects.
+        """
+        db.reservation_rollback_many(context, _flatten(reservation_sets))
+
     def usage_reset(self, context, resources):
         """
         Reset the usage records for a particular user on a list of
@@ -437,6 +470,56 @@ class DbQuotaDriver(object):
         db.reservation_expire(context)
 
 
+class AtomicDbQuotaDriver(DbQuotaDriver):
+    """
+    Driver storing the quotas, usages and reservations in the local
+    database like DbQuotaDriver, without locking the usages of a
+    project while reserving, committing or rolling back.  The quota
+    checks are conditions of the updates of the usages instead, which
+    lets concurrent reservations of a project go through together.
+    """
+
+    def _reserve(self, context, resources, quotas, deltas, expire,
+                 project_id):
+        return db.quota_reserve_atomic(context, resources, quotas, deltas,
+                                       expire, CONF.until_refresh,
+                                       CONF.max_age, project_id=project_id)
+
+    def commit(self, context, reservations, project_id=None):
+        """Commit reservations.
+
+        :param context: The request context, for access checks.
+        :param reservations: A list of the reservation UUIDs, as
+                             returned by the reserve() method.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        """
+        # If project_id is None, then we use the project_id in context
+        if project_id is None:
+            project_id = context.project_id
+
+        db.reservation_commit_atomic(context, reservations,
+                                     project_id=project_id)
+
+    def rollback(self, context, reservations, project_id=None):
+        """Roll back reservations.
+
+        :param context: The request context, for access checks.
+        :param reservations: A list of the reservation UUIDs, as
+                             returned by the reserve() method.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        """
+        # If project_id is None, then we use the project_id in context
+        if project_id is None:
+            project_id = context.project_id
+
+        db.reservation_rollback_atomic(context, reservations,
+                                       project_id=project_id)
+
+
 class NoopQuotaDriver(object):
     """Driver that turns quotas calls into no-ops and pretends that quotas
     for all resources are unlimited.  This can be used if you do not
@@ -599,6 +682,26 @@ class NoopQuotaDriver(object):
         """
         pass
 
+    def commit_many(self, context, reservation_sets):
+        """Commit many sets of reservations at once.
+
+        :param context: The request context, for access checks.
+        :param reservation_sets: A list of lists of reservation UUIDs,
+                                 as returned by the reserve() method,
+                                 possibly of several projects.
+        """
+        pass
+
+    def rollback_many(self, context, reservation_sets):
+        """Roll back many sets of reservations at once.
+
+        :param context: The request context, for access checks.
+        :param reservation_sets: A list of lists of reservation UUIDs,
+                                 as returned by the reserve() method,
+                                 possibly of several projects.
+        """
+        pass
+
     def usage_reset(self, context, resources):
         """
         Reset the usage records for a particular user on a list of
@@ -1011,6 +1114,60 @@ class QuotaEngine(object):
                             "%(reservations)s") % locals())
         LOG.debug(_("Rolled back reservations %(reservations)s") % locals())
 
+    def commit_many(self, context, reservation_sets):
+        """Commit many sets of reservations in one go, summing their
+        changes by usage instead of committing each set on its own.
+
+        :param context: The request context, for access checks.
+        :param reservation_sets: A list of lists of reservation UUIDs,
+                                 as returned by the reserve() method,
+                                 possibly of several projects.  Empty
+                                 and None sets are skipped.
+        """
+
+        reservation_sets = [reservations for reservations in reservation_sets
+                            if reservations]
+        if not reservation_sets:
+            return
+        try:
+            self._driver.commit_many(context, reservation_sets)
+        except Exception:
+            # NOTE(Vek): Ignoring exceptions here is safe, because the
+            # usage resynchronization and the reservation expiration
+            # mechanisms will resolve the issue.  The exception is
+            # logged, however, because this is less than optimal.
+            LOG.exception(_("Failed to commit reservations "
+                            "%(reservation_sets)s") % locals())
+        LOG.debug(_("Committed reservations %(reservation_sets)s") %
+                  locals())
+
+    def rollback_many(self, context, reservation_sets):
+        """Roll back many sets of reservations in one go, summing their
+        changes by usage instead of rolling back each set on its own.
+
+        :param context: The request context, for access checks.
+        :param reservation_sets: A list of lists of reservation UUIDs,
+                                 as returned by the reserve() method,
+                                 possibly of several projects.  Empty
+                                 and None sets are skipped.
+        """
+
+        reservation_sets = [reservations for reservations in reservation_sets
+                            if reservations]
+        if not reservation_sets:
+            return
+        try:
+            self._driver.rollback_many(context, reservation_sets)
+        except Exception:
+            # NOTE(Vek): Ignoring exceptions here is safe, because the
+            # usage resynchronization and the reservation expiration
+            # mechanisms will resolve the issue.  The exception is
+            # logged, however, because this is less than optimal.
+            LOG.exception(_("Failed to roll back reservations "
+                            "%(reservation_sets)s") % locals())
+        LOG.debug(_("Rolled back reservations %(reservation_sets)s") %
+                  locals())
+
     def usage_reset(self, context, resources):
         """
         Reset the usage records for a particular user on a list of
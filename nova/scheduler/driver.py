@@ -141,13 +141,7 @@ class Scheduler(object):
 
     def group_hosts(self, context, group):
         """Return the list of hosts that have VM's from the group."""
-
-        # The system_metadata 'group' will be filtered
-        members = db.instance_get_all_by_filters(context,
-                {'deleted': False, 'group': group})
-        return [member['host']
-                for member in members
-                if member.get('host') is not None]
+        return db.instance_get_all_hosts_by_group(context, group)
 
     def schedule_prep_resize(self, context, image, request_spec,
                              filter_properties, instance, instance_type,
@@ -169,6 +163,13 @@ class Scheduler(object):
         msg = _("Driver must implement select_hosts")
         raise NotImplementedError(msg)
 
+    def get_timings(self):
+        """Return timings of the work done by the scheduler, see
+        nova.timing.Timings.get_stats().  Override in a subclass that
+        records some.
+        """
+        return {}
+
     def schedule_live_migration(self, context, instance, dest,
                                 block_migration, disk_over_commit):
         """Live migration scheduling method.
@@ -19,11 +19,13 @@ You can customize this scheduler by specifying your own Host Filters and
 Weighing Functions.
 """
 
+import heapq
 import random
 
 from oslo.config import cfg
 
 from nova.compute import flavors
+from nova import db
 from nova import exception
 from nova.openstack.common import log as logging
 from nova.openstack.common.notifier import api as notifier
@@ -44,7 +46,28 @@ filter_scheduler_opts = [
                     'chosen from. A value of 1 chooses the '
                     'first host returned by the weighing functions. '
                     'This value must be at least 1. Any value less than 1 '
-                    'will be ignored, and 1 will be used instead')
+                    'will be ignored, and 1 will be used instead'),
+    cfg.BoolOpt('scheduler_batch_placement',
+                default=False,
+                help='When scheduling more than one instance in a request, '
+                     'run the filters and weighers over all hosts only '
+                     'once and afterwards only re-evaluate the hosts that '
+                     'were chosen. Filters that compare hosts against each '
+                     'other only see the full host list once'),
+    cfg.BoolOpt('scheduler_optimistic_claims',
+                default=False,
+                help='Take the resources of an instance from the chosen '
+                     'compute node in the db before sending the request to '
+                     'it. If another scheduler used the node since it was '
+                     'read, the node is read again and a host is chosen '
+                     'again, instead of the compute host failing its claim '
+                     'and rescheduling. Useful when running several '
+                     'schedulers'),
+    cfg.IntOpt('scheduler_claim_retries',
+               default=3,
+               help='Number of times a request chooses hosts again after '
+                    'finding that another scheduler used the chosen host. '
+                    'Afterwards the instances left get no host'),
 ]
 
 CONF.register_opts(filter_scheduler_opts)
@@ -55,6 +78,18 @@ class FilterScheduler(driver.Scheduler):
     def __init__(self, *args, **kwargs):
         super(FilterScheduler, self).__init__(*args, **kwargs)
         self.options = scheduler_options.SchedulerOptions()
+        self.timings = timing.Timings()
+
+    def get_timings(self):
+        """Return the time taken by scheduling requests and by their steps.
+
+        The filter and weigher timings are by class name.
+        """
+        filter_handler = self.host_manager.filter_handler
+        weight_handler = self.host_manager.weight_handler
+        return {'scheduler': self.timings.get_stats(),
+                'filters': filter_handler.timings.get_stats(),
+                'weighers': weight_handler.timings.get_stats()}
 
     @timing.timefunc
     def schedule_run_instance(self, context, request_spec,
@@ -289,6 +324,7 @@ class FilterScheduler(driver.Scheduler):
                       'instance_uuid': instance_uuid})
             raise exception.NoValidHost(reason=msg)
 
+    @timing.timemethod('schedule')
     def _schedule(self, context, request_spec, filter_properties,
                   instance_uuids=None):
         """Returns a list of hosts that meet the required specs,
@@ -336,14 +372,23 @@ class FilterScheduler(driver.Scheduler):
         # Note: remember, we are using an iterator here. So only
         # traverse this list once. This can bite you if the hosts
         # are being scanned in a filter or weighing function.
-        hosts = self.host_manager.get_all_host_states(elevated)
+        with self.timings.timer('get_all_host_states'):
+            hosts = self.host_manager.get_all_host_states(elevated)
 
-        selected_hosts = []
         if instance_uuids:
             num_instances = len(instance_uuids)
         else:
             num_instances = request_spec.get('num_instances', 1)
-        for num in xrange(num_instances):
+        if CONF.scheduler_batch_placement and num_instances > 1:
+            selected_hosts = self._schedule_batch(elevated, hosts,
+                    filter_properties, instance_properties, num_instances,
+                    update_group_hosts)
+            self._drop_prefetched_properties(filter_properties)
+            return selected_hosts
+
+        selected_hosts = []
+        conflicts = 0
+        while len(selected_hosts) < num_instances:
             # Filter local hosts based on requirements ...
             hosts = self.host_manager.get_filtered_hosts(hosts,
                     filter_properties)
@@ -353,19 +398,33 @@ class FilterScheduler(driver.Scheduler):
 
             LOG.debug(_("Filtered %(hosts)s"), {'hosts': hosts})
 
-            weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
-                    filter_properties)
-
-            LOG.debug(_("Weighed %(hosts)s"), {'hosts': weighed_hosts})
-
             scheduler_host_subset_size = CONF.scheduler_host_subset_size
-            if scheduler_host_subset_size > len(weighed_hosts):
-                scheduler_host_subset_size = len(weighed_hosts)
             if scheduler_host_subset_size < 1:
                 scheduler_host_subset_size = 1
 
+            # Only the best hosts are needed, so don't sort all of them.
+            weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                    filter_properties, num_best=scheduler_host_subset_size)
+
+            LOG.debug(_("Weighed %(hosts)s"), {'hosts': weighed_hosts})
+
             chosen_host = random.choice(
                 weighed_hosts[0:scheduler_host_subset_size])
+            try:
+                claimed = self._claim_host(elevated, chosen_host.obj,
+                                           instance_properties)
+            except exception.ComputeHostNotFound:
+                # The compute node was deleted, choose among the others.
+                hosts = [host for host in hosts
+                         if host is not chosen_host.obj]
+                continue
+            if not claimed:
+                conflicts += 1
+                if self._claim_retries_exhausted(conflicts):
+                    break
+                # Another scheduler used the host first.  Choose again
+                # now that its state was read again.
+                continue
             selected_hosts.append(chosen_host)
 
             # Now consume the resources so the filter/weights
@@ -373,6 +432,154 @@ class FilterScheduler(driver.Scheduler):
             chosen_host.obj.consume_from_instance(instance_properties)
             if update_group_hosts is True:
                 filter_properties['group_hosts'].append(chosen_host.obj.host)
+        self._drop_prefetched_properties(filter_properties)
+        return selected_hosts
+
+    def _drop_prefetched_properties(self, filter_properties):
+        """Remove the data read for the filters of a single pass.
+
+        The filter properties are passed on to the compute host, and
+        come back when rescheduling.
+        """
+        filter_properties.pop('host_aggregate_metadata', None)
+
+    def _claim_retries_exhausted(self, conflicts):
+        if conflicts <= CONF.scheduler_claim_retries:
+            return False
+        LOG.warn(_("Giving up choosing hosts after %d claim conflicts with "
+                   "other schedulers"), conflicts)
+        return True
+
+    def _claim_host(self, context, host_state, instance_properties):
+        """Take the resources of an instance from the compute node of a
+        host in the db, if scheduler_optimistic_claims is set.
+
+        Returns False if another scheduler claimed resources on the node
+        since host_state was read.  host_state is then read again.  Raises
+        ComputeHostNotFound, after dropping host_state from the host
+        manager, if the compute node was deleted meanwhile.
+        """
+        if (not CONF.scheduler_optimistic_claims or
+                host_state.compute_id is None):
+            return True
+        disk_gb = (instance_properties['root_gb'] +
+                   instance_properties['ephemeral_gb'])
+        try:
+            host_state.generation = db.compute_node_claim(context,
+                    host_state.compute_id, host_state.generation,
+                    instance_properties['memory_mb'], disk_gb,
+                    instance_properties['vcpus'])
+            return True
+        except exception.ComputeNodeClaimConflict:
+            LOG.debug(_("%(host_state)s was changed by another scheduler, "
+                        "reading it again"), {'host_state': host_state})
+        try:
+            compute = db.compute_node_get(context, host_state.compute_id)
+        except exception.ComputeHostNotFound:
+            LOG.debug(_("%(host_state)s was deleted, dropping it"),
+                      {'host_state': host_state})
+            self.host_manager.host_state_map.pop(
+                    (host_state.host, host_state.nodename), None)
+            raise
+        # NOTE: the db has all the claims made on the node, including the
+        # ones for earlier instances of this request, so the node must not
+        # be skipped as older than the host state.
+        host_state.updated = None
+        host_state.update_from_compute_node(compute)
+        return False
+
+    def _schedule_batch(self, context, hosts, filter_properties,
+                        instance_properties, num_instances,
+                        update_group_hosts):
+        """Choose hosts for several instances, filtering and weighing all
+        hosts only once.
+
+        The weighed hosts are kept in a heap.  After each choice only the
+        chosen host is run through the filters and weighers again, along
+        with the other nodes of that host when the request has a group.
+        """
+        hosts = self.host_manager.get_filtered_hosts(hosts,
+                filter_properties)
+        if not hosts:
+            return []
+
+        LOG.debug(_("Filtered %(hosts)s"), {'hosts': hosts})
+
+        weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                filter_properties)
+
+        LOG.debug(_("Weighed %(hosts)s"), {'hosts': weighed_hosts})
+
+        # NOTE: the heap is ordered by weight and then by the position in
+        # the filtered host list, so equally weighed hosts are chosen in
+        # the same order as they would be by the per-instance loop.
+        positions = dict((id(host), position)
+                         for position, host in enumerate(hosts))
+        heap = [(-weighed_host.weight, positions[id(weighed_host.obj)],
+                 weighed_host) for weighed_host in weighed_hosts]
+        heapq.heapify(heap)
+
+        selected_hosts = []
+        conflicts = 0
+        while len(selected_hosts) < num_instances:
+            if not heap:
+                # Can't get any more locally.
+                break
+
+            scheduler_host_subset_size = CONF.scheduler_host_subset_size
+            if scheduler_host_subset_size > len(heap):
+                scheduler_host_subset_size = len(heap)
+            if scheduler_host_subset_size < 1:
+                scheduler_host_subset_size = 1
+
+            best = [heapq.heappop(heap)
+                    for i in xrange(scheduler_host_subset_size)]
+            chosen = random.choice(best)
+            for entry in best:
+                if entry is not chosen:
+                    heapq.heappush(heap, entry)
+            chosen_host = chosen[2]
+            changed_hosts = [chosen_host.obj]
+            try:
+                claimed = self._claim_host(context, chosen_host.obj,
+                                           instance_properties)
+            except exception.ComputeHostNotFound:
+                # The compute node was deleted, leave it out of the heap.
+                continue
+            if not claimed:
+                conflicts += 1
+                if self._claim_retries_exhausted(conflicts):
+                    break
+                # Another scheduler used the host first.  It was read
+                # again, so put it back in the heap and choose again.
+            else:
+                selected_hosts.append(chosen_host)
+
+                # Now consume the resources so the filter/weights
+                # will change for the next instance.
+                chosen_host.obj.consume_from_instance(instance_properties)
+                if update_group_hosts is True:
+                    host = chosen_host.obj.host
+                    filter_properties['group_hosts'].append(host)
+                    # Other nodes of the chosen host may fail the group
+                    # filters now, so they need to be checked again too.
+                    others = [entry for entry in heap
+                              if entry[2].obj.host == host]
+                    if others:
+                        heap = [entry for entry in heap
+                                if entry[2].obj.host != host]
+                        heapq.heapify(heap)
+                        changed_hosts.extend(entry[2].obj
+                                             for entry in others)
+
+            hosts = self.host_manager.get_filtered_hosts(changed_hosts,
+                    filter_properties)
+            if hosts:
+                for weighed_host in self.host_manager.get_weighed_hosts(
+                        hosts, filter_properties):
+                    position = positions[id(weighed_host.obj)]
+                    heapq.heappush(heap, (-weighed_host.weight, position,
+                                          weighed_host))
         return selected_hosts
 
     def _assert_compute_node_has_enough_memory(self, context,
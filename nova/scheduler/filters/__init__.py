@@ -17,26 +17,153 @@
 Scheduler host filters
 """
 
+from oslo.config import cfg
+
 from nova import filters
+from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
+from nova.scheduler import host_columns
+
+filter_cache_opts = [
+    cfg.IntOpt('scheduler_filter_cache_ttl',
+               default=0,
+               help='Number of seconds the result of a cacheable filter is '
+                    'kept for a host and a given request. Results are '
+                    'dropped earlier when the capabilities or service of '
+                    'the host change. Changes to aggregates take up to this '
+                    'long to be noticed. 0 disables the cache'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(filter_cache_opts)
+
+LOG = logging.getLogger(__name__)
+
+# Most results cached on a single host.  The cache of a host is emptied
+# when it fills up.
+MAX_CACHED_RESULTS = 256
 
 
 class BaseHostFilter(filters.BaseFilter):
     """Base class for host filters."""
+
+    # Filters whose result for a host only depends on the request fields
+    # returned by request_cache_key(), on host_cache_key() and on the
+    # capabilities, service record and aggregates of the host can set
+    # this to have their results cached on the HostState.
+    cache_results = False
+
+    # Filters that look at the aggregate metadata of hosts set this so
+    # that the metadata of all hosts is read at once and passed in
+    # filter_properties['host_aggregate_metadata'].  See
+    # nova.scheduler.filters.utils.aggregate_metadata_get_by_host().
+    uses_aggregate_metadata = False
+
     def _filter_one(self, obj, filter_properties):
         """Return True if the object passes the filter, otherwise False."""
         return self.host_passes(obj, filter_properties)
 
+    def filter_all(self, filter_obj_list, filter_properties):
+        request_key = None
+        if self.cache_results and CONF.scheduler_filter_cache_ttl > 0:
+            request_key = self.request_cache_key(filter_properties)
+        if request_key is None:
+            return super(BaseHostFilter, self).filter_all(filter_obj_list,
+                                                          filter_properties)
+        return self._filter_all_cached(filter_obj_list, filter_properties,
+                                       (self.__class__, request_key))
+
+    def _filter_all_cached(self, filter_obj_list, filter_properties, key):
+        now = timeutils.utcnow_ts()
+        expires = now + CONF.scheduler_filter_cache_ttl
+        for obj in filter_obj_list:
+            host_key = self.host_cache_key(obj)
+            cached = obj.filter_cache.get(key)
+            if cached and cached[0] == host_key and cached[2] > now:
+                passes = cached[1]
+            else:
+                passes = self._filter_one(obj, filter_properties)
+                if len(obj.filter_cache) >= MAX_CACHED_RESULTS:
+                    obj.filter_cache.clear()
+                obj.filter_cache[key] = (host_key, passes, expires)
+            if passes:
+                yield obj
+
+    def request_cache_key(self, filter_properties):
+        """Return a hashable key made of the request fields the filter
+        looks at, or None if the result shouldn't be cached.
+        Override this in a subclass that sets cache_results.
+        """
+        return None
+
+    def host_cache_key(self, host_state):
+        """Return the state of a host, besides its capabilities and
+        service, that a cached result depends on.
+        """
+        return None
+
     def host_passes(self, host_state, filter_properties):
         """Return True if the HostState passes the filter, otherwise False.
         Override this in a subclass.
         """
         raise NotImplementedError()
 
+    def filter_columns(self, columns, passing, filter_properties):
+        """Return a boolean array saying which hosts in a HostStateColumns
+        pass the filter, or None if the filter has no vectorized form.
+        'passing' is the mask of the hosts which passed the previous
+        filters.  Override this in a subclass.
+        """
+        return None
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
 
+    def get_filtered_objects(self, filter_classes, objs,
+            filter_properties):
+        if not host_columns.enabled():
+            return super(HostFilterHandler, self).get_filtered_objects(
+                    filter_classes, objs, filter_properties)
+        return self._get_filtered_objects_vectorized(filter_classes, objs,
+                                                     filter_properties)
+
+    def _get_filtered_objects_vectorized(self, filter_classes, objs,
+            filter_properties):
+        """Filter hosts using boolean masks over a HostStateColumns.
+
+        Filters without a vectorized form are run per-object over the
+        hosts that are still passing.
+        """
+        numpy = host_columns.numpy
+        columns = host_columns.HostStateColumns(objs)
+        host_states = columns.host_states
+        passing = numpy.ones(len(columns), dtype=bool)
+        LOG.debug("Starting with %d host(s)", len(columns))
+        for filter_cls in filter_classes:
+            with self.timings.timer(filter_cls.__name__):
+                passing &= self._filter_vectorized(filter_cls(), columns,
+                                                   passing, filter_properties)
+            LOG.debug("Filter %s returned %d host(s)",
+                      filter_cls.__name__, passing.sum())
+        return [host_states[index] for index in numpy.flatnonzero(passing)]
+
+    def _filter_vectorized(self, filter_obj, columns, passing,
+            filter_properties):
+        """Return the mask of hosts passing one filter."""
+        mask = filter_obj.filter_columns(columns, passing, filter_properties)
+        if mask is not None:
+            return mask
+        numpy = host_columns.numpy
+        host_states = columns.host_states
+        remaining = [host_states[index]
+                     for index in numpy.flatnonzero(passing)]
+        passed_ids = set(id(obj) for obj in
+                         filter_obj.filter_all(remaining, filter_properties))
+        return numpy.array([id(obj) in passed_ids for obj in host_states],
+                           dtype=bool)
+
 
 def all_filters():
     """Return a list of filter classes found in this directory.
@@ -28,44 +28,76 @@ class AffinityFilter(filters.BaseHostFilter):
     def __init__(self):
         self.compute_api = compute.API()
 
-
-class DifferentHostFilter(AffinityFilter):
-    '''Schedule the instance on a different host from a set of instances.'''
-
-    def host_passes(self, host_state, filter_properties):
-        context = filter_properties['context']
+    def _get_affinity_uuids(self, filter_properties, hint):
         scheduler_hints = filter_properties.get('scheduler_hints') or {}
-
-        affinity_uuids = scheduler_hints.get('different_host', [])
+        affinity_uuids = scheduler_hints.get(hint, [])
         if isinstance(affinity_uuids, basestring):
             affinity_uuids = [affinity_uuids]
+        return affinity_uuids
+
+    def _get_affinity_hosts(self, filter_properties, affinity_uuids):
+        """Return the set of hosts of the instances in affinity_uuids,
+        looking all of them up at once.
+        """
+        context = filter_properties['context']
+        instances = self.compute_api.get_all(context,
+                                             {'uuid': affinity_uuids,
+                                              'deleted': False})
+        return set(instance['host'] for instance in instances)
+
+
+class _AffinityHostsFilter(AffinityFilter):
+    """Base class of the filters checking whether a host has one of the
+    instances whose uuids are in a scheduler hint.
+    """
+
+    # Name of the scheduler hint with the uuids of the instances.
+    hint = None
+    # Whether hosts with one of the instances pass.
+    passes_with_instance = None
+
+    # Hosts of the instances, looked up by filter_all().
+    _affinity_hosts = None
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        # NOTE: look up the hosts of the instances once for all the hosts
+        # instead of once per host.
+        affinity_uuids = self._get_affinity_uuids(filter_properties,
+                                                  self.hint)
         if affinity_uuids:
-            return not self.compute_api.get_all(context,
-                                                {'host': host_state.host,
-                                                 'uuid': affinity_uuids,
-                                                 'deleted': False})
-        # With no different_host key
-        return True
+            self._affinity_hosts = self._get_affinity_hosts(
+                    filter_properties, affinity_uuids)
+        return super(_AffinityHostsFilter, self).filter_all(
+                filter_obj_list, filter_properties)
+
+    def host_passes(self, host_state, filter_properties):
+        affinity_uuids = self._get_affinity_uuids(filter_properties,
+                                                  self.hint)
+        if not affinity_uuids:
+            # With no hint
+            return True
+        affinity_hosts = self._affinity_hosts
+        if affinity_hosts is None:
+            affinity_hosts = self._get_affinity_hosts(filter_properties,
+                                                      affinity_uuids)
+        has_instance = host_state.host in affinity_hosts
+        return has_instance == self.passes_with_instance
+
+
+class DifferentHostFilter(_AffinityHostsFilter):
+    '''Schedule the instance on a different host from a set of instances.'''
 
+    hint = 'different_host'
+    passes_with_instance = False
 
-class SameHostFilter(AffinityFilter):
+
+class SameHostFilter(_AffinityHostsFilter):
     '''Schedule the instance on the same host as another instance in a set of
     of instances.
     '''
 
-    def host_passes(self, host_state, filter_properties):
-        context = filter_properties['context']
-        scheduler_hints = filter_properties.get('scheduler_hints') or {}
-
-        affinity_uuids = scheduler_hints.get('same_host', [])
-        if isinstance(affinity_uuids, basestring):
-            affinity_uuids = [affinity_uuids]
-        if affinity_uuids:
-            return self.compute_api.get_all(context, {'host': host_state.host,
-                                                      'uuid': affinity_uuids,
-                                                      'deleted': False})
-        # With no same_host key
-        return True
+    hint = 'same_host'
+    passes_with_instance = True
 
 
 class SimpleCIDRAffinityFilter(AffinityFilter):
@@ -53,3 +53,20 @@ class CoreFilter(filters.BaseHostFilter):
             host_state.limits['vcpu'] = vcpus_total
 
         return (vcpus_total - host_state.vcpus_used) >= instance_vcpus
+
+    def filter_columns(self, columns, passing, filter_properties):
+        instance_type = filter_properties.get('instance_type')
+        if not instance_type:
+            return None
+
+        # Hosts with no VCPUs set always pass, as in host_passes().
+        unknown = columns.vcpus_total == 0
+        if unknown.any():
+            LOG.warning(_("VCPUs not set; assuming CPU collection broken"))
+
+        instance_vcpus = instance_type['vcpus']
+        vcpus_total = columns.vcpus_total * CONF.cpu_allocation_ratio
+        passes = unknown | ((vcpus_total - columns.vcpus_used) >=
+                            instance_vcpus)
+        columns.set_limits(~unknown & (vcpus_total > 0), 'vcpu', vcpus_total)
+        return passes
@@ -31,6 +31,18 @@ class ImagePropertiesFilter(filters.BaseHostFilter):
     contained in the image dictionary in the request_spec.
     """
 
+    cache_results = True
+
+    def request_cache_key(self, filter_properties):
+        spec = filter_properties.get('request_spec', {})
+        image_props = spec.get('image', {}).get('properties', {})
+        checked_img_props = (image_props.get('architecture', None),
+                             image_props.get('hypervisor_type', None),
+                             image_props.get('vm_mode', None))
+        if not any(checked_img_props):
+            return None
+        return checked_img_props
+
     def _instance_supported(self, capabilities, image_props):
         img_arch = image_props.get('architecture', None)
         img_h_type = image_props.get('hypervisor_type', None)
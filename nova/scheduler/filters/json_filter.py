@@ -24,6 +24,10 @@ class JsonFilter(filters.BaseHostFilter):
     """Host Filter to allow simple JSON-based grammar for
     selecting hosts.
     """
+
+    # (query string, compiled query) of the last request seen.
+    _compiled = None
+
     def _op_compare(self, args, op):
         """Returns True if the specified operator can successfully
         compare the first item in the args with all the rest. Will
@@ -86,59 +90,91 @@ class JsonFilter(filters.BaseHostFilter):
         'and': _and,
     }
 
-    def _parse_string(self, string, host_state):
+    def _compile_string(self, string):
         """Strings prefixed with $ are capability lookups in the
         form '$variable' where 'variable' is an attribute in the
         HostState class.  If $variable is a dictionary, you may
         use: $variable.dictkey
+
+        Returns a function of a HostState giving the value of the
+        string, or None for empty strings, which are always ignored.
         """
         if not string:
             return None
         if not string.startswith("$"):
-            return string
+            return lambda host_state: string
 
         path = string[1:].split(".")
-        obj = getattr(host_state, path[0], None)
-        if obj is None:
-            return None
-        for item in path[1:]:
-            obj = obj.get(item, None)
-            if obj is None:
-                return None
-        return obj
-
-    def _process_filter(self, query, host_state):
-        """Recursively parse the query structure."""
+        attr = path[0]
+        keys = path[1:]
+        if not keys:
+            return lambda host_state: getattr(host_state, attr, None)
+
+        def lookup(host_state):
+            obj = getattr(host_state, attr, None)
+            for key in keys:
+                if obj is None:
+                    return None
+                obj = obj.get(key, None)
+            return obj
+        return lookup
+
+    def _compile(self, query):
+        """Turn the query structure into a function of a HostState.
+
+        The operators and the paths of the $variables are looked up once
+        here instead of for every host.
+        """
         if not query:
-            return True
-        cmd = query[0]
-        method = self.commands[cmd]
-        cooked_args = []
+            return lambda host_state: True
+        method = self.commands[query[0]]
+        arg_funcs = []
         for arg in query[1:]:
             if isinstance(arg, list):
-                arg = self._process_filter(arg, host_state)
+                arg_funcs.append(self._compile(arg))
             elif isinstance(arg, basestring):
-                arg = self._parse_string(arg, host_state)
-            if arg is not None:
-                cooked_args.append(arg)
-        result = method(self, cooked_args)
-        return result
-
-    def host_passes(self, host_state, filter_properties):
-        """Return a list of hosts that can fulfill the requirements
-        specified in the query.
+                arg_func = self._compile_string(arg)
+                if arg_func is not None:
+                    arg_funcs.append(arg_func)
+            elif arg is not None:
+                arg_funcs.append(lambda host_state, arg=arg: arg)
+
+        def evaluate(host_state):
+            cooked_args = []
+            for arg_func in arg_funcs:
+                arg = arg_func(host_state)
+                if arg is not None:
+                    cooked_args.append(arg)
+            return method(self, cooked_args)
+        return evaluate
+
+    def _get_query(self, filter_properties):
+        """Return the compiled query of the request, or None.
+
+        A filter object is used for all the hosts of a request, so the
+        query is only compiled for the first host.
         """
         try:
             query = filter_properties['scheduler_hints']['query']
         except KeyError:
             query = None
         if not query:
-            return True
+            return None
+        if self._compiled is None or self._compiled[0] != query:
+            self._compiled = (query, self._compile(jsonutils.loads(query)))
+        return self._compiled[1]
 
+    def host_passes(self, host_state, filter_properties):
+        """Return a list of hosts that can fulfill the requirements
+        specified in the query.
+        """
         # NOTE(comstud): Not checking capabilities or service for
         # enabled/disabled so that a provided json filter can decide
 
-        result = self._process_filter(jsonutils.loads(query), host_state)
+        compiled_query = self._get_query(filter_properties)
+        if compiled_query is None:
+            return True
+        result = compiled_query(host_state)
         if isinstance(result, list):
             # If any succeeded, include the host
             result = any(result)
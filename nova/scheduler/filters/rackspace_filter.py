@@ -109,6 +109,55 @@ class RackspaceFilter(filters.BaseHostFilter):
             return False
         return True
 
+    def _columns_pass(self, columns, filter_properties):
+        """Vectorized form of _host_passes()."""
+        passes = ((columns.num_io_ops < CONF.rackspace_max_ios_per_host) &
+                  (columns.num_instances <
+                   CONF.rackspace_max_instances_per_host))
+        if CONF.rackspace_ram_check_enabled:
+            requested_ram = filter_properties['instance_type']['memory_mb']
+            if requested_ram < (8 * 1024):
+                extra_reserve = 1024
+            else:
+                extra_reserve = 0
+            passes &= columns.free_ram_mb >= (requested_ram + extra_reserve)
+
+        if filter_properties['instance_type']['id'] < 100:
+            vm_type = 'pv'
+        else:
+            vm_type = 'hvm'
+        allowed_vm_type = columns.allowed_vm_type
+        passes &= (allowed_vm_type == 'all') | (allowed_vm_type == vm_type)
+        return passes
+
+    def filter_columns(self, columns, passing, filter_properties):
+        """Vectorized form of filter_all()."""
+        scheduler_hints = filter_properties.get('scheduler_hints') or {}
+        if scheduler_hints.get('0z0ne_target_host', None):
+            # Targeted requests are rare, use the per-host path.
+            return None
+
+        # Spares are picked among the hosts which passed the previous
+        # filters too, like filter_all() does over the remaining hosts.
+        passes = self._columns_pass(columns, filter_properties) & passing
+
+        pct_spare = CONF.scheduler_spare_host_percentage
+        if pct_spare:
+            tot_num_hosts = filter_properties['total_hosts']
+            target_spares = tot_num_hosts / pct_spare
+        else:
+            target_spares = 0
+
+        if target_spares > 0:
+            # Reserve the first 'target_spares' empty hosts as spares,
+            # unless that leaves nothing else to choose from.
+            empty_hosts = (passes & (columns.num_instances == 0)).nonzero()[0]
+            spares = empty_hosts[:target_spares]
+            passes[spares] = False
+            if len(spares) and not passes.any():
+                passes[spares[-1]] = True
+        return passes
+
     def filter_all(self, host_states, filter_properties):
         """Entrypoint into the filter.  Beware that 'host_states' can
         be an iterator...
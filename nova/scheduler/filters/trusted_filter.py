@@ -48,12 +48,14 @@ import httplib
 import socket
 import ssl
 
+from eventlet import greenpool
 from oslo.config import cfg
 
 from nova import context
 from nova import db
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
+from nova.openstack.common import loopingcall
 from nova.openstack.common import timeutils
 from nova.scheduler import filters
 
@@ -78,6 +80,22 @@ trusted_opts = [
     cfg.IntOpt('attestation_auth_timeout',
                default=60,
                help='Attestation status cache valid period length'),
+    cfg.IntOpt('attestation_refresh_interval',
+               default=0,
+               help='Number of seconds between two background attestations '
+                    'of the hosts whose status expires before the next one. '
+                    'The filter then never waits for the attestation '
+                    'server, and hosts with an unknown or expired status '
+                    'do not pass. 0 attests the hosts from the filter when '
+                    'their status expires'),
+    cfg.IntOpt('attestation_refresh_concurrency',
+               default=4,
+               help='Number of requests the background attestation sends to '
+                    'the attestation server at once'),
+    cfg.IntOpt('attestation_refresh_batch_size',
+               default=100,
+               help='Most hosts attested by one request of the background '
+                    'attestation'),
 ]
 
 CONF = cfg.CONF
@@ -271,9 +289,84 @@ class ComputeAttestationCache(object):
         return level
 
 
+class RefreshedComputeAttestationCache(ComputeAttestationCache):
+    """Cache for compute node attestation refreshed in the background
+
+    Every attestation_refresh_interval seconds, the hosts whose trust level
+    expires before the next refresh are attested again, in batches of
+    attestation_refresh_batch_size hosts sent by at most
+    attestation_refresh_concurrency concurrent requests.
+
+    get_host_attestation() never polls the OAT service.  Hosts it hasn't
+    seen yet are attested by the next refresh, and hosts whose trust level
+    expired have an 'unknown' trust level until then.
+    """
+
+    def __init__(self):
+        super(RefreshedComputeAttestationCache, self).__init__()
+        self._refresher = None
+
+    def start(self):
+        self._refresher = loopingcall.FixedIntervalLoopingCall(self.refresh)
+        self._refresher.start(
+                CONF.trusted_computing.attestation_refresh_interval)
+
+    def _hosts_to_refresh(self):
+        """Hosts whose trust level expires before the next refresh."""
+        seconds = max(0, CONF.trusted_computing.attestation_auth_timeout -
+                         CONF.trusted_computing.attestation_refresh_interval)
+        return [host for host, entry in self.compute_nodes.items()
+                if timeutils.is_older_than(entry['vtime'], seconds)]
+
+    def _attest(self, hosts):
+        try:
+            return self.attestservice.do_attestation(hosts)
+        except Exception:
+            LOG.exception(_("Failed to attest hosts %s"), hosts)
+            return None
+
+    def refresh(self):
+        hosts = self._hosts_to_refresh()
+        if not hosts:
+            return
+        size = CONF.trusted_computing.attestation_refresh_batch_size
+        batches = [hosts[i:i + size] for i in xrange(0, len(hosts), size)]
+        pool = greenpool.GreenPool(
+                CONF.trusted_computing.attestation_refresh_concurrency)
+        for states in pool.imap(self._attest, batches):
+            # NOTE: hosts the OAT service didn't answer for keep their
+            # trust level until it expires.
+            for state in states or []:
+                self._update_cache_entry(state)
+
+    def get_host_attestation(self, host):
+        """Check host's trust level without waiting for the OAT service."""
+        if host not in self.compute_nodes:
+            self._init_cache_entry(host)
+        if not self._cache_valid(host):
+            return 'unknown'
+        return self.compute_nodes[host]['trust_lvl']
+
+
+# The cache shared by all the TrustedFilters when it is refreshed in the
+# background.
+_refreshed_cache = None
+
+
+def _get_refreshed_cache():
+    global _refreshed_cache
+    if _refreshed_cache is None:
+        _refreshed_cache = RefreshedComputeAttestationCache()
+        _refreshed_cache.start()
+    return _refreshed_cache
+
+
 class ComputeAttestation(object):
     def __init__(self):
-        self.caches = ComputeAttestationCache()
+        if CONF.trusted_computing.attestation_refresh_interval > 0:
+            self.caches = _get_refreshed_cache()
+        else:
+            self.caches = ComputeAttestationCache()
 
     def is_trusted(self, host, trust):
         level = self.caches.get_host_attestation(host)
@@ -16,6 +16,7 @@
 
 from nova import db
 from nova.scheduler import filters
+from nova.scheduler.filters import utils
 
 
 class TypeAffinityFilter(filters.BaseHostFilter):
@@ -25,6 +26,35 @@ class TypeAffinityFilter(filters.BaseHostFilter):
     (spread) set to 1 (default).
     """
 
+    cache_results = True
+
+    def request_cache_key(self, filter_properties):
+        return filter_properties.get('instance_type')['id']
+
+    def host_cache_key(self, host_state):
+        # The instances on the host may change whenever the host is
+        # updated or has an instance scheduled to it.
+        return host_state.updated
+
+    # Hosts with instances of other types, looked up by filter_all().
+    _other_type_hosts = None
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        # NOTE: the hosts with instances of other types are looked up on
+        # the first host whose result isn't cached, once for all the hosts.
+        self._other_type_hosts = None
+        return super(TypeAffinityFilter, self).filter_all(filter_obj_list,
+                                                          filter_properties)
+
+    def _filter_one(self, host_state, filter_properties):
+        if self._other_type_hosts is None:
+            instance_type = filter_properties.get('instance_type')
+            context = filter_properties['context'].elevated()
+            self._other_type_hosts = set(
+                    db.instance_get_all_hosts_by_not_type(
+                            context, instance_type['id']))
+        return host_state.host not in self._other_type_hosts
+
     def host_passes(self, host_state, filter_properties):
         """Dynamically limits hosts to one instance type
 
@@ -46,10 +76,15 @@ class AggregateTypeAffinityFilter(filters.BaseHostFilter):
     key 'instance_type' has the instance_type name as a value
     """
 
+    cache_results = True
+    uses_aggregate_metadata = True
+
+    def request_cache_key(self, filter_properties):
+        return filter_properties.get('instance_type')['name']
+
     def host_passes(self, host_state, filter_properties):
         instance_type = filter_properties.get('instance_type')
-        context = filter_properties['context'].elevated()
-        metadata = db.aggregate_metadata_get_by_host(
-                     context, host_state.host, key='instance_type')
+        metadata = utils.aggregate_metadata_get_by_host(
+                filter_properties, host_state.host, key='instance_type')
         return (len(metadata) == 0 or
                 instance_type['name'] in metadata['instance_type'])
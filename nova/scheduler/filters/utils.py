@@ -0,0 +1,38 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Utility methods shared by host filters."""
+
+from nova import db
+
+
+def aggregate_metadata_get_by_host(filter_properties, host, key=None):
+    """Return the metadata of the aggregates a host belongs to.
+
+    Uses the metadata prefetched for all hosts in
+    filter_properties['host_aggregate_metadata'] when it is there, and
+    asks the db otherwise.  Values are sets, like the ones returned by
+    db.aggregate_metadata_get_by_host(), and must not be modified.
+    """
+    metadata_by_host = filter_properties.get('host_aggregate_metadata')
+    if metadata_by_host is None:
+        context = filter_properties['context'].elevated()
+        return db.aggregate_metadata_get_by_host(context, host, key=key)
+    metadata = metadata_by_host.get(host, {})
+    if key is None or not metadata:
+        return metadata
+    if key not in metadata:
+        return {}
+    return {key: metadata[key]}
@@ -0,0 +1,154 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar view of host states used by the vectorized filter/weigh engine.
+
+Filters and weighers that know how to work on whole columns implement
+filter_columns() or _weigh_columns(); all others fall back to the usual
+per-HostState path.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from oslo.config import cfg
+
+from nova.openstack.common import log as logging
+
+host_columns_opts = [
+    cfg.BoolOpt('scheduler_use_vectorized_engine',
+                default=False,
+                help='Run filters and weighers that support it over NumPy '
+                     'arrays of host state fields instead of one host at '
+                     'a time. Requires numpy'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(host_columns_opts)
+
+LOG = logging.getLogger(__name__)
+
+_warned_no_numpy = False
+
+
+def enabled():
+    """Return True if the vectorized engine should be used."""
+    global _warned_no_numpy
+    if not CONF.scheduler_use_vectorized_engine:
+        return False
+    if numpy is None:
+        if not _warned_no_numpy:
+            LOG.warn(_("scheduler_use_vectorized_engine is set but numpy "
+                       "is not installed, using per-host filtering"))
+            _warned_no_numpy = True
+        return False
+    return True
+
+
+def best_indexes(weights, num_best=None):
+    """Return the indexes of the num_best highest weights, highest first.
+
+    Equal weights keep their original order, like sorted() does.  Uses a
+    partial selection instead of sorting all the weights when num_best is
+    smaller than the number of weights.
+    """
+    if num_best is None or num_best >= len(weights):
+        # NOTE: a stable sort of the negated weights keeps hosts with
+        # equal weights in their original order.
+        return numpy.argsort(-weights, kind='mergesort')
+    if num_best < 1:
+        return numpy.array([], dtype=int)
+    kth_weight = -numpy.partition(-weights, num_best - 1)[num_best - 1]
+    above = numpy.flatnonzero(weights > kth_weight)
+    ties = numpy.flatnonzero(weights == kth_weight)[:num_best - len(above)]
+    indexes = numpy.sort(numpy.concatenate((above, ties)))
+    return indexes[numpy.argsort(-weights[indexes], kind='mergesort')]
+
+
+class HostStateColumns(object):
+    """The numeric HostState fields of a list of hosts, one array per field.
+
+    Index i of every array refers to host_states[i].  Per-project and
+    per-os_type counts are gathered the first time they're asked for.
+    """
+
+    fields = ('free_ram_mb', 'total_usable_ram_mb', 'free_disk_mb',
+              'total_usable_disk_gb', 'vcpus_total', 'vcpus_used',
+              'num_instances', 'num_io_ops')
+
+    def __init__(self, host_states):
+        self.host_states = list(host_states)
+        for field in self.fields:
+            values = [getattr(host_state, field, 0) or 0
+                      for host_state in self.host_states]
+            setattr(self, field, numpy.array(values, dtype=numpy.float64))
+        self._allowed_vm_type = None
+        self._num_instances_by_project = {}
+        self._num_instances_by_os_type = {}
+        self._num_instances_all_os_types = None
+
+    def __len__(self):
+        return len(self.host_states)
+
+    def zeros(self):
+        return numpy.zeros(len(self.host_states), dtype=numpy.float64)
+
+    @property
+    def allowed_vm_type(self):
+        if self._allowed_vm_type is None:
+            self._allowed_vm_type = numpy.array(
+                    [host_state.allowed_vm_type
+                     for host_state in self.host_states], dtype=object)
+        return self._allowed_vm_type
+
+    def num_instances_for_project(self, project_id):
+        try:
+            return self._num_instances_by_project[project_id]
+        except KeyError:
+            values = numpy.array(
+                    [host_state.num_instances_by_project.get(project_id, 0)
+                     for host_state in self.host_states],
+                    dtype=numpy.float64)
+            self._num_instances_by_project[project_id] = values
+            return values
+
+    def num_instances_for_os_type(self, os_type):
+        try:
+            return self._num_instances_by_os_type[os_type]
+        except KeyError:
+            values = numpy.array(
+                    [host_state.num_instances_by_os_type.get(os_type, 0)
+                     for host_state in self.host_states],
+                    dtype=numpy.float64)
+            self._num_instances_by_os_type[os_type] = values
+            return values
+
+    def num_instances_for_other_os_types(self, os_type):
+        """Number of instances on each host with an os_type != os_type."""
+        if self._num_instances_all_os_types is None:
+            self._num_instances_all_os_types = numpy.array(
+                    [sum(host_state.num_instances_by_os_type.itervalues())
+                     for host_state in self.host_states],
+                    dtype=numpy.float64)
+        return (self._num_instances_all_os_types -
+                self.num_instances_for_os_type(os_type))
+
+    def set_limits(self, mask, key, values):
+        """Save an oversubscription limit on every host selected by mask."""
+        for index in numpy.flatnonzero(mask):
+            self.host_states[index].limits[key] = float(values[index])
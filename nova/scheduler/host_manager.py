@@ -51,6 +51,18 @@ host_manager_opts = [
     cfg.ListOpt('scheduler_weight_classes',
                 default=['nova.scheduler.weights.all_weighers'],
                 help='Which weight class names to use for weighing hosts'),
+    cfg.BoolOpt('scheduler_incremental_host_states',
+                default=False,
+                help='Keep host states in memory between requests and only '
+                     'refresh the compute nodes that changed since the '
+                     'last refresh, instead of reloading every compute '
+                     'node for each request'),
+    cfg.IntOpt('scheduler_host_states_resync_interval',
+               default=300,
+               help='Number of seconds between full reloads of all compute '
+                    'nodes when scheduler_incremental_host_states is '
+                    'enabled. A value of 0 or less forces a full reload '
+                    'for every request'),
     ]
 
 CONF = cfg.CONF
@@ -91,20 +103,53 @@ class ReadOnlyDict(UserDict.IterableUserDict):
             raise TypeError
 
 
+# Compute node stats counted per item, and the HostState attribute
+# holding the counts.  e.g. 'num_proj_<project_id>'.
+_STAT_PREFIXES = (('num_proj_', 'num_instances_by_project'),
+                  ('num_vm_', 'vm_states'),
+                  ('num_task_', 'task_states'),
+                  ('num_os_type_', 'num_instances_by_os_type'))
+
+# Service record fields that change every time the service reports in.
+_SERVICE_REPORT_KEYS = ('updated_at', 'report_count')
+
+
+def _service_fields(service):
+    return dict((key, value) for key, value in service.iteritems()
+                if key not in _SERVICE_REPORT_KEYS)
+
+
 class HostState(object):
     """Mutable and immutable information tracked for a host.
     This is an attempt to remove the ad-hoc data structures
     previously used and lock down access.
     """
 
+    # NOTE: the scheduler keeps one HostState per compute node, so don't
+    # give every instance a __dict__.  Subclasses that don't define
+    # __slots__ still get one.
+    __slots__ = ('host', 'nodename', 'capabilities', 'service',
+                 'total_usable_disk_gb', 'total_usable_ram_mb',
+                 'disk_mb_used', 'free_ram_mb', 'free_disk_mb',
+                 'vcpus_total', 'vcpus_used', 'allowed_vm_type',
+                 'vm_states', 'task_states', 'num_instances',
+                 'num_instances_by_project', 'num_instances_by_os_type',
+                 'num_io_ops', 'limits', 'updated', 'filter_cache',
+                 'compute_id', 'generation')
+
     def __init__(self, host, node, capabilities=None, service=None):
         self.host = host
         self.nodename = node
+        self.capabilities = None
+        self.service = None
+        # Cached filter results, see BaseHostFilter.cache_results.
+        self.filter_cache = {}
         self.update_capabilities(capabilities, service)
 
         # Mutable available resources.
         # These will change as resources are virtually "consumed".
         self.total_usable_disk_gb = 0
+        self.total_usable_ram_mb = 0
         self.disk_mb_used = 0
         self.free_ram_mb = 0
         self.free_disk_mb = 0
@@ -129,15 +174,33 @@ class HostState(object):
 
         self.updated = None
 
+        # The compute node, and its generation when it was last read.
+        self.compute_id = None
+        self.generation = None
+
     def update_capabilities(self, capabilities=None, service=None):
-        # Read-only capability dicts
+        # Read-only capability dicts.  These are only rebuilt when the
+        # capabilities or service actually changed, which also drops the
+        # cached filter results.
 
         if capabilities is None:
             capabilities = {}
-        self.capabilities = ReadOnlyDict(capabilities)
+        if (self.capabilities is None or
+                (self.capabilities.data is not capabilities and
+                 self.capabilities.data != capabilities)):
+            self.capabilities = ReadOnlyDict(capabilities)
+            self.filter_cache = {}
         if service is None:
             service = {}
-        self.service = ReadOnlyDict(service)
+        if (self.service is None or
+                (self.service.data is not service and
+                 self.service.data != service)):
+            # NOTE: services update their record on every report, so
+            # only a change besides that invalidates the filter results.
+            if (self.service is None or
+                    _service_fields(self.service) != _service_fields(service)):
+                self.filter_cache = {}
+            self.service = ReadOnlyDict(service)
 
     def update_from_compute_node(self, compute):
         """Update information about a host from its compute_node info."""
@@ -161,40 +224,37 @@ class HostState(object):
         self.vcpus_total = compute['vcpus']
         self.vcpus_used = compute['vcpus_used']
         self.updated = compute['updated_at']
+        self.compute_id = compute.get('id')
+        self.generation = compute.get('generation')
 
-        stats = compute.get('stats', [])
-        statmap = self._statmap(stats)
-
-        # Track number of instances on host
-        self.num_instances = int(statmap.get('num_instances', 0))
-
-        # Track number of instances by project_id
-        project_id_keys = [k for k in statmap.keys() if
-                k.startswith("num_proj_")]
-        for key in project_id_keys:
-            project_id = key[9:]
-            self.num_instances_by_project[project_id] = int(statmap[key])
+        self._update_from_stats(compute.get('stats', []))
 
-        # Track number of instances in certain vm_states
-        vm_state_keys = [k for k in statmap.keys() if k.startswith("num_vm_")]
-        for key in vm_state_keys:
-            vm_state = key[7:]
-            self.vm_states[vm_state] = int(statmap[key])
+    def _update_from_stats(self, stats):
+        """Read the compute node stats in a single pass.
 
-        # Track number of instances in certain task_states
-        task_state_keys = [k for k in statmap.keys() if
-                k.startswith("num_task_")]
-        for key in task_state_keys:
-            task_state = key[9:]
-            self.task_states[task_state] = int(statmap[key])
-
-        # Track number of instances by host_type
-        os_keys = [k for k in statmap.keys() if k.startswith("num_os_type_")]
-        for key in os_keys:
-            os = key[12:]
-            self.num_instances_by_os_type[os] = int(statmap[key])
-
-        self.num_io_ops = int(statmap.get('io_workload', 0))
+        Tracks the number of instances on the host, the number of
+        instances by project_id, vm_state, task_state and os_type, and
+        the number of I/O heavy operations.
+        """
+        num_instances = 0
+        num_io_ops = 0
+        counts = dict((attr, {}) for prefix, attr in _STAT_PREFIXES)
+        for stat in stats:
+            key = stat['key']
+            if key == 'num_instances':
+                num_instances = int(stat['value'])
+            elif key == 'io_workload':
+                num_io_ops = int(stat['value'])
+            elif key.startswith('num_'):
+                for prefix, attr in _STAT_PREFIXES:
+                    if key.startswith(prefix):
+                        counts[attr][key[len(prefix):]] = int(stat['value'])
+                        break
+
+        self.num_instances = num_instances
+        self.num_io_ops = num_io_ops
+        for attr, values in counts.iteritems():
+            setattr(self, attr, values)
 
     def consume_from_instance(self, instance):
         """Incrementally update host state from an instance."""
@@ -241,9 +301,6 @@ class HostState(object):
                 task_states.IMAGE_BACKUP]:
             self.num_io_ops += 1
 
-    def _statmap(self, stats):
-        return dict((st['key'], st['value']) for st in stats)
-
     def __repr__(self):
         return ("(%s, %s) ram:%s disk:%s io_ops:%s instances:%s vm_type:%s" %
                 (self.host, self.nodename, self.free_ram_mb, self.free_disk_mb,
@@ -260,6 +317,11 @@ class HostManager(object):
         # { (host, hypervisor_hostname) : { <service> : { cap k : v }}}
         self.service_states = {}
         self.host_state_map = {}
+        # Used by the incremental host state refresh.
+        # { compute node id : (host, hypervisor_hostname) }
+        self._compute_node_state_keys = {}
+        self._last_full_sync = None
+        self._changes_since = None
         self.filter_handler = filters.HostFilterHandler()
         self.filter_classes = self.filter_handler.get_matching_classes(
                 CONF.scheduler_available_filters)
@@ -367,13 +429,23 @@ class HostManager(object):
                     return name_to_cls_map.values()
             hosts = name_to_cls_map.itervalues()
 
+        if ('host_aggregate_metadata' not in filter_properties and
+                any(cls.uses_aggregate_metadata for cls in filter_classes)):
+            # Read the aggregate metadata of all hosts at once instead of
+            # having the filters query it for every host.
+            context = filter_properties['context'].elevated()
+            filter_properties['host_aggregate_metadata'] = (
+                    db.aggregate_metadata_get_all_by_host(context))
+
         return self.filter_handler.get_filtered_objects(filter_classes,
                 hosts, filter_properties)
 
-    def get_weighed_hosts(self, hosts, weight_properties):
-        """Weigh the hosts."""
+    def get_weighed_hosts(self, hosts, weight_properties, num_best=None):
+        """Weigh the hosts.  If num_best is given, only return that many
+        of the best weighed hosts.
+        """
         return self.weight_handler.get_weighed_objects(self.weight_classes,
-                hosts, weight_properties)
+                hosts, weight_properties, num_best=num_best)
 
     def update_service_capabilities(self, service_name, host, capabilities):
         """Update the per-service capabilities based on this notification."""
@@ -391,42 +463,116 @@ class HostManager(object):
         capab_copy["timestamp"] = timeutils.utcnow()  # Reported time
         self.service_states[state_key] = capab_copy
 
-    def get_all_host_states(self, context):
-        """Returns a list of HostStates that represents all the hosts
-        the HostManager knows about. Also, each of the consumable resources
-        in HostState are pre-populated and adjusted based on data in the db.
-        """
+        # Host states are kept between requests when refreshing
+        # incrementally, so apply the new capabilities right away.
+        host_state = self.host_state_map.get(state_key)
+        if host_state and CONF.scheduler_incremental_host_states:
+            host_state.update_capabilities(capab_copy,
+                                           host_state.service.data)
+
+    def _update_host_state_from_compute_node(self, compute):
+        """Create or refresh the HostState for a compute node.
 
-        # Get resource usage across the available compute nodes:
+        Returns the state key of the HostState, or None if the compute
+        node has no service.
+        """
+        service = compute['service']
+        if not service:
+            LOG.warn(_("No service for compute ID %s") % compute['id'])
+            return None
+        host = service['host']
+        node = compute.get('hypervisor_hostname')
+        state_key = (host, node)
+        capabilities = self.service_states.get(state_key, None)
+        host_state = self.host_state_map.get(state_key)
+        if host_state:
+            host_state.update_capabilities(capabilities,
+                                           dict(service.iteritems()))
+        else:
+            host_state = self.host_state_cls(host, node,
+                    capabilities=capabilities,
+                    service=dict(service.iteritems()))
+            self.host_state_map[state_key] = host_state
+        host_state.update_from_compute_node(compute)
+        self._compute_node_state_keys[compute['id']] = state_key
+        return state_key
+
+    def _remove_host_state(self, state_key):
+        host, node = state_key
+        LOG.info(_("Removing dead compute node %(host)s:%(node)s "
+                   "from scheduler") % locals())
+        del self.host_state_map[state_key]
+
+    def _sync_all_host_states(self, context):
+        """Reload every compute node and drop the ones that went away."""
         compute_nodes = db.compute_node_get_all(context)
+        self._compute_node_state_keys = {}
         seen_nodes = set()
         for compute in compute_nodes:
-            service = compute['service']
-            if not service:
-                LOG.warn(_("No service for compute ID %s") % compute['id'])
-                continue
-            host = service['host']
-            node = compute.get('hypervisor_hostname')
-            state_key = (host, node)
-            capabilities = self.service_states.get(state_key, None)
-            host_state = self.host_state_map.get(state_key)
-            if host_state:
-                host_state.update_capabilities(capabilities,
-                                               dict(service.iteritems()))
-            else:
-                host_state = self.host_state_cls(host, node,
-                        capabilities=capabilities,
-                        service=dict(service.iteritems()))
-                self.host_state_map[state_key] = host_state
-            host_state.update_from_compute_node(compute)
-            seen_nodes.add(state_key)
+            state_key = self._update_host_state_from_compute_node(compute)
+            if state_key:
+                seen_nodes.add(state_key)
 
         # remove compute nodes from host_state_map if they are not active
         dead_nodes = set(self.host_state_map.keys()) - seen_nodes
         for state_key in dead_nodes:
-            host, node = state_key
-            LOG.info(_("Removing dead compute node %(host)s:%(node)s "
-                       "from scheduler") % locals())
-            del self.host_state_map[state_key]
+            self._remove_host_state(state_key)
+
+    def _sync_changed_host_states(self, context, since):
+        """Refresh only the compute nodes that changed since a timestamp,
+        and the services of all the compute nodes.
+        """
+        compute_nodes = db.compute_node_get_all_changed_since(context, since)
+        for compute in compute_nodes:
+            if not compute['deleted']:
+                self._update_host_state_from_compute_node(compute)
+                continue
+            # NOTE: the service is not loaded for deleted compute nodes,
+            # so look the host state up by compute node id.
+            state_key = self._compute_node_state_keys.pop(compute['id'],
+                                                          None)
+            if state_key in self.host_state_map:
+                self._remove_host_state(state_key)
+
+        # Services update their own row, not the compute node's, on each
+        # heartbeat and when they are disabled, so read them all: the up
+        # and disabled checks of the filters must not go stale.
+        services = dict((service['id'], service)
+                        for service in db.service_get_all(context))
+        for host_state in self.host_state_map.itervalues():
+            service = services.get(host_state.service.get('id'))
+            if service:
+                host_state.update_capabilities(host_state.capabilities.data,
+                                               dict(service.iteritems()))
+
+    def _need_full_host_state_sync(self):
+        if not CONF.scheduler_incremental_host_states:
+            return True
+        if self._last_full_sync is None or self._changes_since is None:
+            return True
+        interval = CONF.scheduler_host_states_resync_interval
+        return (interval <= 0 or
+                timeutils.is_older_than(self._last_full_sync, interval))
+
+    def get_all_host_states(self, context):
+        """Returns a list of HostStates that represents all the hosts
+        the HostManager knows about. Also, each of the consumable resources
+        in HostState are pre-populated and adjusted based on data in the db.
+
+        When scheduler_incremental_host_states is enabled, only compute
+        nodes that changed since the previous call are read from the db,
+        along with the services.
+        Every scheduler_host_states_resync_interval seconds a full reload
+        is still done in case a change was missed.
+        """
+        # NOTE: take the timestamp before reading from the db so that
+        # changes committed while the query runs are picked up next time.
+        now = timeutils.utcnow()
+        if self._need_full_host_state_sync():
+            self._sync_all_host_states(context)
+            self._last_full_sync = now
+        else:
+            self._sync_changed_host_states(context, self._changes_since)
+        self._changes_since = now
 
         return self.host_state_map.itervalues()
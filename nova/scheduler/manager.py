@@ -59,7 +59,7 @@ QUOTAS = quota.QUOTAS
 class SchedulerManager(manager.Manager):
     """Chooses a host to run instances on."""
 
-    RPC_API_VERSION = '2.6'
+    RPC_API_VERSION = '2.7'
 
     def __init__(self, scheduler_driver=None, *args, **kwargs):
         if not scheduler_driver:
@@ -311,3 +311,7 @@ class SchedulerManager(manager.Manager):
         hosts = self.driver.select_hosts(context, request_spec,
             filter_properties)
         return jsonutils.to_primitive(hosts)
+
+    def get_timings(self, context):
+        """Returns how long scheduling requests and their steps took."""
+        return self.driver.get_timings()
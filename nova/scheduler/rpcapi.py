@@ -58,6 +58,7 @@ class SchedulerAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                 - accepts a list of capabilities
         2.5 - Add get_backdoor_port()
         2.6 - Add select_hosts()
+        2.7 - Add get_timings()
     '''
 
     #
@@ -118,3 +119,6 @@ class SchedulerAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                 request_spec=request_spec,
                 filter_properties=filter_properties),
                 version='2.6')
+
+    def get_timings(self, ctxt):
+        return self.call(ctxt, self.make_msg('get_timings'), version='2.7')
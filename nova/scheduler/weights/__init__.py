@@ -19,6 +19,7 @@ Scheduler host weights
 
 from oslo.config import cfg
 
+from nova.scheduler import host_columns
 from nova import weights
 
 CONF = cfg.CONF
@@ -37,7 +38,24 @@ class WeighedHost(weights.WeighedObject):
 
 class BaseHostWeigher(weights.BaseWeigher):
     """Base class for host weights."""
-    pass
+    def _weigh_columns(self, columns, weight_properties):
+        """Override in a subclass to return an array of weights for all
+        hosts in a HostStateColumns.  Return None if the weigher has no
+        vectorized form.
+        """
+        return None
+
+    def weigh_columns(self, columns, weights, weight_properties):
+        """Add this weigher's weights to the 'weights' array in place.
+        Override in a subclass if you need access to all weights.
+
+        Returns False if the weigher has no vectorized form.
+        """
+        host_weights = self._weigh_columns(columns, weight_properties)
+        if host_weights is None:
+            return False
+        weights += self._weight_multiplier() * host_weights
+        return True
 
 
 class HostWeightHandler(weights.BaseWeightHandler):
@@ -46,6 +64,46 @@ class HostWeightHandler(weights.BaseWeightHandler):
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
 
+    def get_weighed_objects(self, weigher_classes, obj_list,
+            weighing_properties, num_best=None):
+        if not obj_list or not host_columns.enabled():
+            return super(HostWeightHandler, self).get_weighed_objects(
+                    weigher_classes, obj_list, weighing_properties,
+                    num_best=num_best)
+        return self._get_weighed_objects_vectorized(weigher_classes,
+                obj_list, weighing_properties, num_best)
+
+    def _get_weighed_objects_vectorized(self, weigher_classes, obj_list,
+            weighing_properties, num_best):
+        """Weigh hosts with array operations over a HostStateColumns.
+
+        Weighers without a vectorized form are run over WeighedHosts
+        built from the weights so far, in the configured order.
+        """
+        numpy = host_columns.numpy
+        columns = host_columns.HostStateColumns(obj_list)
+        host_states = columns.host_states
+        weights = numpy.zeros(len(columns), dtype=numpy.float64)
+        for weigher_cls in weigher_classes:
+            with self.timings.timer(weigher_cls.__name__):
+                weights = self._weigh_vectorized(weigher_cls(), columns,
+                                                 weights, weighing_properties)
+
+        order = host_columns.best_indexes(weights, num_best)
+        return [self.object_class(host_states[index], float(weights[index]))
+                for index in order]
+
+    def _weigh_vectorized(self, weigher, columns, weights,
+            weighing_properties):
+        """Add the weights of one weigher and return the new weights."""
+        if weigher.weigh_columns(columns, weights, weighing_properties):
+            return weights
+        weighed_objs = [self.object_class(obj, float(weight))
+                        for obj, weight in zip(columns.host_states, weights)]
+        weigher.weigh_objects(weighed_objs, weighing_properties)
+        return host_columns.numpy.array([x.weight for x in weighed_objs],
+                                        dtype=host_columns.numpy.float64)
+
 
 def all_weighers():
     """Return a list of weight plugin classes found in this directory."""
@@ -19,7 +19,9 @@ import random
 
 from oslo.config import cfg
 
+from nova.scheduler import host_columns
 from nova.scheduler import weights
+from nova import weights as base_weights
 
 
 rackspace_weight_opts = [
@@ -51,6 +53,9 @@ class RAXInstancesHostWeigher(weights.BaseHostWeigher):
         """
         return host_state.num_instances
 
+    def _weigh_columns(self, columns, weight_properties):
+        return columns.num_instances
+
 
 class RAXProjectHostWeigher(weights.BaseHostWeigher):
     def _weight_multiplier(self):
@@ -68,6 +73,12 @@ class RAXProjectHostWeigher(weights.BaseHostWeigher):
             num_instances = 0
         return -num_instances
 
+    def _weigh_columns(self, columns, weight_properties):
+        if 'project_id' not in weight_properties:
+            return columns.zeros()
+        return -columns.num_instances_for_project(
+                weight_properties['project_id'])
+
 
 class RAXOSTypeHostWeigher(weights.BaseHostWeigher):
     def _weight_multiplier(self):
@@ -92,6 +103,10 @@ class RAXOSTypeHostWeigher(weights.BaseHostWeigher):
                         if key != os_type])
         return -other_type_num_instances
 
+    def _weigh_columns(self, columns, weight_properties):
+        return -columns.num_instances_for_other_os_types(
+                weight_properties['os_type'])
+
 
 class RAXFuzzHostWeigher(weights.BaseHostWeigher):
     """Use this last in the list of Weighers to modify the top 'x'
@@ -101,14 +116,23 @@ class RAXFuzzHostWeigher(weights.BaseHostWeigher):
     def weigh_objects(self, weighed_obj_list, weight_properties):
         if not CONF.rax_randomize_top_hosts:
             return
-        sorted_objs = sorted(weighed_obj_list, key=lambda x: x.weight,
-                reverse=True)
-        num_hosts = min(CONF.rax_randomize_top_hosts, len(sorted_objs))
-        top_weights = [x.weight for x in sorted_objs[:num_hosts]]
+        top_objs = base_weights.best_weighed_objects(weighed_obj_list,
+                CONF.rax_randomize_top_hosts)
+        top_weights = [x.weight for x in top_objs]
         random.shuffle(top_weights)
         # Modify the weights.
-        for x in xrange(num_hosts):
-            sorted_objs[x].weight = top_weights[x]
+        for x in xrange(len(top_objs)):
+            top_objs[x].weight = top_weights[x]
+
+    def weigh_columns(self, columns, weights, weight_properties):
+        if not CONF.rax_randomize_top_hosts:
+            return True
+        top_indexes = host_columns.best_indexes(weights,
+                CONF.rax_randomize_top_hosts)
+        top_weights = list(weights[top_indexes])
+        random.shuffle(top_weights)
+        weights[top_indexes] = top_weights
+        return True
 
 
 def get_weighers():
@@ -0,0 +1,117 @@
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+ServiceGroup driver keeping the heartbeats in the database, written in
+batches by the conductor.
+
+Services send their heartbeats to the conductor, which coalesces the ones
+received within conductor.heartbeat_flush_interval into one update of the
+services table.  is_up() and get_all() are answered from the up and down
+hosts of each group, computed when the services of the group are read,
+at most once per conductor.heartbeat_flush_interval.
+"""
+
+from oslo.config import cfg
+
+from nova import context
+from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
+from nova.servicegroup.drivers import db
+from nova import utils
+
+
+CONF = cfg.CONF
+CONF.import_opt('service_down_time', 'nova.service')
+CONF.import_opt('heartbeat_flush_interval', 'nova.conductor.api',
+                group='conductor')
+
+LOG = logging.getLogger(__name__)
+
+
+class BatchedDbDriver(db.DbDriver):
+
+    def __init__(self, *args, **kwargs):
+        super(BatchedDbDriver, self).__init__(*args, **kwargs)
+        # The up and down hosts of the groups, and when they were read.
+        self._groups = {}
+
+    def is_up(self, service_ref):
+        """Check whether a service is up based on the last heartbeat
+        read for its group.  Services unknown to the group when it was
+        read fall back to the heartbeat of service_ref.
+        """
+        up_hosts, down_hosts = self._get_group(service_ref['topic'])
+        host = service_ref['host']
+        if host in up_hosts:
+            return True
+        if host in down_hosts:
+            return False
+        return super(BatchedDbDriver, self).is_up(service_ref)
+
+    def get_all(self, group_id):
+        """
+        Returns ALL members of the given group
+        """
+        LOG.debug(_('Batched_DB_Driver: get_all members of the %s group') %
+                  group_id)
+        up_hosts, _down_hosts = self._get_group(group_id)
+        return list(up_hosts)
+
+    def _get_group(self, group_id):
+        """Returns the sets of the up and the down hosts of a group,
+        reading its services again when they are older than the heartbeat
+        flush interval.
+        """
+        group = self._groups.get(group_id)
+        if group and not timeutils.is_older_than(
+                group['read_at'], CONF.conductor.heartbeat_flush_interval):
+            return group['up_hosts'], group['down_hosts']
+
+        ctxt = context.get_admin_context()
+        services = self.conductor_api.service_get_all_by_topic(ctxt,
+                                                               group_id)
+        now = timeutils.utcnow()
+        up_hosts = set()
+        down_hosts = set()
+        for service in services:
+            last_heartbeat = service['updated_at'] or service['created_at']
+            if isinstance(last_heartbeat, basestring):
+                last_heartbeat = timeutils.parse_strtime(last_heartbeat)
+            elapsed = utils.total_seconds(now - last_heartbeat)
+            if abs(elapsed) <= CONF.service_down_time:
+                up_hosts.add(service['host'])
+            else:
+                down_hosts.add(service['host'])
+        self._groups[group_id] = {'read_at': now,
+                                  'up_hosts': up_hosts,
+                                  'down_hosts': down_hosts}
+        return up_hosts, down_hosts
+
+    def _report_state(self, service):
+        """Send a heartbeat of this service to the conductor.
+
+        The heartbeat is a call, which times out after the report interval
+        when the conductor is away, so that it is noticed.
+        """
+        ctxt = context.get_admin_context()
+        try:
+            self.conductor_api.service_heartbeat(
+                    ctxt, service.service_ref,
+                    timeout=service.report_interval or None)
+        except Exception:
+            self._model_disconnected(service)
+        else:
+            self._model_connected(service)
@@ -93,13 +93,21 @@ class DbDriver(api.ServiceGroupDriver):
             service.service_ref = self.conductor_api.service_update(ctxt,
                     service.service_ref, state_catalog)
 
-            # TODO(termie): make this pattern be more elegant.
-            if getattr(service, 'model_disconnected', False):
-                service.model_disconnected = False
-                LOG.error(_('Recovered model server connection!'))
+            self._model_connected(service)
 
         # TODO(vish): this should probably only catch connection errors
         except Exception:  # pylint: disable=W0702
-            if not getattr(service, 'model_disconnected', False):
-                service.model_disconnected = True
-                LOG.exception(_('model server went away'))
+            self._model_disconnected(service)
+
+    # TODO(termie): make this pattern be more elegant.
+    def _model_connected(self, service):
+        """Log when the state of a service is reported again."""
+        if getattr(service, 'model_disconnected', False):
+            service.model_disconnected = False
+            LOG.error(_('Recovered model server connection!'))
+
+    def _model_disconnected(self, service):
+        """Log the first failure to report the state of a service."""
+        if not getattr(service, 'model_disconnected', False):
+            service.model_disconnected = True
+            LOG.exception(_('model server went away'))
@@ -44,12 +44,14 @@ from nova import exception
 from nova.image import s3
 from nova.network import api as network_api
 from nova.network import quantumv2
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import rpc
 from nova import test
 from nova.tests.api.openstack.compute.contrib import (
     test_quantum_security_groups as test_quantum)
 from nova.tests import fake_network
+from nova.tests import fake_policy
 from nova.tests.image import fake
 from nova.tests import matchers
 from nova import utils
@@ -824,6 +826,71 @@ class CloudTestCase(test.TestCase):
         db.service_destroy(self.context, comp1['id'])
         db.service_destroy(self.context, comp2['id'])
 
+    def test_describe_instances_bulk_lookups(self):
+        # Makes sure describe_instances does not look the instances up
+        # one at a time.
+        self._stub_instance_get_with_fixed_ips('get_all')
+        ec2utils.reset_cache()
+
+        image_uuid = 'cedef40a-ed67-4d10-800e-17455edce175'
+        sys_meta = flavors.save_instance_type_info(
+            {}, flavors.get_instance_type(1))
+        instances = []
+        for i in xrange(3):
+            instances.append(db.instance_create(self.context,
+                    {'reservation_id': 'a',
+                     'image_ref': image_uuid,
+                     'instance_type_id': 1,
+                     'host': 'host1',
+                     'vm_state': 'active',
+                     'metadata': {'key': 'value%d' % i},
+                     'system_metadata': sys_meta}))
+
+        def fake_one_at_a_time(*args, **kwargs):
+            self.fail('Instance looked up on its own')
+
+        for name in ('get_ec2_instance_id_by_uuid', 'instance_metadata_get',
+                     'block_device_mapping_get_all_by_instance'):
+            self.stubs.Set(db, name, fake_one_at_a_time)
+        hosts = []
+        real_get_by_host = db.aggregate_metadata_get_by_host
+
+        def fake_aggregate_metadata_get_by_host(context, host, key=None):
+            hosts.append(host)
+            return real_get_by_host(context, host, key=key)
+
+        self.stubs.Set(db, 'aggregate_metadata_get_by_host',
+                       fake_aggregate_metadata_get_by_host)
+
+        result = self.cloud.describe_instances(self.context)
+        result = result['reservationSet'][0]['instancesSet']
+        self.assertEqual(3, len(result))
+        self.assertEqual([ec2utils.id_to_ec2_inst_id(instance['uuid'])
+                          for instance in instances],
+                         [i['instanceId'] for i in result])
+        self.assertEqual([[{'key': 'key', 'value': 'value%d' % i}]
+                          for i in xrange(3)],
+                         [i['tagSet'] for i in result])
+        self.assertEqual(['host1'], hosts)
+
+    def test_describe_instances_metadata_policy(self):
+        self._stub_instance_get_with_fixed_ips('get_all')
+        image_uuid = 'cedef40a-ed67-4d10-800e-17455edce175'
+        sys_meta = flavors.save_instance_type_info(
+            {}, flavors.get_instance_type(1))
+        db.instance_create(self.context, {'reservation_id': 'a',
+                                          'image_ref': image_uuid,
+                                          'instance_type_id': 1,
+                                          'host': 'host1',
+                                          'vm_state': 'active',
+                                          'metadata': {'key': 'value'},
+                                          'system_metadata': sys_meta})
+        rules = jsonutils.loads(fake_policy.policy_data)
+        rules['compute:get_instance_metadata'] = [['false:false']]
+        self.policy.set_rules(rules)
+        self.assertRaises(exception.PolicyNotAuthorized,
+                          self.cloud.describe_instances, self.context)
+
     def test_describe_instances_all_invalid(self):
         # Makes sure describe_instances works and filters results.
         self.flags(use_ipv6=True)
@@ -27,6 +27,8 @@ import time
 import traceback
 import uuid
 
+import eventlet
+from eventlet import event
 import mox
 from oslo.config import cfg
 
@@ -3887,6 +3889,42 @@ class ComputeTestCase(BaseTestCase):
         self.assertEqual(len(instances), 1)
         self.assertEqual(instances[0]['task_state'], None)
 
+    def test_sync_power_states(self):
+        ctxt = context.get_admin_context()
+        self.compute.host = 'fake_host'
+        running = self._create_fake_instance(
+                {'power_state': power_state.RUNNING})
+        shutdown = self._create_fake_instance(
+                {'power_state': power_state.RUNNING})
+        busy = self._create_fake_instance(
+                {'power_state': power_state.RUNNING,
+                 'task_state': task_states.REBOOTING})
+        vm_power_states = {running['uuid']: power_state.RUNNING,
+                           shutdown['uuid']: power_state.SHUTDOWN}
+        stopped = []
+
+        def fake_get_power_states(instances):
+            self.assertEqual(set(vm_power_states),
+                             set(instance['uuid'] for instance in instances))
+            return vm_power_states
+
+        def fake_compute_stop(context, instance, do_cast=True):
+            stopped.append(instance['uuid'])
+
+        self.stubs.Set(self.compute.driver, 'get_power_states',
+                       fake_get_power_states)
+        self.stubs.Set(self.compute.driver, 'get_info', None)
+        self.stubs.Set(self.compute.conductor_api, 'compute_stop',
+                       fake_compute_stop)
+        self.compute._sync_power_states(ctxt)
+
+        self.assertEqual([shutdown['uuid']], stopped)
+        for instance, expected in ((running, power_state.RUNNING),
+                                   (shutdown, power_state.SHUTDOWN),
+                                   (busy, power_state.RUNNING)):
+            instance = db.instance_get_by_uuid(ctxt, instance['uuid'])
+            self.assertEqual(expected, instance['power_state'])
+
     def test_add_instance_fault(self):
         instance = self._create_fake_instance()
         exc_info = None
@@ -4078,7 +4116,8 @@ class ComputeTestCase(BaseTestCase):
 
     def test_heal_instance_info_cache(self):
         # Update on every call for the test
-        self.flags(heal_instance_info_cache_interval=-1)
+        self.flags(heal_instance_info_cache_interval=-1,
+                   heal_instance_info_cache_batch_size=2)
         ctxt = context.get_admin_context()
 
         instance_map = {}
@@ -4088,70 +4127,112 @@ class ComputeTestCase(BaseTestCase):
             instance_map[uuid] = {'uuid': uuid, 'host': CONF.host}
             instances.append(instance_map[uuid])
 
-        call_info = {'get_all_by_host': 0, 'get_by_uuid': 0,
-                'get_nw_info': 0, 'expected_instance': None}
+        call_info = {'get_all_by_host': 0, 'get_all_by_filters': 0,
+                     'get_nw_info': 0, 'expected_instances': None}
 
         def fake_instance_get_all_by_host(context, host, columns_to_join):
             call_info['get_all_by_host'] += 1
             self.assertEqual(columns_to_join, [])
             return instances[:]
 
-        def fake_instance_get_by_uuid(context, instance_uuid):
-            if instance_uuid not in instance_map:
-                raise exception.InstanceNotFound(instance_id=instance_uuid)
-            call_info['get_by_uuid'] += 1
-            return instance_map[instance_uuid]
+        def fake_instance_get_all_by_filters(context, filters,
+                                             columns_to_join):
+            call_info['get_all_by_filters'] += 1
+            self.assertFalse(filters['deleted'])
+            self.assertEqual(['system_metadata'], columns_to_join)
+            return [instance_map[uuid] for uuid in filters['uuid']
+                    if uuid in instance_map]
 
-        # NOTE(comstud): Override the stub in setUp()
-        def fake_get_instance_nw_info(context, instance):
+        def fake_get_instances_nw_info(context, instances, conductor_api):
             # Note that this exception gets caught in compute/manager
-            # and is ignored.  However, the below increment of
+            # and is logged.  However, the below increment of
             # 'get_nw_info' won't happen, and you'll get an assert
             # failure checking it below.
-            self.assertEqual(call_info['expected_instance'], instance)
+            self.assertEqual(call_info['expected_instances'], instances)
+            self.assertEqual(self.compute.conductor_api, conductor_api)
             call_info['get_nw_info'] += 1
+            return dict((instance['uuid'], []) for instance in instances)
 
         self.stubs.Set(self.compute.conductor_api, 'instance_get_all_by_host',
                 fake_instance_get_all_by_host)
-        self.stubs.Set(self.compute.conductor_api, 'instance_get_by_uuid',
-                fake_instance_get_by_uuid)
-        self.stubs.Set(self.compute, '_get_instance_nw_info',
-                fake_get_instance_nw_info)
+        self.stubs.Set(self.compute.conductor_api,
+                'instance_get_all_by_filters',
+                fake_instance_get_all_by_filters)
+        self.stubs.Set(self.compute.network_api, 'get_instances_nw_info',
+                fake_get_instances_nw_info)
 
-        call_info['expected_instance'] = instances[0]
+        call_info['expected_instances'] = instances[0:2]
         self.compute._heal_instance_info_cache(ctxt)
         self.assertEqual(1, call_info['get_all_by_host'])
-        self.assertEqual(0, call_info['get_by_uuid'])
+        self.assertEqual(1, call_info['get_all_by_filters'])
         self.assertEqual(1, call_info['get_nw_info'])
 
-        call_info['expected_instance'] = instances[1]
-        self.compute._heal_instance_info_cache(ctxt)
-        self.assertEqual(1, call_info['get_all_by_host'])
-        self.assertEqual(1, call_info['get_by_uuid'])
-        self.assertEqual(2, call_info['get_nw_info'])
-
         # Make an instance switch hosts
         instances[2]['host'] = 'not-me'
         # Make an instance disappear
         instance_map.pop(instances[3]['uuid'])
-        # '2' and '3' should be skipped..
-        call_info['expected_instance'] = instances[4]
+        # '2' and '3' should be skipped, so there is nothing to heal..
+        self.compute._heal_instance_info_cache(ctxt)
+        self.assertEqual(1, call_info['get_all_by_host'])
+        self.assertEqual(2, call_info['get_all_by_filters'])
+        self.assertEqual(1, call_info['get_nw_info'])
+
+        call_info['expected_instances'] = instances[4:5]
         self.compute._heal_instance_info_cache(ctxt)
-        self.assertEqual(call_info['get_all_by_host'], 1)
-        # Incremented for '2' and '4'.. '3' caused a raise above.
-        self.assertEqual(call_info['get_by_uuid'], 3)
-        self.assertEqual(call_info['get_nw_info'], 3)
+        self.assertEqual(1, call_info['get_all_by_host'])
+        self.assertEqual(3, call_info['get_all_by_filters'])
+        self.assertEqual(2, call_info['get_nw_info'])
         # Should be no more left.
         self.assertEqual(len(self.compute._instance_uuids_to_heal), 0)
 
-        # This should cause a DB query now so we get first instance
+        # This should cause a DB query now so we get the first batch
         # back again
-        call_info['expected_instance'] = instances[0]
+        call_info['expected_instances'] = instances[0:2]
+        self.compute._heal_instance_info_cache(ctxt)
+        self.assertEqual(2, call_info['get_all_by_host'])
+        self.assertEqual(4, call_info['get_all_by_filters'])
+        self.assertEqual(3, call_info['get_nw_info'])
+
+    def _test_heal_instance_info_cache_one_at_a_time(self):
+        self.flags(heal_instance_info_cache_interval=-1,
+                   heal_instance_info_cache_batch_size=2)
+        ctxt = context.get_admin_context()
+        instances = [{'uuid': 'fake-uuid-%s' % x, 'host': CONF.host}
+                     for x in xrange(2)]
+
+        self.stubs.Set(self.compute.conductor_api, 'instance_get_all_by_host',
+                lambda *a, **kw: instances[:])
+        self.stubs.Set(self.compute.conductor_api,
+                'instance_get_all_by_filters',
+                lambda *a, **kw: instances[:])
+
+        healed = []
+
+        def fake_get_instance_nw_info(context, instance):
+            if instance is instances[0]:
+                raise exception.InstanceNotFound(instance_id=instance['uuid'])
+            healed.append(instance['uuid'])
+
+        self.stubs.Set(self.compute, '_get_instance_nw_info',
+                       fake_get_instance_nw_info)
+
         self.compute._heal_instance_info_cache(ctxt)
-        self.assertEqual(call_info['get_all_by_host'], 2)
-        # Stays the same, because the instance came from the DB
-        self.assertEqual(call_info['get_by_uuid'], 3)
-        self.assertEqual(call_info['get_nw_info'], 4)
+        self.assertEqual([instances[1]['uuid']], healed)
+
+    def test_heal_instance_info_cache_without_bulk_call(self):
+        class NetworkAPI(object):
+            pass
+
+        self.compute.network_api = NetworkAPI()
+        self._test_heal_instance_info_cache_one_at_a_time()
+
+    def test_heal_instance_info_cache_bulk_call_fails(self):
+        def fake_get_instances_nw_info(context, instances, conductor_api):
+            raise rpc_common.UnsupportedRpcVersion(version='1.10')
+
+        self.stubs.Set(self.compute.network_api, 'get_instances_nw_info',
+                       fake_get_instances_nw_info)
+        self._test_heal_instance_info_cache_one_at_a_time()
 
     def test_poll_rescued_instances(self):
         timed_out_time = timeutils.utcnow() - datetime.timedelta(minutes=5)
@@ -4616,6 +4697,58 @@ class ComputeTestCase(BaseTestCase):
         self.mox.VerifyAll()
         self.mox.UnsetStubs()
 
+    def test_refresh_instances_security_rules(self):
+        instances = [{'uuid': 'fake-uuid1'}, {'uuid': 'fake-uuid2'}]
+
+        self.mox.StubOutWithMock(self.compute.driver,
+                                 'filter_defer_apply_on')
+        self.mox.StubOutWithMock(self.compute.driver,
+                                 'refresh_instance_security_rules')
+        self.mox.StubOutWithMock(self.compute.driver,
+                                 'filter_defer_apply_off')
+        self.compute.driver.filter_defer_apply_on()
+        self.compute.driver.refresh_instance_security_rules(
+                instances[0]).AndRaise(test.TestingException())
+        self.compute.driver.refresh_instance_security_rules(instances[1])
+        self.compute.driver.filter_defer_apply_off()
+        self.mox.ReplayAll()
+
+        self.compute.refresh_instances_security_rules(self.context, instances)
+
+    def test_refresh_instances_security_rules_lock_held(self):
+        instances = [{'uuid': 'fake-uuid1'}, {'uuid': 'fake-uuid2'}]
+        calls = []
+
+        self.stubs.Set(self.compute.driver, 'filter_defer_apply_on',
+                       lambda: calls.append('defer_on'))
+        self.stubs.Set(self.compute.driver, 'filter_defer_apply_off',
+                       lambda: calls.append('defer_off'))
+        self.stubs.Set(self.compute.driver, 'refresh_instance_security_rules',
+                       lambda instance: calls.append(instance['uuid']))
+
+        # Hold the lock of the first instance like a build in progress.
+        locked = event.Event()
+        release = event.Event()
+
+        @utils.synchronized('fake-uuid1')
+        def hold_lock():
+            locked.send()
+            release.wait()
+
+        holder = eventlet.spawn(hold_lock)
+        locked.wait()
+        refresher = eventlet.spawn(
+                self.compute.refresh_instances_security_rules,
+                self.context, instances)
+        eventlet.sleep(0)
+        self.assertEqual(['defer_on', 'fake-uuid2', 'defer_off'], calls)
+
+        release.send()
+        holder.wait()
+        refresher.wait()
+        self.assertEqual(['defer_on', 'fake-uuid2', 'defer_off',
+                          'fake-uuid1'], calls)
+
     def test_init_host_with_deleted_migration(self):
         our_host = self.compute.host
         not_our_host = 'not-' + our_host
@@ -7517,29 +7650,21 @@ class ComputeAPITestCase(BaseTestCase):
     def test_secgroup_refresh(self):
         instance = self._create_fake_instance()
 
-        def rule_get(*args, **kwargs):
-            mock_rule = db_fakes.FakeModel({'parent_group_id': 1})
-            return [mock_rule]
+        def instances_get(*args, **kwargs):
+            return [instance]
 
-        def group_get(*args, **kwargs):
-            mock_group = db_fakes.FakeModel({'instances': [instance]})
-            return mock_group
-
-        self.stubs.Set(
-                   self.compute_api.db,
-                   'security_group_rule_get_by_security_group_grantee',
-                   rule_get)
-        self.stubs.Set(self.compute_api.db, 'security_group_get', group_get)
+        self.stubs.Set(self.compute_api.db,
+                       'instance_get_all_by_grantee_security_groups',
+                       instances_get)
 
         self.mox.StubOutWithMock(rpc, 'cast')
         topic = rpc.queue_get_for(self.context, CONF.compute_topic,
                                   instance['host'])
         rpc.cast(self.context, topic,
-                {"method": "refresh_instance_security_rules",
+                {"method": "refresh_instances_security_rules",
                  "namespace": None,
-                 "args": {'instance': jsonutils.to_primitive(instance)},
-                 "version":
-                    compute_rpcapi.SecurityGroupAPI.BASE_RPC_API_VERSION})
+                 "args": {'instances': [jsonutils.to_primitive(instance)]},
+                 "version": '2.30'})
         self.mox.ReplayAll()
 
         self.security_group_api.trigger_members_refresh(self.context, [1])
@@ -7547,47 +7672,62 @@ class ComputeAPITestCase(BaseTestCase):
     def test_secgroup_refresh_once(self):
         instance = self._create_fake_instance()
 
-        def rule_get(*args, **kwargs):
-            mock_rule = db_fakes.FakeModel({'parent_group_id': 1})
-            return [mock_rule]
+        def instances_get(*args, **kwargs):
+            return [instance, instance]
 
-        def group_get(*args, **kwargs):
-            mock_group = db_fakes.FakeModel({'instances': [instance]})
-            return mock_group
-
-        self.stubs.Set(
-                   self.compute_api.db,
-                   'security_group_rule_get_by_security_group_grantee',
-                   rule_get)
-        self.stubs.Set(self.compute_api.db, 'security_group_get', group_get)
+        self.stubs.Set(self.compute_api.db,
+                       'instance_get_all_by_grantee_security_groups',
+                       instances_get)
 
         self.mox.StubOutWithMock(rpc, 'cast')
         topic = rpc.queue_get_for(self.context, CONF.compute_topic,
                                   instance['host'])
         rpc.cast(self.context, topic,
-                {"method": "refresh_instance_security_rules",
+                {"method": "refresh_instances_security_rules",
                  "namespace": None,
-                 "args": {'instance': jsonutils.to_primitive(instance)},
-                 "version":
-                   compute_rpcapi.SecurityGroupAPI.BASE_RPC_API_VERSION})
+                 "args": {'instances': [jsonutils.to_primitive(instance)]},
+                 "version": '2.30'})
         self.mox.ReplayAll()
 
         self.security_group_api.trigger_members_refresh(self.context, [1, 2])
 
-    def test_secgroup_refresh_none(self):
-        def rule_get(*args, **kwargs):
-            mock_rule = db_fakes.FakeModel({'parent_group_id': 1})
-            return [mock_rule]
+    def test_secgroup_refresh_per_host(self):
+        instances = [self._create_fake_instance({'host': 'host1'}),
+                     self._create_fake_instance({'host': 'host1'}),
+                     self._create_fake_instance({'host': 'host2'}),
+                     self._create_fake_instance({'host': None})]
 
-        def group_get(*args, **kwargs):
-            mock_group = db_fakes.FakeModel({'instances': []})
-            return mock_group
+        def instances_get(*args, **kwargs):
+            return instances
 
-        self.stubs.Set(
-                   self.compute_api.db,
-                   'security_group_rule_get_by_security_group_grantee',
-                   rule_get)
-        self.stubs.Set(self.compute_api.db, 'security_group_get', group_get)
+        self.stubs.Set(self.compute_api.db,
+                       'instance_get_all_by_grantee_security_groups',
+                       instances_get)
+
+        casts = []
+
+        def fake_cast(context, topic, msg):
+            uuids = set(inst['uuid'] for inst in msg['args']['instances'])
+            casts.append((topic, uuids))
+
+        self.stubs.Set(rpc, 'cast', fake_cast)
+
+        self.security_group_api.trigger_members_refresh(self.context, [1])
+
+        self.assertEqual(
+            sorted([('%s.host1' % CONF.compute_topic,
+                     set([instances[0]['uuid'], instances[1]['uuid']])),
+                    ('%s.host2' % CONF.compute_topic,
+                     set([instances[2]['uuid']]))]),
+            sorted(casts))
+
+    def test_secgroup_refresh_none(self):
+        def instances_get(*args, **kwargs):
+            return []
+
+        self.stubs.Set(self.compute_api.db,
+                       'instance_get_all_by_grantee_security_groups',
+                       instances_get)
 
         self.mox.StubOutWithMock(rpc, 'cast')
         self.mox.ReplayAll()
@@ -7607,11 +7747,10 @@ class ComputeAPITestCase(BaseTestCase):
         topic = rpc.queue_get_for(self.context, CONF.compute_topic,
                                   instance['host'])
         rpc.cast(self.context, topic,
-                {"method": "refresh_instance_security_rules",
+                {"method": "refresh_instances_security_rules",
                  "namespace": None,
-                 "args": {'instance': jsonutils.to_primitive(instance)},
-                 "version":
-                   compute_rpcapi.SecurityGroupAPI.BASE_RPC_API_VERSION})
+                 "args": {'instances': [jsonutils.to_primitive(instance)]},
+                 "version": '2.30'})
         self.mox.ReplayAll()
 
         self.security_group_api.trigger_rules_refresh(self.context, [1])
@@ -7629,11 +7768,10 @@ class ComputeAPITestCase(BaseTestCase):
         topic = rpc.queue_get_for(self.context, CONF.compute_topic,
                                   instance['host'])
         rpc.cast(self.context, topic,
-                {"method": "refresh_instance_security_rules",
+                {"method": "refresh_instances_security_rules",
                  "namespace": None,
-                 "args": {'instance': jsonutils.to_primitive(instance)},
-                 "version":
-                   compute_rpcapi.SecurityGroupAPI.BASE_RPC_API_VERSION})
+                 "args": {'instances': [jsonutils.to_primitive(instance)]},
+                 "version": '2.30'})
         self.mox.ReplayAll()
 
         self.security_group_api.trigger_rules_refresh(self.context, [1, 2])
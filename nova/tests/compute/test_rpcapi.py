@@ -288,6 +288,11 @@ class ComputeRpcAPITestCase(test.TestCase):
                 rpcapi_class=compute_rpcapi.SecurityGroupAPI,
                 security_group_id='id', host='host')
 
+    def test_refresh_instances_security_rules(self):
+        self._test_compute_api('refresh_instances_security_rules', 'cast',
+                rpcapi_class=compute_rpcapi.SecurityGroupAPI,
+                instances=[self.fake_instance], host='host', version='2.30')
+
     def test_remove_aggregate_host(self):
         self._test_compute_api('remove_aggregate_host', 'cast',
                 aggregate={'id': 'fake_id'}, host_param='host', host='host',
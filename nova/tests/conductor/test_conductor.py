@@ -98,6 +98,22 @@ class _BaseTestCase(object):
         self.assertEqual(instance['vm_state'], vm_states.STOPPED)
         self.assertEqual(new_inst['vm_state'], instance['vm_state'])
 
+    def test_instance_sync_power_states(self):
+        changed = self._create_fake_instance({'power_state': 1})
+        unchanged = self._create_fake_instance({'power_state': 1})
+        busy = self._create_fake_instance({'power_state': 1,
+                                           'task_state': 'rebooting'})
+        result = self.conductor.instance_sync_power_states(self.context,
+                'fake_host', {changed['uuid']: 4, unchanged['uuid']: 1,
+                              busy['uuid']: 4})
+        self.assertEqual({changed['uuid']: 4, unchanged['uuid']: 1},
+                         dict((inst['uuid'], inst['power_state'])
+                              for inst in result))
+        for instance, expected in ((changed, 4), (unchanged, 1), (busy, 1)):
+            instance = db.instance_get_by_uuid(self.context,
+                                               instance['uuid'])
+            self.assertEqual(expected, instance['power_state'])
+
     def test_action_event_start(self):
         self.mox.StubOutWithMock(db, 'action_event_start')
         db.action_event_start(self.context, mox.IgnoreArg())
@@ -359,6 +375,14 @@ class _BaseTestCase(object):
                                                   fake_values,
                                                   update_cells='meow')
 
+    def test_instance_info_cache_update_many(self):
+        network_infos = {'fake-uuid': '[]'}
+        self.mox.StubOutWithMock(db, 'instance_info_cache_update_many')
+        db.instance_info_cache_update_many(self.context, network_infos)
+        self.mox.ReplayAll()
+        self.conductor.instance_info_cache_update_many(self.context,
+                                                       network_infos)
+
     def test_instance_type_get(self):
         self.mox.StubOutWithMock(db, 'instance_type_get')
         db.instance_type_get(self.context, 'fake-id').AndReturn('fake-type')
@@ -600,6 +624,22 @@ class ConductorTestCase(_BaseTestCase, test.TestCase):
         self.conductor = conductor_manager.ConductorManager()
         self.conductor_manager = self.conductor
 
+    def test_service_heartbeat(self):
+        self.flags(heartbeat_flush_interval=60, group='conductor')
+        self.mox.StubOutWithMock(db, 'service_update_heartbeats')
+        db.service_update_heartbeats(mox.IgnoreArg(), [1])
+        db.service_update_heartbeats(mox.IgnoreArg(),
+                                     mox.SameElementsAs([2, 3]))
+        self.mox.ReplayAll()
+        # The first heartbeat is written right away, the next ones when
+        # the interval is over.
+        self.conductor.service_heartbeat(self.context, 1)
+        self.conductor.service_heartbeat(self.context, 2)
+        self.conductor.service_heartbeat(self.context, 3)
+        self.conductor.service_heartbeat(self.context, 2)
+        self.conductor._flush_service_heartbeats(self.context)
+        self.conductor._flush_service_heartbeats(self.context)
+
     def test_block_device_mapping_update_or_create(self):
         fake_bdm = {'id': 'fake-id'}
         self.mox.StubOutWithMock(db, 'block_device_mapping_create')
@@ -1024,6 +1064,12 @@ class ConductorAPITestCase(_BaseTestCase, test.TestCase):
     def test_service_destroy(self):
         self._test_stubbed('service_destroy', '', returns=False)
 
+    def test_service_heartbeat(self):
+        self.mox.StubOutWithMock(db, 'service_update_heartbeats')
+        db.service_update_heartbeats(mox.IgnoreArg(), ['fake-id'])
+        self.mox.ReplayAll()
+        self.conductor.service_heartbeat(self.context, {'id': 'fake-id'})
+
     def test_service_update(self):
         ctxt = self.context
         self.mox.StubOutWithMock(db, 'service_update')
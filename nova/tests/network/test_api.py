@@ -28,6 +28,7 @@ from nova import exception
 from nova import network
 from nova.network import api
 from nova.network import floating_ips
+from nova.network import model
 from nova.network import rpcapi as network_rpcapi
 from nova import policy
 from nova import test
@@ -133,6 +134,34 @@ class ApiTestCase(test.TestCase):
                                                '172.24.4.225',
                                                '10.0.0.2')
 
+    def test_get_instances_nw_info(self):
+        inst_type = flavors.get_default_instance_type()
+        inst_type['rxtx_factor'] = 2
+        sys_meta = utils.dict_to_metadata(
+            flavors.save_instance_type_info({}, inst_type))
+        instances = [dict(uuid='uuid%d' % i, project_id='project_id',
+                          host='host', system_metadata=sys_meta)
+                     for i in xrange(3)]
+        self.mox.StubOutWithMock(self.network_api.network_rpcapi,
+                                 'get_instances_nw_info')
+        self.mox.StubOutWithMock(self.network_api.db,
+                                 'instance_info_cache_update_many')
+        args = [{'instance_id': 'uuid%d' % i, 'rxtx_factor': 2,
+                 'host': 'host', 'project_id': 'project_id'}
+                for i in xrange(3)]
+        # uuid1 could not be built by the network manager.
+        self.network_api.network_rpcapi.get_instances_nw_info(
+            self.context, instances=args).AndReturn({'uuid0': [],
+                                                     'uuid2': []})
+        self.network_api.db.instance_info_cache_update_many(
+            self.context, {'uuid0': '[]', 'uuid2': '[]'})
+        self.mox.ReplayAll()
+        result = self.network_api.get_instances_nw_info(self.context,
+                                                        instances)
+        self.assertEqual(['uuid0', 'uuid2'], sorted(result))
+        for nw_info in result.values():
+            self.assertTrue(isinstance(nw_info, model.NetworkInfo))
+
     def test_associate_preassociated_floating_ip(self):
         self._do_test_associate_floating_ip('orig-uuid')
 
@@ -152,6 +152,37 @@ class FlatNetworkTestCase(test.TestCase):
         self.context = context.RequestContext('testuser', 'testproject',
                                               is_admin=False)
 
+    def test_get_instances_nw_info(self):
+        vifs = {'uuid0': [{'uuid': 'vif0', 'network_id': 1}],
+                'uuid1': [{'uuid': 'vif1', 'network_id': 1},
+                          {'uuid': 'vif2', 'network_id': None}],
+                'uuid2': [{'uuid': 'vif3', 'network_id': 2}]}
+        self.mox.StubOutWithMock(db, 'virtual_interface_get_by_instance')
+        self.mox.StubOutWithMock(self.network, '_get_network_by_id')
+        self.mox.StubOutWithMock(self.network, 'build_network_info_model')
+        db.virtual_interface_get_by_instance(
+            self.context, 'uuid0').AndReturn(vifs['uuid0'])
+        self.network._get_network_by_id(self.context, 1).AndReturn('net1')
+        self.network.build_network_info_model(
+            self.context, vifs['uuid0'], {'vif0': 'net1'}, 1.0,
+            None).AndReturn('nw_info0')
+        # network 1 is not looked up again.
+        db.virtual_interface_get_by_instance(
+            self.context, 'uuid1').AndReturn(vifs['uuid1'])
+        self.network.build_network_info_model(
+            self.context, vifs['uuid1'], {'vif1': 'net1'}, 2.0,
+            None).AndReturn('nw_info1')
+        db.virtual_interface_get_by_instance(
+            self.context, 'uuid2').AndReturn(vifs['uuid2'])
+        self.network._get_network_by_id(self.context, 2).AndRaise(
+            exception.NetworkNotFound(network_id=2))
+        self.mox.ReplayAll()
+        instances = [{'instance_id': 'uuid%d' % i, 'rxtx_factor': i + 1.0,
+                      'host': HOST, 'project_id': 'testproject'}
+                     for i in xrange(3)]
+        result = self.network.get_instances_nw_info(self.context, instances)
+        self.assertEqual({'uuid0': 'nw_info0', 'uuid1': 'nw_info1'}, result)
+
     def test_get_instance_nw_info(self):
         fake_get_instance_nw_info = fake_network.fake_get_instance_nw_info
 
@@ -376,6 +376,37 @@ class TestQuantumv2(test.TestCase):
         self.assertEquals('my_mac%s' % id_suffix, nw_inf[0]['address'])
         self.assertEquals(0, len(nw_inf[0]['network']['subnets']))
 
+    def test_get_instances_nw_info(self):
+        # The networks of a project are listed once for its instances.
+        api = quantumapi.API()
+        instances = [{'uuid': 'uuid1', 'project_id': 'project1'},
+                     {'uuid': 'uuid2', 'project_id': 'project1'},
+                     {'uuid': 'uuid3', 'project_id': 'project2'}]
+        self.mox.StubOutWithMock(api, '_get_instance_nw_info')
+        self.mox.StubOutWithMock(api.db, 'instance_info_cache_update_many')
+        self.moxed_client.list_networks(
+            tenant_id='project1', shared=False).AndReturn(
+                {'networks': self.nets1})
+        self.moxed_client.list_networks(
+            shared=True).AndReturn({'networks': []})
+        api._get_instance_nw_info(self.context, instances[0],
+                                  self.nets1).AndReturn(model.NetworkInfo())
+        api._get_instance_nw_info(self.context, instances[1],
+                                  self.nets1).AndReturn(model.NetworkInfo())
+        self.moxed_client.list_networks(
+            tenant_id='project2', shared=False).AndReturn(
+                {'networks': self.nets2})
+        self.moxed_client.list_networks(
+            shared=True).AndReturn({'networks': []})
+        api._get_instance_nw_info(self.context, instances[2],
+                                  self.nets2).AndRaise(
+            exception.PortNotFound(port_id='my_portid3'))
+        api.db.instance_info_cache_update_many(
+            self.context, {'uuid1': '[]', 'uuid2': '[]'})
+        self.mox.ReplayAll()
+        result = api.get_instances_nw_info(self.context, instances)
+        self.assertEqual(['uuid1', 'uuid2'], sorted(result))
+
     def test_refresh_quantum_extensions_cache(self):
         api = quantumapi.API()
         self.moxed_client.list_extensions().AndReturn(
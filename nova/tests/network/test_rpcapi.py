@@ -206,6 +206,10 @@ class NetworkRpcAPITestCase(test.TestCase):
                 instance_id='fake_id', rxtx_factor='fake_factor',
                 host='fake_host', project_id='fake_id', version='1.9')
 
+    def test_get_instances_nw_info(self):
+        self._test_network_api('get_instances_nw_info', rpc_method='call',
+                instances=[], version='1.10')
+
     def test_validate_networks(self):
         self._test_network_api('validate_networks', rpc_method='call',
                 networks={})
@@ -0,0 +1,96 @@
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Fake OpenAttestation server for the TrustedFilter tests.
+"""
+
+import httplib
+import socket
+
+import eventlet
+
+from nova.openstack.common import jsonutils
+from nova.openstack.common import timeutils
+from nova.scheduler.filters import trusted_filter
+
+
+class FakeResponse(object):
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    def read(self):
+        return self.body
+
+
+class FakeConnection(object):
+    """Stands in for trusted_filter.HTTPSClientAuthConnection."""
+
+    def __init__(self, server, host, port, key_file=None, cert_file=None,
+                 ca_file=None, timeout=None):
+        self.server = server
+        self.response = None
+
+    def request(self, method, url, body, headers):
+        self.response = self.server.handle(method, url, body, headers)
+
+    def getresponse(self):
+        return self.response
+
+
+class FakeAttestationServer(object):
+    """Answers PollHosts requests like an OpenAttestation server.
+
+    Hosts have the trust level set with set_trust_level(), or 'unknown'.
+    The host lists of the requests received are kept in requests.
+    """
+
+    def __init__(self, api_url='/OpenAttestationWebServices/V1.0'):
+        self.api_url = api_url
+        self.trust_levels = {}
+        self.requests = []
+        # Set to make requests fail with a socket error.
+        self.down = False
+        # Number of requests being handled, and most handled at once.
+        self.active = 0
+        self.max_active = 0
+
+    def set_trust_level(self, host, trust_lvl):
+        self.trust_levels[host] = trust_lvl
+
+    def connection(self, *args, **kwargs):
+        return FakeConnection(self, *args, **kwargs)
+
+    def stub_out(self, stubs):
+        stubs.Set(trusted_filter, 'HTTPSClientAuthConnection',
+                  self.connection)
+
+    def handle(self, method, url, body, headers):
+        if self.down:
+            raise socket.error()
+        if method != 'POST' or url != '%s/PollHosts' % self.api_url:
+            return FakeResponse(httplib.NOT_FOUND, '')
+        hosts = jsonutils.loads(body)['hosts']
+        self.requests.append(hosts)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        # Let the other requests sent at the same time come in.
+        eventlet.sleep(0)
+        self.active -= 1
+        states = [{'host_name': host,
+                   'trust_lvl': self.trust_levels.get(host, 'unknown'),
+                   'vtime': timeutils.isotime()}
+                  for host in hosts]
+        return FakeResponse(httplib.OK, jsonutils.dumps({'hosts': states}))
@@ -161,7 +161,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 1.0
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                num_best=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             return [weights.WeighedHost(host_state, self.next_weight)]
@@ -507,7 +508,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
                                            'ephemeral_gb': 0, 'vcpus': 1}}
         self.next_weight = 1.0
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                num_best=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             return [weights.WeighedHost(host_state, self.next_weight)]
@@ -631,7 +633,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 50
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                num_best=None):
             this_weight = self.next_weight
             self.next_weight = 0
             host_state = hosts[0]
@@ -668,7 +671,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         selected_hosts = []
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                num_best=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             selected_hosts.append(host_state.host)
@@ -698,3 +702,170 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         hosts = sched.select_hosts(fake_context, request_spec, {})
         self.assertEquals(len(hosts), 10)
         self.assertEquals(hosts, selected_hosts)
+
+    def _schedule_hosts(self, num_instances, filter_properties=None):
+        self.stubs.Set(db, 'compute_node_get_all',
+                lambda ctxt: fakes.COMPUTE_NODES)
+        sched = fakes.FakeFilterScheduler()
+        self.stubs.Set(sched, 'group_hosts', lambda ctxt, group: [])
+        fake_context = context.RequestContext('user', 'project',
+                is_admin=True)
+        instance_properties = {'project_id': 1,
+                               'root_gb': 0,
+                               'memory_mb': 512,
+                               'ephemeral_gb': 0,
+                               'vcpus': 1,
+                               'os_type': 'Linux'}
+        request_spec = {'num_instances': num_instances,
+                        'instance_type': {'memory_mb': 512, 'root_gb': 0,
+                                          'ephemeral_gb': 0, 'vcpus': 1},
+                        'instance_properties': instance_properties}
+        hosts = sched._schedule(fake_context, request_spec,
+                filter_properties or {})
+        return [(host.obj.host, host.weight) for host in hosts]
+
+    def test_schedule_batch_placement_matches_serial(self):
+        self.flags(scheduler_default_filters=['RamFilter'],
+                   scheduler_weight_classes=[
+                       'nova.scheduler.weights.ram.RAMWeigher'])
+        expected = self._schedule_hosts(12)
+
+        self.flags(scheduler_batch_placement=True)
+        hosts = self._schedule_hosts(12)
+        self.assertEqual(expected, hosts)
+
+    def test_schedule_batch_placement_anti_affinity(self):
+        self.flags(scheduler_default_filters=['RamFilter',
+                                              'GroupAntiAffinityFilter'],
+                   scheduler_weight_classes=[
+                       'nova.scheduler.weights.ram.RAMWeigher'],
+                   scheduler_batch_placement=True)
+        hosts = self._schedule_hosts(5, {'scheduler_hints':
+                                         {'group': 'cats'}})
+        self.assertEqual(['host4', 'host3', 'host2', 'host1'],
+                         [host for host, weight in hosts])
+
+    def _stub_claims(self, conflicting_hosts=()):
+        """Claims fail once for the compute node ids in conflicting_hosts,
+        after which the node has no free memory left.
+        """
+        claims = []
+        conflicts = set(conflicting_hosts)
+
+        def fake_compute_node_claim(context, compute_id, generation,
+                                    memory_mb, disk_gb, vcpus):
+            claims.append((compute_id, generation, memory_mb, disk_gb,
+                           vcpus))
+            if compute_id in conflicts:
+                conflicts.remove(compute_id)
+                raise exception.ComputeNodeClaimConflict(
+                        compute_id=compute_id)
+            return (generation or 0) + 1
+
+        def fake_compute_node_get(context, compute_id):
+            return dict(fakes.COMPUTE_NODES[compute_id - 1], free_ram_mb=0,
+                        generation=1)
+
+        self.stubs.Set(db, 'compute_node_claim', fake_compute_node_claim)
+        self.stubs.Set(db, 'compute_node_get', fake_compute_node_get)
+        return claims
+
+    def test_schedule_optimistic_claims(self):
+        self.flags(scheduler_default_filters=['RamFilter'],
+                   scheduler_weight_classes=[
+                       'nova.scheduler.weights.ram.RAMWeigher'],
+                   scheduler_optimistic_claims=True)
+        claims = self._stub_claims()
+        hosts = self._schedule_hosts(2)
+        self.assertEqual(['host4', 'host4'], [host for host, weight in hosts])
+        self.assertEqual([(4, None, 512, 0, 1), (4, 1, 512, 0, 1)], claims)
+
+    def _test_schedule_optimistic_claim_conflict(self):
+        self.flags(scheduler_default_filters=['RamFilter'],
+                   scheduler_weight_classes=[
+                       'nova.scheduler.weights.ram.RAMWeigher'],
+                   scheduler_optimistic_claims=True)
+        claims = self._stub_claims(conflicting_hosts=[4])
+        hosts = self._schedule_hosts(2)
+        # host4 turned out to be full, so the instances go elsewhere.
+        self.assertEqual(['host3', 'host3'], [host for host, weight in hosts])
+        self.assertEqual([4, 3, 3], [claim[0] for claim in claims])
+
+    def test_schedule_optimistic_claim_conflict(self):
+        self._test_schedule_optimistic_claim_conflict()
+
+    def test_schedule_batch_optimistic_claim_conflict(self):
+        self.flags(scheduler_batch_placement=True)
+        self._test_schedule_optimistic_claim_conflict()
+
+    def test_schedule_optimistic_claim_retries(self):
+        self.flags(scheduler_default_filters=['RamFilter'],
+                   scheduler_weight_classes=[
+                       'nova.scheduler.weights.ram.RAMWeigher'],
+                   scheduler_optimistic_claims=True,
+                   scheduler_claim_retries=0)
+        claims = self._stub_claims(conflicting_hosts=[4])
+        hosts = self._schedule_hosts(1)
+        # The host is still claimed, and the instance gets no host when
+        # the claim conflicts.
+        self.assertEqual([], hosts)
+        self.assertEqual([4], [claim[0] for claim in claims])
+
+    def test_schedule_batch_optimistic_claim_retries(self):
+        self.flags(scheduler_batch_placement=True)
+        self.test_schedule_optimistic_claim_retries()
+
+    def _test_schedule_optimistic_claim_deleted_node(self):
+        self.flags(scheduler_default_filters=['RamFilter'],
+                   scheduler_weight_classes=[
+                       'nova.scheduler.weights.ram.RAMWeigher'],
+                   scheduler_optimistic_claims=True)
+        claims = self._stub_claims(conflicting_hosts=[4])
+
+        def fake_compute_node_get(context, compute_id):
+            raise exception.ComputeHostNotFound(host=compute_id)
+
+        self.stubs.Set(db, 'compute_node_get', fake_compute_node_get)
+        hosts = self._schedule_hosts(2)
+        # host4 was deleted, so the instances go elsewhere.
+        self.assertEqual(['host3', 'host3'], [host for host, weight in hosts])
+        self.assertEqual([4, 3, 3], [claim[0] for claim in claims])
+
+    def test_schedule_optimistic_claim_deleted_node(self):
+        self._test_schedule_optimistic_claim_deleted_node()
+
+    def test_schedule_batch_optimistic_claim_deleted_node(self):
+        self.flags(scheduler_batch_placement=True)
+        self._test_schedule_optimistic_claim_deleted_node()
+
+    def test_schedule_timings(self):
+        self.flags(scheduler_default_filters=['RamFilter'],
+                   scheduler_weight_classes=[
+                       'nova.scheduler.weights.ram.RAMWeigher'])
+        sched = fakes.FakeFilterScheduler()
+        self.stubs.Set(fakes, 'FakeFilterScheduler', lambda: sched)
+        self._schedule_hosts(2)
+
+        timings = sched.get_timings()
+        self.assertEqual(1, timings['scheduler']['schedule']['count'])
+        self.assertEqual(1,
+                timings['scheduler']['get_all_host_states']['count'])
+        self.assertEqual(2, timings['filters']['RamFilter']['count'])
+        self.assertEqual(2, timings['weighers']['RAMWeigher']['count'])
+
+    def test_schedule_aggregate_metadata_read_once(self):
+        self.flags(scheduler_default_filters=['RamFilter',
+                                              'AvailabilityZoneFilter'])
+        calls = []
+
+        def fake_metadata_get_all_by_host(context):
+            calls.append(context)
+            return {'host1': {'availability_zone': set(['az1'])}}
+
+        self.stubs.Set(db, 'aggregate_metadata_get_all_by_host',
+                       fake_metadata_get_all_by_host)
+        filter_properties = {}
+        hosts = self._schedule_hosts(3, filter_properties)
+        self.assertEqual(1, len(calls))
+        self.assertEqual(3, len(hosts))
+        self.assertNotIn('host_aggregate_metadata', filter_properties)
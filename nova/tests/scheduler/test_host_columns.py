@@ -0,0 +1,180 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the vectorized filter/weigh engine.
+"""
+
+from oslo.config import cfg
+
+from nova.scheduler import filters
+from nova.scheduler import host_columns
+from nova.scheduler import weights
+from nova.scheduler.weights import rackspace_weights
+from nova import test
+from nova.tests.scheduler import fakes
+
+CONF = cfg.CONF
+CONF.import_opt('ram_allocation_ratio', 'nova.scheduler.filters.ram_filter')
+CONF.import_opt('scheduler_spare_host_percentage',
+                'nova.scheduler.filters.rackspace_filter')
+
+
+class FakeRamUsedFilter(filters.BaseHostFilter):
+    """A filter without a vectorized form."""
+    def host_passes(self, host_state, filter_properties):
+        return host_state.free_ram_mb > 0
+
+
+class HostColumnsTestCase(test.TestCase):
+    """Check the vectorized engine agrees with the per-host path."""
+
+    def setUp(self):
+        super(HostColumnsTestCase, self).setUp()
+        if host_columns.numpy is None:
+            self.skipTest("numpy not available")
+        self.flags(scheduler_spare_host_percentage=10,
+                   rax_randomize_top_hosts=0)
+        self.hosts = []
+        for i in xrange(40):
+            attrs = {'free_ram_mb': 512 * (i % 7),
+                     'total_usable_ram_mb': 4096,
+                     'free_disk_mb': 10240 * (i % 5),
+                     'total_usable_disk_gb': 40,
+                     'vcpus_total': i % 4,
+                     'vcpus_used': i % 3,
+                     'num_instances': i % 6,
+                     'num_io_ops': i % 10,
+                     'allowed_vm_type': ('all', 'pv', 'hvm')[i % 3],
+                     'num_instances_by_project': {'p1': i % 4},
+                     'num_instances_by_os_type': {'linux': i % 5,
+                                                  'windows': i % 2}}
+            self.hosts.append(fakes.FakeHostState('host%s' % i, 'node',
+                                                  attrs))
+        self.filter_handler = filters.HostFilterHandler()
+        self.weight_handler = weights.HostWeightHandler()
+
+    def _filter_both_ways(self, filter_names, filter_properties,
+                          extra_classes=None):
+        classes = self.filter_handler.get_matching_classes(filter_names)
+        classes += extra_classes or []
+        self.flags(scheduler_use_vectorized_engine=False)
+        expected = self.filter_handler.get_filtered_objects(classes,
+                self.hosts, dict(filter_properties))
+        expected_limits = [dict(h.limits) for h in expected]
+        for host in self.hosts:
+            host.limits = {}
+        self.flags(scheduler_use_vectorized_engine=True)
+        result = self.filter_handler.get_filtered_objects(classes,
+                self.hosts, dict(filter_properties))
+        self.assertEqual(set(expected), set(result))
+        result_limits = [dict(h.limits) for h in result]
+        self.assertEqual(expected_limits, result_limits)
+        return result
+
+    def _weigh_both_ways(self, weigher_names, weight_properties,
+                         num_best=None):
+        classes = self.weight_handler.get_matching_classes(weigher_names)
+        self.flags(scheduler_use_vectorized_engine=False)
+        expected = self.weight_handler.get_weighed_objects(classes,
+                self.hosts, weight_properties, num_best=num_best)
+        self.flags(scheduler_use_vectorized_engine=True)
+        result = self.weight_handler.get_weighed_objects(classes,
+                self.hosts, weight_properties, num_best=num_best)
+        self.assertEqual([(x.obj, x.weight) for x in expected],
+                         [(x.obj, x.weight) for x in result])
+        return result
+
+    def test_resource_filters(self):
+        path = 'nova.scheduler.filters.'
+        instance_type = dict(id=1, memory_mb=1024, root_gb=10,
+                             ephemeral_gb=10, vcpus=2)
+        result = self._filter_both_ways(
+                [path + 'ram_filter.RamFilter',
+                 path + 'core_filter.CoreFilter',
+                 path + 'disk_filter.DiskFilter',
+                 path + 'num_instances_filter.NumInstancesFilter',
+                 path + 'io_ops_filter.IoOpsFilter'],
+                {'instance_type': instance_type})
+        self.assertTrue(result)
+
+    def test_rackspace_filter(self):
+        instance_type = dict(id=1, memory_mb=1024)
+        result = self._filter_both_ways(
+                ['nova.scheduler.filters.rackspace_filter.RackspaceFilter'],
+                {'instance_type': instance_type, 'total_hosts': 40})
+        self.assertTrue(result)
+
+    def test_rackspace_filter_only_spares_left(self):
+        for host in self.hosts:
+            host.num_instances = 0
+        instance_type = dict(id=101, memory_mb=1024)
+        result = self._filter_both_ways(
+                ['nova.scheduler.filters.rackspace_filter.RackspaceFilter'],
+                {'instance_type': instance_type, 'total_hosts': 400})
+        self.assertEqual(1, len(result))
+
+    def test_rackspace_filter_after_other_filters(self):
+        # Empty hosts rejected by the RamFilter are not reserved as spares,
+        # so the last spare kept when nothing else passes is a host which
+        # passed the RamFilter.
+        self.flags(ram_allocation_ratio=1.0)
+        for i, host in enumerate(self.hosts):
+            host.num_instances = 0
+            host.free_ram_mb = 2048 if i == 0 else 0
+        path = 'nova.scheduler.filters.'
+        result = self._filter_both_ways(
+                [path + 'ram_filter.RamFilter',
+                 path + 'rackspace_filter.RackspaceFilter'],
+                {'instance_type': dict(id=1, memory_mb=1024),
+                 'total_hosts': 40})
+        self.assertEqual([self.hosts[0]], result)
+
+    def test_mixed_filters(self):
+        path = 'nova.scheduler.filters.'
+        result = self._filter_both_ways(
+                [path + 'num_instances_filter.NumInstancesFilter',
+                 path + 'io_ops_filter.IoOpsFilter'],
+                {'instance_type': dict(id=1, memory_mb=1024)},
+                extra_classes=[FakeRamUsedFilter])
+        self.assertTrue(result)
+
+    def test_weighers(self):
+        self._weigh_both_ways(
+                ['nova.scheduler.weights.ram.RAMWeigher',
+                 'nova.scheduler.weights.rackspace_weights.get_weighers'],
+                {'project_id': 'p1', 'os_type': 'linux'})
+
+    def test_fuzz_weigher(self):
+        self.flags(rax_randomize_top_hosts=5)
+        self.stubs.Set(rackspace_weights.random, 'shuffle',
+                       lambda x: x.reverse())
+        self._weigh_both_ways(
+                ['nova.scheduler.weights.ram.RAMWeigher',
+                 'nova.scheduler.weights.rackspace_weights.get_weighers'],
+                {'project_id': 'p1', 'os_type': 'linux'})
+
+    def test_weighers_num_best(self):
+        result = self._weigh_both_ways(
+                ['nova.scheduler.weights.ram.RAMWeigher',
+                 'nova.scheduler.weights.rackspace_weights.get_weighers'],
+                {'project_id': 'p1', 'os_type': 'linux'}, num_best=7)
+        self.assertEqual(7, len(result))
+
+    def test_best_indexes_keeps_order_of_ties(self):
+        weights = host_columns.numpy.array([1.0, 3.0, 2.0, 3.0, 2.0, 2.0])
+        self.assertEqual([1, 3, 2, 4],
+                         list(host_columns.best_indexes(weights, 4)))
+        self.assertEqual([1, 3, 2, 4, 5, 0],
+                         list(host_columns.best_indexes(weights)))
@@ -23,12 +23,14 @@ import stubout
 from nova import context
 from nova import db
 from nova.openstack.common import jsonutils
+from nova.openstack.common import loopingcall
 from nova.openstack.common import timeutils
 from nova.scheduler import filters
 from nova.scheduler.filters import extra_specs_ops
 from nova.scheduler.filters import trusted_filter
 from nova import servicegroup
 from nova import test
+from nova.tests.scheduler import fake_attestation
 from nova.tests.scheduler import fakes
 
 CONF = cfg.CONF
@@ -401,6 +403,37 @@ class HostFiltersTestCase(test.TestCase):
 
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
 
+    def _test_affinity_filter_all(self, filter_name, hint, expected):
+        filt_cls = self.class_map[filter_name]()
+        instance = fakes.FakeInstance(context=self.context,
+                                      params={'host': 'host1'})
+        hosts = [fakes.FakeHostState('host%s' % i, 'node1', {})
+                 for i in xrange(1, 4)]
+        # host10 must not match host1
+        hosts.append(fakes.FakeHostState('host10', 'node1', {}))
+        calls = []
+        orig_get_all = filt_cls.compute_api.get_all
+
+        def fake_get_all(*args, **kwargs):
+            calls.append(args)
+            return orig_get_all(*args, **kwargs)
+
+        self.stubs.Set(filt_cls.compute_api, 'get_all', fake_get_all)
+        filter_properties = {'context': self.context.elevated(),
+                             'scheduler_hints': {hint: [instance.uuid]}}
+        result = list(filt_cls.filter_all(hosts, filter_properties))
+        self.assertEqual(expected, [host.host for host in result])
+        self.assertEqual(1, len(calls))
+
+    def test_affinity_different_filter_all(self):
+        self._test_affinity_filter_all('DifferentHostFilter',
+                                       'different_host',
+                                       ['host2', 'host3', 'host10'])
+
+    def test_affinity_same_filter_all(self):
+        self._test_affinity_filter_all('SameHostFilter', 'same_host',
+                                       ['host1'])
+
     def test_affinity_simple_cidr_filter_passes(self):
         filt_cls = self.class_map['SimpleCIDRAffinityFilter']()
         host = fakes.FakeHostState('host1', 'node1', {})
@@ -480,6 +513,21 @@ class HostFiltersTestCase(test.TestCase):
                            params={'host': 'fake_host', 'instance_type_id': 2})
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
 
+    def test_type_filter_all(self):
+        filt_cls = self.class_map['TypeAffinityFilter']()
+        filter_properties = {'context': self.context,
+                             'instance_type': {'id': 1}}
+        fakes.FakeInstance(context=self.context,
+                           params={'host': 'host1', 'instance_type_id': 1})
+        fakes.FakeInstance(context=self.context,
+                           params={'host': 'host2', 'instance_type_id': 2})
+        hosts = [fakes.FakeHostState('host%s' % i, 'node1', {})
+                 for i in xrange(1, 4)]
+        self.mox.StubOutWithMock(db, 'instance_get_all_by_host_and_not_type')
+        self.mox.ReplayAll()
+        result = list(filt_cls.filter_all(hosts, filter_properties))
+        self.assertEqual([hosts[0], hosts[2]], result)
+
     def test_aggregate_type_filter(self):
         self._stub_service_is_up(True)
         filt_cls = self.class_map['AggregateTypeAffinityFilter']()
@@ -1171,6 +1219,57 @@ class HostFiltersTestCase(test.TestCase):
         }
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
 
+    def test_json_filter_dict_lookup(self):
+        filt_cls = self.class_map['JsonFilter']()
+        raw = ['and',
+               ['=', '$capabilities.enabled', True],
+               ['>=', '$num_instances_by_project.p1', 2]]
+        filter_properties = {
+            'scheduler_hints': {
+                'query': jsonutils.dumps(raw),
+            },
+        }
+        host = fakes.FakeHostState('host1', 'node1',
+                {'capabilities': {'enabled': True},
+                 'num_instances_by_project': {'p1': 3}})
+        self.assertTrue(filt_cls.host_passes(host, filter_properties))
+        host = fakes.FakeHostState('host2', 'node1',
+                {'capabilities': {'enabled': True},
+                 'num_instances_by_project': {'p1': 1}})
+        self.assertFalse(filt_cls.host_passes(host, filter_properties))
+        host = fakes.FakeHostState('host3', 'node1',
+                {'capabilities': {'enabled': True}})
+        self.assertFalse(filt_cls.host_passes(host, filter_properties))
+
+    def test_json_filter_compiles_query_once(self):
+        filt_cls = self.class_map['JsonFilter']()
+        compiled = []
+        orig_compile = filt_cls._compile
+
+        def fake_compile(query):
+            compiled.append(query)
+            return orig_compile(query)
+
+        self.stubs.Set(filt_cls, '_compile', fake_compile)
+        raw = ['>=', '$free_ram_mb', 1024]
+        filter_properties = {
+            'scheduler_hints': {
+                'query': jsonutils.dumps(raw),
+            },
+        }
+        hosts = [fakes.FakeHostState('host%s' % i, 'node1',
+                                     {'free_ram_mb': 512 * i})
+                 for i in xrange(5)]
+        result = list(filt_cls.filter_all(hosts, filter_properties))
+        self.assertEqual(hosts[2:], result)
+        self.assertEqual([raw], compiled)
+
+        raw = ['<', '$free_ram_mb', 1024]
+        filter_properties['scheduler_hints']['query'] = jsonutils.dumps(raw)
+        result = list(filt_cls.filter_all(hosts, filter_properties))
+        self.assertEqual(hosts[:2], result)
+        self.assertEqual(2, len(compiled))
+
     def test_trusted_filter_default_passes(self):
         self._stub_service_is_up(True)
         filt_cls = self.class_map['TrustedFilter']()
@@ -1339,6 +1438,98 @@ class HostFiltersTestCase(test.TestCase):
                                    {'service': service})
         self.assertFalse(filt_cls.host_passes(host, request))
 
+    def test_availability_zone_filter_prefetched_metadata(self):
+        self.stubs.Set(db, 'aggregate_metadata_get_by_host', None)
+        filt_cls = self.class_map['AvailabilityZoneFilter']()
+        request = self._make_zone_request('az1')
+        request['host_aggregate_metadata'] = {
+                'host1': {'availability_zone': set(['az1']),
+                          'foo': set(['bar'])},
+                'host2': {'foo': set(['bar'])}}
+        host1 = fakes.FakeHostState('host1', 'node1', {})
+        host2 = fakes.FakeHostState('host2', 'node2', {})
+        host3 = fakes.FakeHostState('host3', 'node3', {})
+        self.assertTrue(filt_cls.host_passes(host1, request))
+        self.assertFalse(filt_cls.host_passes(host2, request))
+        self.assertFalse(filt_cls.host_passes(host3, request))
+
+    def _stub_zone_metadata(self):
+        calls = []
+
+        def fake_metadata_get_by_host(context, host, key=None):
+            calls.append(host)
+            return {'availability_zone': set(['nova'])}
+
+        self.stubs.Set(db, 'aggregate_metadata_get_by_host',
+                       fake_metadata_get_by_host)
+        return calls
+
+    def test_filter_cache_disabled(self):
+        calls = self._stub_zone_metadata()
+        filt_cls = self.class_map['AvailabilityZoneFilter']()
+        host = fakes.FakeHostState('host1', 'node1', {})
+        for x in xrange(2):
+            result = list(filt_cls.filter_all([host],
+                                              self._make_zone_request('nova')))
+            self.assertEqual([host], result)
+        self.assertEqual(['host1', 'host1'], calls)
+        self.assertEqual({}, host.filter_cache)
+
+    def test_filter_cache_reuses_results(self):
+        self.flags(scheduler_filter_cache_ttl=60)
+        calls = self._stub_zone_metadata()
+        filt_cls = self.class_map['AvailabilityZoneFilter']()
+        hosts = [fakes.FakeHostState('host1', 'node1', {}),
+                 fakes.FakeHostState('host2', 'node2', {})]
+        for x in xrange(2):
+            result = list(filt_cls.filter_all(hosts,
+                                              self._make_zone_request('nova')))
+            self.assertEqual(hosts, result)
+        self.assertEqual(['host1', 'host2'], calls)
+
+        # A different request isn't answered from the cache.
+        result = list(filt_cls.filter_all(hosts,
+                                          self._make_zone_request('bad')))
+        self.assertEqual([], result)
+        self.assertEqual(['host1', 'host2', 'host1', 'host2'], calls)
+
+    def test_filter_cache_expires(self):
+        self.flags(scheduler_filter_cache_ttl=60)
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.set_time_override()
+        calls = self._stub_zone_metadata()
+        filt_cls = self.class_map['AvailabilityZoneFilter']()
+        host = fakes.FakeHostState('host1', 'node1', {})
+        list(filt_cls.filter_all([host], self._make_zone_request('nova')))
+        timeutils.advance_time_seconds(59)
+        list(filt_cls.filter_all([host], self._make_zone_request('nova')))
+        self.assertEqual(['host1'], calls)
+        timeutils.advance_time_seconds(1)
+        list(filt_cls.filter_all([host], self._make_zone_request('nova')))
+        self.assertEqual(['host1', 'host1'], calls)
+
+    def test_filter_cache_dropped_on_capabilities_change(self):
+        self.flags(scheduler_filter_cache_ttl=60)
+        filt_cls = self.class_map['ComputeCapabilitiesFilter']()
+        filter_properties = {'instance_type': {'memory_mb': 1024,
+                                               'extra_specs': {'opt1': '1'}}}
+        host = fakes.FakeHostState('host1', 'node1', {})
+        host.update_capabilities({'opt1': '1'}, {'host': 'host1'})
+        result = list(filt_cls.filter_all([host], filter_properties))
+        self.assertEqual([host], result)
+        self.assertEqual(1, len(host.filter_cache))
+
+        # A service report doesn't invalidate the results...
+        host.update_capabilities(host.capabilities.data,
+                                 {'host': 'host1', 'report_count': 1})
+        self.assertEqual(1, len(host.filter_cache))
+
+        # ...but a change in the capabilities does.
+        host.update_capabilities({'opt1': '2'}, host.service.data)
+        self.assertEqual({}, host.filter_cache)
+        result = list(filt_cls.filter_all([host], filter_properties))
+        self.assertEqual([], result)
+
     def test_retry_filter_disabled(self):
         # Test case where retry/re-scheduling is disabled.
         filt_cls = self.class_map['RetryFilter']()
@@ -1448,3 +1639,96 @@ class HostFiltersTestCase(test.TestCase):
                                      'project_id': 'my_tenantid'}}}
         host = fakes.FakeHostState('host1', 'compute', {})
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
+
+
+class TrustedFilterRefreshTestCase(test.TestCase):
+    """Test the TrustedFilter with an attestation cache refreshed in the
+    background.
+    """
+
+    def setUp(self):
+        super(TrustedFilterRefreshTestCase, self).setUp()
+        self.flags(attestation_auth_timeout=300,
+                   attestation_refresh_interval=60,
+                   attestation_refresh_batch_size=2,
+                   attestation_refresh_concurrency=2,
+                   group='trusted_computing')
+        self.server = fake_attestation.FakeAttestationServer()
+        self.server.stub_out(self.stubs)
+        self.stubs.Set(trusted_filter, '_refreshed_cache', None)
+        self.stubs.Set(loopingcall.FixedIntervalLoopingCall, 'start',
+                       lambda *args, **kwargs: None)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.context = context.get_admin_context()
+        self.filt_cls = trusted_filter.TrustedFilter()
+        self.cache = self.filt_cls.compute_attestation.caches
+
+    def _passes(self, host, trust='trusted'):
+        filter_properties = {'context': self.context,
+                             'instance_type': {'memory_mb': 1024,
+                                 'extra_specs': {
+                                     'trust:trusted_host': trust}}}
+        host_state = fakes.FakeHostState(host, 'node1', {})
+        return self.filt_cls.host_passes(host_state, filter_properties)
+
+    def test_filter_does_not_poll(self):
+        self.server.set_trust_level('host1', 'trusted')
+        # Unknown until the next refresh.
+        self.assertFalse(self._passes('host1'))
+        self.assertEqual([], self.server.requests)
+        self.cache.refresh()
+        self.assertEqual([['host1']], self.server.requests)
+        self.assertTrue(self._passes('host1'))
+        self.assertFalse(self._passes('host1', trust='untrusted'))
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_cache_is_shared(self):
+        other = trusted_filter.TrustedFilter()
+        self.assertTrue(self.cache is other.compute_attestation.caches)
+
+    def test_refresh_ahead_of_expiry(self):
+        self.server.set_trust_level('host1', 'trusted')
+        self._passes('host1')
+        self.cache.refresh()
+        self.cache.refresh()
+        self.assertEqual(1, len(self.server.requests))
+        # Expires before the next refresh.
+        timeutils.advance_time_seconds(241)
+        self.cache.refresh()
+        self.assertEqual(2, len(self.server.requests))
+        self.assertTrue(self._passes('host1'))
+
+    def test_refresh_in_batches(self):
+        hosts = ['host%s' % i for i in xrange(5)]
+        for host in hosts:
+            self.server.set_trust_level(host, 'trusted')
+            self._passes(host)
+        self.cache.refresh()
+        self.assertEqual(3, len(self.server.requests))
+        self.assertEqual(2, self.server.max_active)
+        self.assertEqual(sorted(hosts),
+                         sorted(sum(self.server.requests, [])))
+        for host in hosts:
+            self.assertTrue(self._passes(host))
+
+    def test_refresh_concurrency(self):
+        self.flags(attestation_refresh_concurrency=1,
+                   group='trusted_computing')
+        for i in xrange(5):
+            self._passes('host%s' % i)
+        self.cache.refresh()
+        self.assertEqual(3, len(self.server.requests))
+        self.assertEqual(1, self.server.max_active)
+
+    def test_server_down(self):
+        self.server.set_trust_level('host1', 'trusted')
+        self._passes('host1')
+        self.cache.refresh()
+        self.server.down = True
+        timeutils.advance_time_seconds(241)
+        self.cache.refresh()
+        # Still valid until it expires.
+        self.assertTrue(self._passes('host1'))
+        timeutils.advance_time_seconds(60)
+        self.assertFalse(self._passes('host1'))
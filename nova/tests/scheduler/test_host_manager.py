@@ -15,8 +15,14 @@
 """
 Tests For HostManager
 """
+import time
+
+import mox
+from testtools import content
+
 from nova.compute import task_states
 from nova.compute import vm_states
+from nova import context
 from nova import db
 from nova import exception
 from nova.openstack.common import timeutils
@@ -101,6 +107,24 @@ class HostManagerTestCase(test.TestCase):
                 fake_properties)
         self._verify_result(info, result)
 
+    def test_get_filtered_hosts_prefetches_aggregate_metadata(self):
+        fake_context = context.get_admin_context()
+        fake_properties = {'context': fake_context}
+        metadata = {'fake_host1': {'foo': set(['bar'])}}
+        self.host_manager.filter_classes = [FakeFilterClass1]
+        self.stubs.Set(FakeFilterClass1, 'uses_aggregate_metadata', True)
+        self.mox.StubOutWithMock(db, 'aggregate_metadata_get_all_by_host')
+        db.aggregate_metadata_get_all_by_host(
+                mox.IgnoreArg()).AndReturn(metadata)
+        self.mox.ReplayAll()
+
+        for x in xrange(2):
+            self.host_manager.get_filtered_hosts(self.fake_hosts,
+                    fake_properties,
+                    filter_class_names=['FakeFilterClass1'])
+        self.assertEqual(metadata,
+                         fake_properties['host_aggregate_metadata'])
+
     def test_get_filtered_hosts_with_specificed_filters(self):
         fake_properties = {'moo': 1, 'cow': 2}
 
@@ -357,6 +381,42 @@ class HostManagerTestCase(test.TestCase):
         self.assertEqual(host_states_map[('host4', 'node4')].free_disk_mb,
                          8388608)
 
+    def test_get_all_host_states_refresh_benchmark(self):
+        # Not a pass/fail check on timing: records how long loading and
+        # then refreshing the host states of 10k compute nodes takes.
+        context = 'fake_context'
+        stats = [dict(key='num_instances', value='10'),
+                 dict(key='io_workload', value='2')]
+        stats += [dict(key='num_proj_project%s' % x, value='1')
+                  for x in xrange(10)]
+        stats += [dict(key='num_vm_active', value='10'),
+                  dict(key='num_task_None', value='10'),
+                  dict(key='num_os_type_linux', value='10')]
+        compute_nodes = [
+            dict(id=x, local_gb=1024, memory_mb=1024, vcpus=8,
+                 disk_available_least=512, free_ram_mb=512, vcpus_used=1,
+                 free_disk_mb=512, local_gb_used=0, updated_at=None,
+                 service=dict(host='host%s' % x, disabled=False),
+                 hypervisor_hostname='node%s' % x, stats=stats)
+            for x in xrange(10000)]
+        self.stubs.Set(db, 'compute_node_get_all',
+                       lambda ctxt: compute_nodes)
+
+        timings = []
+        for x in xrange(2):
+            start = time.time()
+            self.host_manager.get_all_host_states(context)
+            timings.append(time.time() - start)
+        self.addDetail('refresh-timings', content.text_content(
+                'load: %.3fs, refresh: %.3fs' % tuple(timings)))
+
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(len(host_states_map), 10000)
+        host_state = host_states_map[('host42', 'node42')]
+        self.assertEqual(10, host_state.num_instances)
+        self.assertEqual(10, len(host_state.num_instances_by_project))
+        self.assertEqual(2, host_state.num_io_ops)
+
 
 class HostManagerChangedNodesTestCase(test.TestCase):
     """Test case for HostManager class."""
@@ -415,6 +475,81 @@ class HostManagerChangedNodesTestCase(test.TestCase):
         host_states_map = self.host_manager.host_state_map
         self.assertEqual(len(host_states_map), 0)
 
+    def test_get_all_host_states_incremental(self):
+        self.flags(scheduler_incremental_host_states=True,
+                   scheduler_host_states_resync_interval=300)
+        context = 'fake_context'
+        timeutils.set_time_override()
+        first_sync = timeutils.utcnow()
+
+        compute_nodes = [dict(node, service=dict(node['service'],
+                                                 id=node['id']))
+                         for node in fakes.COMPUTE_NODES if node['service']]
+        changed_node = dict(compute_nodes[0], free_ram_mb=256, deleted=0)
+        deleted_node = dict(compute_nodes[3], service=None,
+                            deleted=compute_nodes[3]['id'])
+        # The service of host3 was disabled without its compute node
+        # changing.
+        services = [dict(node['service'], disabled=(node['id'] == 3))
+                    for node in compute_nodes]
+
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        self.mox.StubOutWithMock(db, 'compute_node_get_all_changed_since')
+        self.mox.StubOutWithMock(db, 'service_get_all')
+        db.compute_node_get_all(context).AndReturn(compute_nodes)
+        db.compute_node_get_all_changed_since(context,
+                first_sync).AndReturn([changed_node, deleted_node])
+        db.service_get_all(context).AndReturn(services)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        timeutils.advance_time_seconds(10)
+        self.host_manager.get_all_host_states(context)
+
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(len(host_states_map), 3)
+        self.assertEqual(host_states_map[('host1', 'node1')].free_ram_mb,
+                         256)
+        self.assertNotIn(('host4', 'node4'), host_states_map)
+        self.assertTrue(host_states_map[('host3', 'node3')].service[
+                'disabled'])
+
+    def test_get_all_host_states_incremental_resync(self):
+        self.flags(scheduler_incremental_host_states=True,
+                   scheduler_host_states_resync_interval=300)
+        context = 'fake_context'
+        timeutils.set_time_override()
+
+        running_nodes = [n for n in fakes.COMPUTE_NODES
+                         if n.get('hypervisor_hostname') != 'node4']
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        db.compute_node_get_all(context).AndReturn(running_nodes)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        timeutils.advance_time_seconds(301)
+        self.host_manager.get_all_host_states(context)
+
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(len(host_states_map), 3)
+
+    def test_update_service_capabilities_incremental(self):
+        self.flags(scheduler_incremental_host_states=True)
+        context = 'fake_context'
+
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        self.host_manager.update_service_capabilities('compute', 'host1',
+                {'hypervisor_hostname': 'node1', 'foo': 'bar'})
+
+        host_state = self.host_manager.host_state_map[('host1', 'node1')]
+        self.assertEqual(host_state.capabilities['foo'], 'bar')
+        self.assertEqual(host_state.service['host'], 'host1')
+
 
 class HostStateTestCase(test.TestCase):
     """Test case for HostState class."""
@@ -453,6 +588,39 @@ class HostStateTestCase(test.TestCase):
         self.assertEqual(1, host.num_instances_by_os_type['windoze'])
         self.assertEqual(42, host.num_io_ops)
 
+    def test_stat_consumption_drops_stale_stats(self):
+        compute = dict(memory_mb=0, free_disk_gb=0, local_gb=0,
+                       local_gb_used=0, free_ram_mb=0, vcpus=0, vcpus_used=0,
+                       updated_at=None,
+                       stats=[dict(key='num_proj_12345', value='3')])
+        host = host_manager.HostState("fakehost", "fakenode")
+        host.update_from_compute_node(compute)
+        compute['stats'] = [dict(key='num_proj_23456', value='1')]
+        host.update_from_compute_node(compute)
+
+        self.assertEqual({'23456': 1}, host.num_instances_by_project)
+
+    def test_host_state_has_no_dict(self):
+        host = host_manager.HostState("fakehost", "fakenode")
+        self.assertFalse(hasattr(host, '__dict__'))
+        self.assertRaises(AttributeError, setattr, host, 'foo', 'bar')
+
+    def test_update_capabilities_only_on_change(self):
+        capabilities = {'foo': 'bar'}
+        host = host_manager.HostState("fakehost", "fakenode",
+                                      capabilities=capabilities,
+                                      service={'host': 'fakehost'})
+        old_capabilities = host.capabilities
+        old_service = host.service
+
+        host.update_capabilities(capabilities, {'host': 'fakehost'})
+        self.assertTrue(host.capabilities is old_capabilities)
+        self.assertTrue(host.service is old_service)
+
+        host.update_capabilities({'foo': 'baz'}, {'host': 'fakehost'})
+        self.assertEqual('baz', host.capabilities['foo'])
+        self.assertTrue(host.service is old_service)
+
     def test_stat_consumption_from_instance(self):
         host = host_manager.HostState("fakehost", "fakenode")
 
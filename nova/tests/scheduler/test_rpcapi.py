@@ -86,3 +86,7 @@ class SchedulerRpcAPITestCase(test.TestCase):
                 request_spec='fake_request_spec',
                 filter_properties='fake_prop',
                 version='2.6')
+
+    def test_get_timings(self):
+        self._test_scheduler_api('get_timings', rpc_method='call',
+                version='2.7')
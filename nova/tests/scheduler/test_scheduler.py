@@ -124,6 +124,13 @@ class SchedulerManagerTestCase(test.TestCase):
                 service_name=service_name, host=host,
                 capabilities=[capab1, capab2, capab3])
 
+    def test_get_timings(self):
+        self.mox.StubOutWithMock(self.manager.driver, 'get_timings')
+        self.manager.driver.get_timings().AndReturn('fake_timings')
+        self.mox.ReplayAll()
+        self.assertEqual('fake_timings',
+                         self.manager.get_timings(self.context))
+
     def test_show_host_resources(self):
         host = 'fake_host'
 
@@ -434,6 +441,15 @@ class SchedulerTestCase(test.TestCase):
         result = self.driver.hosts_up(self.context, self.topic)
         self.assertEqual(result, ['host2'])
 
+    def test_group_hosts(self):
+        self.mox.StubOutWithMock(db, 'instance_get_all_hosts_by_group')
+        db.instance_get_all_hosts_by_group(self.context,
+                'cats').AndReturn(['host1', 'host2'])
+
+        self.mox.ReplayAll()
+        result = self.driver.group_hosts(self.context, 'cats')
+        self.assertEqual(result, ['host1', 'host2'])
+
     def _live_migration_instance(self):
         inst_type = flavors.get_instance_type(1)
         # NOTE(danms): we have _got_ to stop doing this!
@@ -101,3 +101,16 @@ class RamWeigherTestCase(test.TestCase):
         weighed_host = self._get_weighed_host(hostinfo_list)
         self.assertEqual(weighed_host.weight, 8192 * 2)
         self.assertEqual(weighed_host.obj.host, 'host4')
+
+    def test_num_best(self):
+        hostinfo_list = list(self._get_all_hosts())
+
+        weighed_hosts = self.weight_handler.get_weighed_objects(
+                self.weight_classes, hostinfo_list, {}, num_best=2)
+        self.assertEqual(['host4', 'host3'],
+                         [x.obj.host for x in weighed_hosts])
+
+        weighed_hosts = self.weight_handler.get_weighed_objects(
+                self.weight_classes, hostinfo_list, {}, num_best=10)
+        self.assertEqual(['host4', 'host3', 'host2', 'host1'],
+                         [x.obj.host for x in weighed_hosts])
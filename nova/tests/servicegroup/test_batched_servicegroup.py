@@ -0,0 +1,109 @@
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+from nova import context
+from nova import db
+from nova.openstack.common.rpc import common as rpc_common
+from nova.openstack.common import timeutils
+from nova import servicegroup
+from nova import test
+
+
+class FakeService(object):
+    def __init__(self, service_ref):
+        self.service_ref = service_ref
+        self.report_interval = 10
+
+
+class BatchedDBServiceGroupTestCase(test.TestCase):
+
+    def setUp(self):
+        super(BatchedDBServiceGroupTestCase, self).setUp()
+        servicegroup.API._driver = None
+        self.addCleanup(setattr, servicegroup.API, '_driver', None)
+        self.flags(servicegroup_driver='batched')
+        self.flags(service_down_time=3)
+        self.flags(heartbeat_flush_interval=60, group='conductor')
+        self.servicegroup_api = servicegroup.API()
+        self._topic = 'unittest'
+        self._ctx = context.get_admin_context()
+        self.reads = 0
+        real_get_all_by_topic = db.service_get_all_by_topic
+
+        def fake_service_get_all_by_topic(context, topic):
+            self.reads += 1
+            return real_get_all_by_topic(context, topic)
+
+        self.stubs.Set(db, 'service_get_all_by_topic',
+                       fake_service_get_all_by_topic)
+
+    def _create_service(self, host, age):
+        service_ref = db.service_create(self._ctx,
+                                        {'host': host,
+                                         'binary': 'nova-fake',
+                                         'topic': self._topic,
+                                         'report_count': 0})
+        updated_at = timeutils.utcnow() - datetime.timedelta(seconds=age)
+        return db.service_update(self._ctx, service_ref['id'],
+                                 {'updated_at': updated_at})
+
+    def test_report_state(self):
+        service_ref = self._create_service('foo', 10)
+        self.servicegroup_api._driver._report_state(FakeService(service_ref))
+        service_ref = db.service_get(self._ctx, service_ref['id'])
+        self.assertEqual(1, service_ref['report_count'])
+        self.assertTrue(self.servicegroup_api.service_is_up(service_ref))
+
+    def test_report_state_conductor_away(self):
+        service = FakeService(self._create_service('foo', 0))
+        driver = self.servicegroup_api._driver
+        timeouts = []
+
+        def fake_service_heartbeat(context, service_ref, timeout=None):
+            timeouts.append(timeout)
+            raise rpc_common.Timeout()
+
+        self.stubs.Set(driver.conductor_api, 'service_heartbeat',
+                       fake_service_heartbeat)
+        driver._report_state(service)
+        self.assertEqual([10], timeouts)
+        self.assertTrue(service.model_disconnected)
+
+        self.stubs.UnsetAll()
+        driver._report_state(service)
+        self.assertFalse(service.model_disconnected)
+
+    def test_get_all_and_is_up(self):
+        up = self._create_service('up', 0)
+        down = self._create_service('down', 10)
+
+        self.assertEqual(['up'], self.servicegroup_api.get_all(self._topic))
+        self.assertTrue(self.servicegroup_api.service_is_up(up))
+        self.assertFalse(self.servicegroup_api.service_is_up(down))
+        # The services of the group were read once.
+        self.assertEqual(1, self.reads)
+
+        # Services which were not read fall back to their heartbeat.
+        new = self._create_service('new', 0)
+        self.assertTrue(self.servicegroup_api.service_is_up(new))
+        self.assertEqual(['up'], self.servicegroup_api.get_all(self._topic))
+        self.assertEqual(1, self.reads)
+
+        # They are read again once the flush interval is over.
+        self.flags(heartbeat_flush_interval=0, group='conductor')
+        self.assertEqual(set(['up', 'new']),
+                         set(self.servicegroup_api.get_all(self._topic)))
+        self.assertEqual(2, self.reads)
@@ -31,9 +31,12 @@ from sqlalchemy import MetaData
 from sqlalchemy.schema import Table
 from sqlalchemy.sql.expression import select
 
+from nova.cells import rpcapi as cells_rpcapi
+from nova.compute import vm_states
 from nova import context
 from nova import db
 from nova.db.sqlalchemy import api as sqlalchemy_api
+from nova.db.sqlalchemy import models
 from nova import exception
 from nova.openstack.common.db.sqlalchemy import session as db_session
 from nova.openstack.common import timeutils
@@ -151,6 +154,59 @@ class DbApiTestCase(DbTestCase):
         check_exc_format(db.get_ec2_instance_id_by_uuid)
         check_exc_format(db.get_instance_uuid_by_ec2_id)
 
+    def test_get_ec2_instance_ids_by_uuids(self):
+        id1 = db.ec2_instance_create(self.context, 'fake-uuid1')['id']
+        id2 = db.ec2_instance_create(self.context, 'fake-uuid2')['id']
+        db.ec2_instance_create(self.context, 'fake-uuid3')
+
+        self.assertEqual({'fake-uuid1': id1, 'fake-uuid2': id2},
+                         db.get_ec2_instance_ids_by_uuids(
+                             self.context,
+                             ['fake-uuid1', 'fake-uuid2', 'fake-uuid4']))
+        self.assertEqual({}, db.get_ec2_instance_ids_by_uuids(self.context,
+                                                              []))
+
+    def test_instance_get_all_by_grantee_security_groups(self):
+        def _create_group(name):
+            return db.security_group_create(self.context,
+                                            {'name': name,
+                                             'project_id': 'fake',
+                                             'user_id': 'fake'})
+
+        grantee1 = _create_group('grantee1')
+        grantee2 = _create_group('grantee2')
+        granting1 = _create_group('granting1')
+        granting2 = _create_group('granting2')
+        other = _create_group('other')
+        db.security_group_rule_create(self.context,
+                                      {'parent_group_id': granting1['id'],
+                                       'group_id': grantee1['id']})
+        db.security_group_rule_create(self.context,
+                                      {'parent_group_id': granting2['id'],
+                                       'group_id': grantee2['id']})
+
+        inst1 = self.create_instances_with_args()
+        inst2 = self.create_instances_with_args()
+        inst3 = self.create_instances_with_args()
+        db.instance_add_security_group(self.context, inst1['uuid'],
+                                       granting1['id'])
+        db.instance_add_security_group(self.context, inst2['uuid'],
+                                       granting1['id'])
+        db.instance_add_security_group(self.context, inst2['uuid'],
+                                       granting2['id'])
+        db.instance_add_security_group(self.context, inst3['uuid'],
+                                       other['id'])
+
+        result = db.instance_get_all_by_grantee_security_groups(
+                self.context, [grantee1['id'], grantee2['id']])
+        self.assertEqual(sorted([inst1['uuid'], inst2['uuid']]),
+                         sorted(set(inst['uuid'] for inst in result)))
+        result = db.instance_get_all_by_grantee_security_groups(
+                self.context, [grantee2['id']])
+        self.assertEqual([inst2['uuid']], [inst['uuid'] for inst in result])
+        self.assertEqual([], db.instance_get_all_by_grantee_security_groups(
+                self.context, []))
+
     def test_instance_get_all_with_meta(self):
         inst = self.create_instances_with_args()
         fake_meta, fake_sys = self.create_metadata_for_instance(inst['uuid'])
@@ -196,6 +252,152 @@ class DbApiTestCase(DbTestCase):
                                                 {'display_name': 't.*st.'})
         self.assertEqual(2, len(result))
 
+    def test_instance_get_all_by_filters_regex_prefix(self):
+        self.create_instances_with_args(display_name='test1')
+        self.create_instances_with_args(display_name='test12')
+        self.create_instances_with_args(display_name='test2')
+        self.create_instances_with_args(display_name='atest1')
+        result = db.instance_get_all_by_filters(self.context,
+                                                {'display_name': '^test1'})
+        self.assertEqual(['test1', 'test12'],
+                         sorted(inst['display_name'] for inst in result))
+        result = db.instance_get_all_by_filters(self.context,
+                                                {'display_name': '^test1$'})
+        self.assertEqual(['test1'],
+                         [inst['display_name'] for inst in result])
+
+    def test_instance_get_all_by_filters_regex_prefix_hyphen(self):
+        for name in ('web-1', 'web-10', 'web10', 'web1x', 'web_1', 'webx1',
+                     'WEB-1'):
+            self.create_instances_with_args(display_name=name)
+        result = db.instance_get_all_by_filters(self.context,
+                                                {'display_name': '^web-1'})
+        self.assertEqual(['web-1', 'web-10'],
+                         sorted(inst['display_name'] for inst in result))
+        result = db.instance_get_all_by_filters(self.context,
+                                                {'display_name': '^web_1'})
+        self.assertEqual(['web_1'],
+                         [inst['display_name'] for inst in result])
+        result = db.instance_get_all_by_filters(self.context,
+                                                {'display_name': '^web-1$'})
+        self.assertEqual(['web-1'],
+                         [inst['display_name'] for inst in result])
+
+    def test_instance_get_all_by_filters_paginate_keyset(self):
+        for i in xrange(4):
+            self.create_instances_with_args(display_name='test%s' % i)
+        all_uuids = [inst['uuid'] for inst in
+                     db.instance_get_all_by_filters(self.context, {},
+                                                    sort_dir='asc')]
+        result = db.instance_get_all_by_filters(self.context, {},
+                                                sort_dir='asc', limit=2)
+        self.assertEqual(all_uuids[:2], [inst['uuid'] for inst in result])
+        marker = db.instance_pagination_marker(result[-1])
+        result = db.instance_get_all_by_filters(self.context, {},
+                                                sort_dir='asc',
+                                                marker=marker)
+        self.assertEqual(all_uuids[2:], [inst['uuid'] for inst in result])
+        result = db.instance_get_all_by_filters(self.context, {},
+                                                sort_dir='asc',
+                                                marker=all_uuids[1])
+        self.assertEqual(all_uuids[2:], [inst['uuid'] for inst in result])
+
+    def test_instance_get_all_by_filters_paginate_bad_keyset(self):
+        instance = self.create_instances_with_args()
+        marker = db.instance_pagination_marker(instance,
+                                               sort_key='display_name')
+        for bad_marker in (marker, marker[:-3], 'asdf', u'\xe9t\xe9'):
+            self.assertRaises(exception.MarkerNotFound,
+                              db.instance_get_all_by_filters,
+                              self.context, {}, marker=bad_marker)
+
+    def test_instance_sync_power_states(self):
+        ctxt = context.get_admin_context()
+        changed = self.create_instances_with_args(power_state=1)
+        unchanged = self.create_instances_with_args(power_state=1)
+        moved = self.create_instances_with_args(power_state=1, host='host2')
+        busy = self.create_instances_with_args(power_state=1,
+                                               task_state='rebooting')
+        power_states = dict((instance['uuid'], 4) for instance in
+                            (changed, moved, busy))
+        power_states[unchanged['uuid']] = 1
+
+        updated_at_top = []
+
+        def fake_instance_update_at_top(_self, context, instance):
+            updated_at_top.append(instance['uuid'])
+
+        self.stubs.Set(cells_rpcapi.CellsAPI, 'instance_update_at_top',
+                       fake_instance_update_at_top)
+
+        result = db.instance_sync_power_states(ctxt, 'host1', power_states)
+        # Only the instances whose power state changed are sent to the top
+        # cell.
+        self.assertEqual([changed['uuid']], updated_at_top)
+        result = dict((new['uuid'], (old, new)) for old, new in result)
+        self.assertEqual(set([changed['uuid'], unchanged['uuid']]),
+                         set(result))
+        old, new = result[changed['uuid']]
+        self.assertEqual((1, 4), (old['power_state'], new['power_state']))
+        self.assertIn('info_cache', new)
+        self.assertIn('system_metadata', new)
+        old, new = result[unchanged['uuid']]
+        self.assertEqual((1, 1), (old['power_state'], new['power_state']))
+
+        for instance, expected in ((changed, 4), (unchanged, 1), (moved, 1),
+                                   (busy, 1)):
+            instance = db.instance_get_by_uuid(ctxt, instance['uuid'])
+            self.assertEqual(expected, instance['power_state'])
+
+    def test_instance_sync_power_states_task_set_meanwhile(self):
+        ctxt = context.get_admin_context()
+        changed = self.create_instances_with_args(power_state=1)
+        busy = self.create_instances_with_args(power_state=1)
+        power_states = {changed['uuid']: 4, busy['uuid']: 4}
+        orig_fill_metadata = sqlalchemy_api._instances_fill_metadata
+
+        def fake_fill_metadata(*args, **kwargs):
+            # sqlite doesn't lock the instances read for update.
+            db.instance_update(ctxt, busy['uuid'],
+                               {'task_state': 'rebooting'})
+            return orig_fill_metadata(*args, **kwargs)
+
+        self.stubs.Set(sqlalchemy_api, '_instances_fill_metadata',
+                       fake_fill_metadata)
+        self.stubs.Set(cells_rpcapi.CellsAPI, 'instance_update_at_top',
+                       lambda *args: None)
+
+        result = db.instance_sync_power_states(ctxt, 'host1', power_states)
+        self.assertEqual([changed['uuid']],
+                         [new['uuid'] for old, new in result])
+        instance = db.instance_get_by_uuid(ctxt, busy['uuid'])
+        self.assertEqual(1, instance['power_state'])
+
+    def test_instance_info_cache_update_many(self):
+        updated = self.create_instances_with_args()
+        deleted = self.create_instances_with_args()
+        missing = self.create_instances_with_args()
+        db.instance_info_cache_delete(self.context, deleted['uuid'])
+        session = db_session.get_session()
+        with session.begin():
+            session.query(models.InstanceInfoCache).\
+                    filter_by(instance_uuid=missing['uuid']).\
+                    delete()
+
+        db.instance_info_cache_update_many(self.context,
+                                           {updated['uuid']: 'updated',
+                                            deleted['uuid']: 'deleted',
+                                            missing['uuid']: 'missing'})
+        info_cache = db.instance_info_cache_get(self.context,
+                                                updated['uuid'])
+        self.assertEqual('updated', info_cache['network_info'])
+        self.assertNotEqual(None, info_cache['updated_at'])
+        self.assertEqual(None, db.instance_info_cache_get(self.context,
+                                                          deleted['uuid']))
+        info_cache = db.instance_info_cache_get(self.context,
+                                                missing['uuid'])
+        self.assertEqual('missing', info_cache['network_info'])
+
     def test_instance_get_all_by_filters_metadata(self):
         self.create_instances_with_args(metadata={'foo': 'bar'})
         self.create_instances_with_args()
@@ -275,6 +477,47 @@ class DbApiTestCase(DbTestCase):
         sysmeta = dict(instance)['system_metadata']
         self.assertEqual(len(sysmeta), 0)
 
+    def test_instance_get_all_hosts_by_group(self):
+        self.create_instances_with_args(system_metadata={'group': 'cats'})
+        self.create_instances_with_args(system_metadata={'group': 'cats'})
+        self.create_instances_with_args(host='host2',
+                                        system_metadata={'group': 'cats'})
+        self.create_instances_with_args(host='host3',
+                                        system_metadata={'group': 'dogs'})
+        self.create_instances_with_args(host='host4')
+        self.create_instances_with_args(host=None,
+                                        system_metadata={'group': 'cats'})
+        deleted = self.create_instances_with_args(host='host5',
+                system_metadata={'group': 'cats'})
+        db.instance_destroy(self.context, deleted['uuid'])
+        self.create_instances_with_args(host='host6',
+                                        vm_state=vm_states.SOFT_DELETED,
+                                        system_metadata={'group': 'cats'})
+
+        elevated = self.context.elevated()
+        hosts = db.instance_get_all_hosts_by_group(elevated, 'cats')
+        self.assertEqual(['host1', 'host2'], sorted(hosts))
+        hosts = db.instance_get_all_hosts_by_group(elevated, 'dogs')
+        self.assertEqual(['host3'], hosts)
+        self.assertEqual([],
+                db.instance_get_all_hosts_by_group(elevated, 'birds'))
+
+    def test_instance_get_all_hosts_by_not_type(self):
+        self.create_instances_with_args(instance_type_id=1)
+        self.create_instances_with_args(host='host2', instance_type_id=1)
+        self.create_instances_with_args(host='host2', instance_type_id=2)
+        self.create_instances_with_args(host='host3', instance_type_id=3)
+        self.create_instances_with_args(host=None, instance_type_id=2)
+        deleted = self.create_instances_with_args(host='host4',
+                                                  instance_type_id=2)
+        db.instance_destroy(self.context, deleted['uuid'])
+
+        elevated = self.context.elevated()
+        hosts = db.instance_get_all_hosts_by_not_type(elevated, 1)
+        self.assertEqual(['host2', 'host3'], sorted(hosts))
+        hosts = db.instance_get_all_hosts_by_not_type(elevated, 2)
+        self.assertEqual(['host1', 'host2', 'host3'], sorted(hosts))
+
     def test_migration_get_unconfirmed_by_dest_compute(self):
         ctxt = context.get_admin_context()
 
@@ -1394,6 +1637,26 @@ class AggregateDBApiTestCase(test.TestCase):
                                                key='good')
         self.assertFalse('good' in r2)
 
+    def test_aggregate_metadata_get_all_by_host(self):
+        ctxt = context.get_admin_context()
+        values = {'name': 'fake_aggregate2'}
+        values2 = {'name': 'fake_aggregate3'}
+        a1 = _create_aggregate_with_hosts(context=ctxt)
+        a2 = _create_aggregate_with_hosts(context=ctxt, values=values,
+                hosts=['foo.openstack.org', 'bar.openstack.org'],
+                metadata={'good': 'value1'})
+        a3 = _create_aggregate_with_hosts(context=ctxt, values=values2,
+                hosts=['bar.openstack.org'], metadata={'good': 'value2'})
+        db.aggregate_host_add(ctxt, a3['id'], 'baz.openstack.org')
+        db.aggregate_delete(ctxt, a3['id'])
+        r1 = db.aggregate_metadata_get_all_by_host(ctxt)
+        self.assertEqual(set(['foo.openstack.org', 'bar.openstack.org']),
+                         set(r1.keys()))
+        self.assertEqual(r1['foo.openstack.org'],
+                db.aggregate_metadata_get_by_host(ctxt, 'foo.openstack.org'))
+        self.assertEqual(r1['bar.openstack.org'],
+                         {'good': set(['value1'])})
+
     def test_aggregate_host_get_by_metadata_key(self):
         ctxt = context.get_admin_context()
         values = {'name': 'fake_aggregate2'}
@@ -1682,6 +1945,50 @@ class CapacityTestCase(test.TestCase):
         self.assertEqual(2, int(stats['num_proj_12345']))
         self.assertEqual(3, int(stats['num_vm_building']))
 
+    def test_compute_node_claim(self):
+        item = self._create_helper('host1')
+        self.assertEqual(0, item['generation'])
+
+        generation = db.compute_node_claim(self.ctxt, item['id'], 0,
+                                           memory_mb=512, disk_gb=20, vcpus=1)
+        self.assertEqual(1, generation)
+        item = db.compute_node_get(self.ctxt, item['id'])
+        self.assertEqual(1, item['generation'])
+        self.assertEqual(512, item['free_ram_mb'])
+        self.assertEqual(512, item['memory_mb_used'])
+        self.assertEqual(2028, item['free_disk_gb'])
+        self.assertEqual(20, item['local_gb_used'])
+        self.assertEqual(1, item['vcpus_used'])
+
+    def test_compute_node_claim_conflict(self):
+        item = self._create_helper('host1')
+        db.compute_node_claim(self.ctxt, item['id'], 0,
+                              memory_mb=512, disk_gb=20, vcpus=1)
+        self.assertRaises(exception.ComputeNodeClaimConflict,
+                          db.compute_node_claim, self.ctxt, item['id'], 0,
+                          memory_mb=512, disk_gb=20, vcpus=1)
+        item = db.compute_node_get(self.ctxt, item['id'])
+        self.assertEqual(1, item['generation'])
+        self.assertEqual(512, item['free_ram_mb'])
+
+    def test_compute_node_get_all_changed_since(self):
+        item = self._create_helper('host1')
+        since = timeutils.utcnow() + datetime.timedelta(seconds=10)
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertEqual(0, len(nodes))
+
+        timeutils.set_time_override(since)
+        self.addCleanup(timeutils.clear_time_override)
+        db.compute_node_update(self.ctxt, item['id'], {'vcpus': 4})
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertEqual(1, len(nodes))
+        self.assertEqual(4, nodes[0]['vcpus'])
+
+        db.compute_node_delete(self.ctxt, item['id'])
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertEqual(1, len(nodes))
+        self.assertTrue(nodes[0]['deleted'])
+
     def test_compute_node_update(self):
         item = self._create_helper('host1')
 
@@ -1879,6 +2186,21 @@ class ServiceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         for key, value in new_values.iteritems():
             self.assertEqual(value, updated_service[key])
 
+    def test_service_update_heartbeats(self):
+        service1 = self._create_service({})
+        service2 = self._create_service({'host': 'fake_host2'})
+        service3 = self._create_service({'host': 'fake_host3'})
+        db.service_destroy(self.ctxt, service3['id'])
+        count = db.service_update_heartbeats(
+            self.ctxt, [service1['id'], service3['id']])
+        self.assertEqual(1, count)
+        service1 = db.service_get(self.ctxt, service1['id'])
+        self.assertEqual(4, service1['report_count'])
+        self.assertNotEqual(None, service1['updated_at'])
+        service2 = db.service_get(self.ctxt, service2['id'])
+        self.assertEqual(3, service2['report_count'])
+        self.assertEqual(None, service2['updated_at'])
+
     def test_service_update_not_found_exception(self):
         self.assertRaises(exception.ServiceNotFound,
                           db.service_update, self.ctxt, 100500, {})
@@ -3688,6 +4010,18 @@ class BlockDeviceMappingTestCase(test.TestCase):
         bmd = db.block_device_mapping_get_all_by_instance(self.ctxt, uuid2)
         self.assertEqual(len(bmd), 2)
 
+        bdms = db.block_device_mapping_get_all_by_instances(self.ctxt,
+                                                            [uuid1, uuid2])
+        self.assertEqual(['first', 'second', 'third'],
+                         sorted(bdm['device_name'] for bdm in bdms))
+        bdms = db.block_device_mapping_get_all_by_instances(self.ctxt,
+                                                            [uuid2])
+        self.assertEqual(['second', 'third'],
+                         sorted(bdm['device_name'] for bdm in bdms))
+        self.assertEqual([],
+                         db.block_device_mapping_get_all_by_instances(
+                             self.ctxt, []))
+
     def test_block_device_mapping_destroy(self):
         bdm = self._create_bdm({})
         db.block_device_mapping_destroy(self.ctxt, bdm['id'])
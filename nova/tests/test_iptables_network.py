@@ -18,6 +18,8 @@
 """Unit Tests for network code."""
 
 from nova.network import linux_net
+from nova.openstack.common import processutils
+from nova.openstack.common import timeutils
 from nova import test
 
 
@@ -253,3 +255,103 @@ class IptablesManagerTestCase(test.TestCase):
                                                self.manager.ipv4['filter'],
                                                'filter')
         self.assertEqual(current_lines, new_lines)
+
+    def _fake_execute(self, *cmd, **kwargs):
+        self.executed.append((cmd, kwargs.get('process_input')))
+        if cmd[0].endswith('-save'):
+            return '\n'.join(self.sample_filter + self.sample_nat), ''
+        if '--noflush' in cmd and self.fail_noflush:
+            raise processutils.ProcessExecutionError()
+        if '-S' in cmd:
+            return '\n'.join(self.forward_rules), ''
+        return '', ''
+
+    def _incremental_manager(self):
+        self.flags(iptables_incremental_apply=True, use_ipv6=False)
+        self.executed = []
+        self.fail_noflush = False
+        self.forward_rules = ['-P FORWARD ACCEPT',
+                              '-A FORWARD -j nova-filter-top',
+                              '-A FORWARD -j %s-FORWARD' % self.binary_name]
+        manager = linux_net.IptablesManager(execute=self._fake_execute)
+        # The first apply saves and restores all the rules.
+        manager._apply()
+        self.assertEqual([('iptables-save', '-c'), ('iptables-restore', '-c')],
+                         [cmd for cmd, _input in self.executed])
+        self.executed = []
+        return manager
+
+    def test_apply_incremental(self):
+        manager = self._incremental_manager()
+        table = manager.ipv4['filter']
+        table.add_chain('inst-1')
+        table.add_rule('inst-1', '-s 1.2.3.4/32 -j ACCEPT')
+        table.add_rule('local', '-d 10.0.0.1 -j $inst-1')
+        manager._apply()
+        self.assertEqual(
+            [(('iptables', '-t', 'filter', '-S', 'FORWARD'), None),
+             (('iptables-restore', '-c', '--noflush'),
+              '*filter\n'
+              ':%(bn)s-inst-1 - [0:0]\n'
+              ':%(bn)s-local - [0:0]\n'
+              '[0:0] -A %(bn)s-inst-1 -s 1.2.3.4/32 -j ACCEPT\n'
+              '[0:0] -A %(bn)s-local -d 10.0.0.1 -j %(bn)s-inst-1\n'
+              'COMMIT\n' % {'bn': self.binary_name})],
+            self.executed)
+
+        # Nothing is restored when no rule changed.
+        self.executed = []
+        manager._apply()
+        self.assertEqual([(('iptables', '-t', 'filter', '-S', 'FORWARD'),
+                           None)],
+                         self.executed)
+
+        self.executed = []
+        table.remove_chain('inst-1')
+        manager._apply()
+        self.assertEqual(
+            [(('iptables', '-t', 'filter', '-S', 'FORWARD'), None),
+             (('iptables-restore', '-c', '--noflush'),
+              '*filter\n'
+              ':%(bn)s-local - [0:0]\n'
+              ':%(bn)s-inst-1 - [0:0]\n'
+              '-X %(bn)s-inst-1\n'
+              'COMMIT\n' % {'bn': self.binary_name})],
+            self.executed)
+
+    def test_apply_incremental_unwrapped_change(self):
+        manager = self._incremental_manager()
+        manager.ipv4['filter'].add_rule('FORWARD', '-j ACCEPT', wrap=False)
+        manager._apply()
+        self.assertEqual([('iptables-save', '-c'), ('iptables-restore', '-c')],
+                         [cmd for cmd, _input in self.executed])
+
+    def test_apply_incremental_drift(self):
+        manager = self._incremental_manager()
+        self.fail_noflush = True
+        manager.ipv4['filter'].add_rule('local', '-j ACCEPT')
+        manager._apply()
+        self.assertEqual([('iptables', '-t', 'filter', '-S', 'FORWARD'),
+                          ('iptables-restore', '-c', '--noflush'),
+                          ('iptables-save', '-c'),
+                          ('iptables-restore', '-c')],
+                         [cmd for cmd, _input in self.executed])
+
+    def test_apply_incremental_flushed(self):
+        manager = self._incremental_manager()
+        # Like after restarting the firewall service.
+        self.forward_rules = ['-P FORWARD ACCEPT']
+        manager._apply()
+        self.assertEqual([('iptables', '-t', 'filter', '-S', 'FORWARD'),
+                          ('iptables-save', '-c'),
+                          ('iptables-restore', '-c')],
+                         [cmd for cmd, _input in self.executed])
+
+    def test_apply_incremental_resync(self):
+        self.useFixture(test.TimeOverride())
+        manager = self._incremental_manager()
+        manager.ipv4['filter'].add_rule('local', '-j ACCEPT')
+        timeutils.advance_time_seconds(301)
+        manager._apply()
+        self.assertEqual([('iptables-save', '-c'), ('iptables-restore', '-c')],
+                         [cmd for cmd, _input in self.executed])
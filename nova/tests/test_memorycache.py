@@ -0,0 +1,96 @@
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the in process memcache client."""
+
+from nova import memorycache
+from nova.openstack.common import timeutils
+from nova import test
+
+
+class MemorycacheTestCase(test.TestCase):
+    def setUp(self):
+        super(MemorycacheTestCase, self).setUp()
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.client = memorycache.get_client()
+
+    def _stats(self):
+        return self.client.get_stats()[0][1]
+
+    def test_get_set(self):
+        self.assertTrue(self.client.set('foo', 'bar'))
+        self.assertEqual('bar', self.client.get('foo'))
+        self.assertEqual(None, self.client.get('baz'))
+        self.client.delete('foo')
+        self.assertEqual(None, self.client.get('foo'))
+        stats = self._stats()
+        self.assertEqual(1, stats['get_hits'])
+        self.assertEqual(2, stats['get_misses'])
+        self.assertEqual(0, stats['curr_items'])
+
+    def test_add_and_incr(self):
+        self.assertTrue(self.client.add('foo', '1'))
+        self.assertFalse(self.client.add('foo', '2'))
+        self.assertEqual(3, self.client.incr('foo', 2))
+        self.assertEqual('3', self.client.get('foo'))
+        self.assertEqual(None, self.client.incr('bar'))
+
+    def test_expiry(self):
+        self.client.set('foo', 'bar', time=10)
+        self.client.set('baz', 'qux')
+        timeutils.advance_time_seconds(9)
+        self.assertEqual('bar', self.client.get('foo'))
+        timeutils.advance_time_seconds(1)
+        self.assertEqual(None, self.client.get('foo'))
+        self.assertEqual('qux', self.client.get('baz'))
+        self.assertEqual(1, self._stats()['curr_items'])
+
+    def test_set_again_moves_expiry(self):
+        self.client.set('foo', 'bar', time=10)
+        timeutils.advance_time_seconds(5)
+        self.client.set('foo', 'bar2', time=10)
+        timeutils.advance_time_seconds(5)
+        self.assertEqual('bar2', self.client.get('foo'))
+        self.client.set('foo', 'bar3')
+        timeutils.advance_time_seconds(100)
+        self.assertEqual('bar3', self.client.get('foo'))
+
+    def test_expiry_heap_is_bounded(self):
+        for i in xrange(1000):
+            self.client.set('foo', i, time=60)
+        self.assertTrue(len(self.client._expiry_heap) < 100)
+        self.assertEqual(999, self.client.get('foo'))
+
+    def test_lru_eviction(self):
+        self.flags(memorycache_max_entries=3)
+        client = memorycache.get_client()
+        for key in ('a', 'b', 'c'):
+            client.set(key, key)
+        self.assertEqual('a', client.get('a'))
+        client.set('d', 'd')
+        self.assertEqual(None, client.get('b'))
+        for key in ('a', 'c', 'd'):
+            self.assertEqual(key, client.get(key))
+        stats = client.get_stats()[0][1]
+        self.assertEqual(1, stats['evictions'])
+        self.assertEqual(3, stats['curr_items'])
+
+    def test_no_limit(self):
+        client = memorycache.Client(max_entries=0)
+        for i in xrange(100):
+            client.set(i, i)
+        self.assertEqual(0, client.get(0))
+        self.assertEqual(0, client.evictions)
@@ -36,6 +36,7 @@ import webob
 from nova.api.metadata import base
 from nova.api.metadata import handler
 from nova.api.metadata import password
+from nova.api.metadata import store
 from nova import block_device
 from nova.compute import flavors
 from nova.conductor import api as conductor_api
@@ -43,6 +44,8 @@ from nova import db
 from nova.db.sqlalchemy import api
 from nova import exception
 from nova.network import api as network_api
+from nova.openstack.common import loopingcall
+from nova.openstack.common import timeutils
 from nova import test
 from nova.tests import fake_network
 from nova import utils
@@ -568,6 +571,78 @@ class MetadataHandlerTestCase(test.TestCase):
         self.assertEqual(response.status_int, 500)
 
 
+class FakeStoredMetadata(object):
+    def __init__(self, instance, conductor_api=None):
+        self.uuid = instance['uuid']
+        self.ip_info = {'fixed_ips': instance['fixed_ips']}
+        self.address = None
+
+
+class MetadataStoreTestCase(test.TestCase):
+    def setUp(self):
+        super(MetadataStoreTestCase, self).setUp()
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.flags(use_local=True, group='conductor')
+        self.stubs.Set(base, 'InstanceMetadata', FakeStoredMetadata)
+        self.instances = {'host1': [{'uuid': 'a', 'fixed_ips': ['10.0.0.1']},
+                                    {'uuid': 'b', 'fixed_ips': []}],
+                          'host2': [{'uuid': 'c', 'fixed_ips': ['10.0.0.3']}]}
+
+        def fake_get_all_by_host(ctxt, host):
+            return self.instances[host]
+
+        self.conductor_api = conductor_api.LocalAPI()
+        self.stubs.Set(self.conductor_api, 'instance_get_all_by_host',
+                       fake_get_all_by_host)
+        self.store = store.MetadataStore(self.conductor_api, 60)
+
+    def test_refresh_host(self):
+        self.assertEqual(2, self.store.refresh_host('host1'))
+        self.assertEqual(1, self.store.refresh_host('host2'))
+        self.assertEqual('a', self.store.get_by_address('10.0.0.1').uuid)
+        self.assertEqual('c', self.store.get_by_address('10.0.0.3').uuid)
+        self.assertEqual(None, self.store.get_by_address('10.0.0.2'))
+        self.assertEqual('a',
+                self.store.get_by_instance_id('a', '10.0.0.1').uuid)
+        self.assertEqual(None,
+                self.store.get_by_instance_id('a', '10.0.0.3'))
+
+    def test_refresh_host_drops_deleted_instances(self):
+        self.store.refresh_host('host1')
+        self.store.refresh_host('host2')
+        self.instances['host1'] = [{'uuid': 'd', 'fixed_ips': ['10.0.0.1']}]
+        self.store.refresh_host('host1')
+        self.assertEqual(2, len(self.store))
+        self.assertEqual('d', self.store.get_by_address('10.0.0.1').uuid)
+        self.assertEqual('c', self.store.get_by_address('10.0.0.3').uuid)
+
+    def test_documents_expire(self):
+        self.store.refresh_host('host1')
+        timeutils.advance_time_seconds(59)
+        self.assertNotEqual(None, self.store.get_by_address('10.0.0.1'))
+        timeutils.advance_time_seconds(1)
+        self.assertEqual(None, self.store.get_by_address('10.0.0.1'))
+        self.assertEqual(1, len(self.store))
+
+    def test_handler_serves_prebuilt_metadata(self):
+        self.flags(metadata_prebuild_hosts=['host1'])
+        self.stubs.Set(loopingcall.FixedIntervalLoopingCall, 'start',
+                       lambda *args, **kwargs: None)
+
+        def fake_get_metadata(*args, **kwargs):
+            raise Exception('metadata should come from the store')
+
+        self.stubs.Set(base, 'get_metadata_by_address', fake_get_metadata)
+        app = handler.MetadataRequestHandler()
+        self.stubs.Set(app._store, 'conductor_api', self.conductor_api)
+        app._refresh_store()
+        meta_data = app.get_metadata_by_remote_address('10.0.0.1')
+        self.assertEqual('a', meta_data.uuid)
+        meta_data = app.get_metadata_by_instance_id('a', '10.0.0.1')
+        self.assertEqual('a', meta_data.uuid)
+
+
 class MetadataPasswordTestCase(test.TestCase):
     def setUp(self):
         super(MetadataPasswordTestCase, self).setUp()
@@ -1328,6 +1328,69 @@ class TestNovaMigrations(BaseMigrationTestCase, CommonTestsMixIn):
         cell = cells.select(cells.c.id == 5).execute().first()
         self.assertEqual(0, cell.deleted)
 
+    def _pre_upgrade_180(self, engine):
+        compute_nodes = db_utils.get_table(engine, 'compute_nodes')
+        data = {'id': 180, 'service_id': 1, 'vcpus': 1, 'memory_mb': 512,
+                'local_gb': 10, 'vcpus_used': 0, 'memory_mb_used': 0,
+                'local_gb_used': 0, 'hypervisor_type': 'fake',
+                'hypervisor_version': 1, 'cpu_info': '', 'deleted': 0}
+        compute_nodes.insert().values(data).execute()
+        return data
+
+    def _check_180(self, engine, data):
+        for table_name in ('compute_nodes', 'shadow_compute_nodes'):
+            table = db_utils.get_table(engine, table_name)
+            self.assertIn('generation', table.c)
+        compute_nodes = db_utils.get_table(engine, 'compute_nodes')
+        node = compute_nodes.select(compute_nodes.c.id == 180).\
+                execute().first()
+        self.assertEqual(0, node.generation)
+
+    def _post_downgrade_180(self, engine):
+        for table_name in ('compute_nodes', 'shadow_compute_nodes'):
+            table = db_utils.get_table(engine, table_name)
+            self.assertNotIn('generation', table.c)
+
+    def _check_181(self, engine, data):
+        sys_meta = db_utils.get_table(engine, 'instance_system_metadata')
+        self.assertIn('instance_system_metadata_key_value_idx',
+                      [idx.name for idx in sys_meta.indexes])
+
+    def _post_downgrade_181(self, engine):
+        sys_meta = db_utils.get_table(engine, 'instance_system_metadata')
+        self.assertNotIn('instance_system_metadata_key_value_idx',
+                         [idx.name for idx in sys_meta.indexes])
+
+    def _check_182(self, engine, data):
+        instances = db_utils.get_table(engine, 'instances')
+        index_names = [idx.name for idx in instances.indexes]
+        for name in ('instances_project_id_deleted_created_at_idx',
+                     'instances_deleted_created_at_idx',
+                     'instances_display_name_idx'):
+            self.assertIn(name, index_names)
+
+    def _post_downgrade_182(self, engine):
+        instances = db_utils.get_table(engine, 'instances')
+        index_names = [idx.name for idx in instances.indexes]
+        for name in ('instances_project_id_deleted_created_at_idx',
+                     'instances_deleted_created_at_idx',
+                     'instances_display_name_idx'):
+            self.assertNotIn(name, index_names)
+
+    def _check_183(self, engine, data):
+        reservations = db_utils.get_table(engine, 'reservations')
+        index_names = [idx.name for idx in reservations.indexes]
+        for name in ('reservations_uuid_idx',
+                     'reservations_deleted_expire_idx'):
+            self.assertIn(name, index_names)
+
+    def _post_downgrade_183(self, engine):
+        reservations = db_utils.get_table(engine, 'reservations')
+        index_names = [idx.name for idx in reservations.indexes]
+        for name in ('reservations_uuid_idx',
+                     'reservations_deleted_expire_idx'):
+            self.assertNotIn(name, index_names)
+
 
 class TestBaremetalMigrations(BaseMigrationTestCase, CommonTestsMixIn):
     """Test sqlalchemy-migrate migrations."""
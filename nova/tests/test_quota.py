@@ -298,6 +298,12 @@ class FakeDriver(object):
     def rollback(self, context, reservations, project_id=None):
         self.called.append(('rollback', context, reservations, project_id))
 
+    def commit_many(self, context, reservation_sets):
+        self.called.append(('commit_many', context, reservation_sets))
+
+    def rollback_many(self, context, reservation_sets):
+        self.called.append(('rollback_many', context, reservation_sets))
+
     def usage_reset(self, context, resources):
         self.called.append(('usage_reset', context, resources))
 
@@ -673,6 +679,31 @@ class QuotaEngineTestCase(test.TestCase):
                 ('rollback', context, ['resv-01', 'resv-02', 'resv-03'], None),
                 ])
 
+    def test_commit_many(self):
+        context = FakeContext(None, None)
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver)
+        quota_obj.commit_many(context, [['resv-01', 'resv-02'], None, [],
+                                        ['resv-03']])
+        quota_obj.commit_many(context, [None, []])
+
+        self.assertEqual(driver.called, [
+                ('commit_many', context, [['resv-01', 'resv-02'],
+                                          ['resv-03']]),
+                ])
+
+    def test_rollback_many(self):
+        context = FakeContext(None, None)
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver)
+        quota_obj.rollback_many(context, [['resv-01', 'resv-02'], None,
+                                          ['resv-03']])
+
+        self.assertEqual(driver.called, [
+                ('rollback_many', context, [['resv-01', 'resv-02'],
+                                            ['resv-03']]),
+                ])
+
     def test_usage_reset(self):
         context = FakeContext(None, None)
         driver = FakeDriver()
@@ -1934,6 +1965,197 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                 ])
 
 
+class AtomicQuotaReserveSqlAlchemyTestCase(test.TestCase):
+    def setUp(self):
+        super(AtomicQuotaReserveSqlAlchemyTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.in_use = dict(instances=1, cores=2)
+
+        def make_sync(res_name):
+            def sync(context, project_id, session):
+                return {res_name: self.in_use[res_name]}
+            return sync
+
+        self.resources = {}
+        for res_name in ('instances', 'cores'):
+            res = quota.ReservableResource(res_name, make_sync(res_name))
+            self.resources[res_name] = res
+        self.quotas = dict(instances=3, cores=-1)
+        self.expire = timeutils.utcnow() + datetime.timedelta(seconds=3600)
+
+    def _reserve(self, **deltas):
+        return db.quota_reserve_atomic(self.context, self.resources,
+                                       self.quotas, deltas, self.expire,
+                                       0, 0, project_id='test_project')
+
+    def _get_usages(self):
+        usages = db.quota_usage_get_all_by_project(self.context,
+                                                   'test_project')
+        del usages['project_id']
+        return usages
+
+    def test_reserve(self):
+        reservations = self._reserve(instances=2, cores=8)
+        self.assertEqual(2, len(reservations))
+        self.assertEqual(dict(instances=dict(in_use=1, reserved=2),
+                              cores=dict(in_use=2, reserved=8)),
+                         self._get_usages())
+        reservation = db.reservation_get(self.context, reservations[0])
+        self.assertEqual('test_project', reservation['project_id'])
+        self.assertEqual(self.expire, reservation['expire'])
+
+    def test_reserve_over_quota(self):
+        self._reserve(instances=1, cores=2)
+        # The reserved cores are not kept when instances go over quota.
+        exc = self.assertRaises(exception.OverQuota, self._reserve,
+                                instances=2, cores=4)
+        self.assertEqual(['instances'], exc.kwargs['overs'])
+        self.assertEqual(dict(instances=dict(in_use=1, reserved=1),
+                              cores=dict(in_use=2, reserved=2)),
+                         exc.kwargs['usages'])
+        self.assertEqual(exc.kwargs['usages'], self._get_usages())
+        self._reserve(instances=1, cores=4)
+
+    def test_reserve_reduction(self):
+        self._reserve(instances=-1)
+        self.assertEqual(dict(instances=dict(in_use=1, reserved=0)),
+                         self._get_usages())
+
+    def test_commit_and_rollback(self):
+        committed = self._reserve(instances=1, cores=2)
+        rolled_back = self._reserve(instances=1, cores=2)
+        reduced = self._reserve(instances=-1, cores=-2)
+
+        db.reservation_commit_atomic(self.context, committed + reduced,
+                                     project_id='test_project')
+        db.reservation_rollback_atomic(self.context, rolled_back,
+                                       project_id='test_project')
+        self.assertEqual(dict(instances=dict(in_use=1, reserved=0),
+                              cores=dict(in_use=2, reserved=0)),
+                         self._get_usages())
+
+        # The reservations are applied only once.
+        db.reservation_commit_atomic(self.context, committed + rolled_back,
+                                     project_id='test_project')
+        db.reservation_rollback_atomic(self.context, committed,
+                                       project_id='test_project')
+        self.assertEqual(dict(instances=dict(in_use=1, reserved=0),
+                              cores=dict(in_use=2, reserved=0)),
+                         self._get_usages())
+
+
+class ReservationManySqlAlchemyTestCase(test.TestCase):
+    def setUp(self):
+        super(ReservationManySqlAlchemyTestCase, self).setUp()
+        self.context = context.get_admin_context()
+
+        def sync(context, project_id, session):
+            return dict(instances=1)
+
+        self.resources = dict(instances=quota.ReservableResource('instances',
+                                                                 sync))
+        self.quotas = dict(instances=-1)
+        self.expire = timeutils.utcnow() + datetime.timedelta(seconds=3600)
+
+    def _reserve(self, project_id, instances):
+        return db.quota_reserve(self.context, self.resources, self.quotas,
+                                dict(instances=instances), self.expire,
+                                0, 0, project_id=project_id)
+
+    def _get_usage(self, project_id):
+        usages = db.quota_usage_get_all_by_project(self.context, project_id)
+        return usages['instances']
+
+    def test_commit_and_rollback_many(self):
+        committed = [self._reserve('project1', 2),
+                     self._reserve('project1', 1),
+                     self._reserve('project2', -1)]
+        rolled_back = [self._reserve('project1', 4),
+                       self._reserve('project2', 8)]
+
+        db.reservation_commit_many(self.context, sum(committed, []))
+        db.reservation_rollback_many(self.context, sum(rolled_back, []))
+        self.assertEqual(dict(in_use=4, reserved=0),
+                         self._get_usage('project1'))
+        self.assertEqual(dict(in_use=0, reserved=0),
+                         self._get_usage('project2'))
+
+        # The reservations are applied only once.
+        db.reservation_rollback_many(self.context,
+                                     sum(committed + rolled_back, []))
+        self.assertEqual(dict(in_use=4, reserved=0),
+                         self._get_usage('project1'))
+
+    def test_reservation_expire(self):
+        self.useFixture(test.TimeOverride())
+        self.expire = timeutils.utcnow() + datetime.timedelta(seconds=3600)
+        expired = self._reserve('project1', 2) + self._reserve('project2', 3)
+        self.expire = timeutils.utcnow() + datetime.timedelta(seconds=7200)
+        kept = self._reserve('project1', 4)
+        timeutils.advance_time_seconds(3601)
+
+        db.reservation_expire(self.context)
+        self.assertEqual(dict(in_use=1, reserved=4),
+                         self._get_usage('project1'))
+        self.assertEqual(dict(in_use=1, reserved=0),
+                         self._get_usage('project2'))
+        for reservation in expired:
+            self.assertRaises(exception.ReservationNotFound,
+                              db.reservation_get, self.context, reservation)
+        db.reservation_get(self.context, kept[0])
+
+
+class AtomicDbQuotaDriverTestCase(test.TestCase):
+    def setUp(self):
+        super(AtomicDbQuotaDriverTestCase, self).setUp()
+        self.driver = quota.AtomicDbQuotaDriver()
+        self.calls = []
+
+        def fake_get_project_quotas(context, resources, project_id,
+                                    quota_class=None, defaults=True,
+                                    usages=True):
+            return dict(instances=dict(limit=10))
+
+        def fake_quota_reserve_atomic(context, resources, quotas, deltas,
+                                      expire, until_refresh, max_age,
+                                      project_id=None):
+            self.calls.append(('quota_reserve_atomic', quotas, deltas,
+                               project_id))
+            return ['resv-1']
+
+        def fake_reservation_commit_atomic(context, reservations,
+                                           project_id=None):
+            self.calls.append(('reservation_commit_atomic', reservations,
+                               project_id))
+
+        def fake_reservation_rollback_atomic(context, reservations,
+                                             project_id=None):
+            self.calls.append(('reservation_rollback_atomic', reservations,
+                               project_id))
+
+        self.stubs.Set(self.driver, 'get_project_quotas',
+                       fake_get_project_quotas)
+        self.stubs.Set(db, 'quota_reserve_atomic', fake_quota_reserve_atomic)
+        self.stubs.Set(db, 'reservation_commit_atomic',
+                       fake_reservation_commit_atomic)
+        self.stubs.Set(db, 'reservation_rollback_atomic',
+                       fake_reservation_rollback_atomic)
+
+    def test_reserve_commit_rollback(self):
+        ctxt = FakeContext('test_project', 'test_class')
+        result = self.driver.reserve(ctxt, quota.QUOTAS._resources,
+                                     dict(instances=2))
+        self.driver.commit(ctxt, result)
+        self.driver.rollback(ctxt, result, project_id='other_project')
+        self.assertEqual(['resv-1'], result)
+        self.assertEqual([
+                ('quota_reserve_atomic', dict(instances=10),
+                 dict(instances=2), 'test_project'),
+                ('reservation_commit_atomic', ['resv-1'], 'test_project'),
+                ('reservation_rollback_atomic', ['resv-1'], 'other_project'),
+                ], self.calls)
+
+
 class NoopQuotaDriverTestCase(test.TestCase):
     def setUp(self):
         super(NoopQuotaDriverTestCase, self).setUp()
@@ -52,3 +52,39 @@ class TimingTest(test.TestCase):
 
     def _fake_log(self, *args):
         self._called = True
+
+
+class TimingsTest(test.TestCase):
+    def test_add(self):
+        timings = timing.Timings()
+        timings.add('foo', 0.0005)
+        timings.add('foo', 0.02)
+        timings.add('foo', 10)
+        timings.add('bar', 0.005)
+
+        stats = timings.get_stats()
+        self.assertEqual(['bar', 'foo'], sorted(stats.keys()))
+        self.assertEqual(3, stats['foo']['count'])
+        self.assertAlmostEqual(10.0205, stats['foo']['total'])
+        self.assertEqual(10, stats['foo']['max'])
+        self.assertEqual([[0.001, 1], [0.005, 0], [0.01, 0], [0.05, 1],
+                          [0.1, 0], [0.5, 0], [1.0, 0], [5.0, 0],
+                          [None, 1]], stats['foo']['histogram'])
+        self.assertEqual([0.005, 1], stats['bar']['histogram'][1])
+
+        timings.reset()
+        self.assertEqual({}, timings.get_stats())
+
+    def test_timemethod(self):
+        class Foo(object):
+            def __init__(self):
+                self.timings = timing.Timings()
+
+            @timing.timemethod('bar')
+            def bar(self, x):
+                return x * 2
+
+        foo = Foo()
+        self.assertEqual(4, foo.bar(2))
+        self.assertRaises(TypeError, foo.bar, None)
+        self.assertEqual(2, foo.timings.get_stats()['bar']['count'])
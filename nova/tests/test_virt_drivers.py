@@ -21,6 +21,7 @@ import sys
 import traceback
 
 from nova.compute import manager
+from nova.compute import power_state
 from nova import exception
 from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
@@ -217,6 +218,19 @@ class _VirtDriverTestCase(_FakeDriverBackendTestCase):
         num_instances = self.connection.get_num_instances()
         self.assertEqual(1, num_instances)
 
+    @catch_notimplementederror
+    def test_get_power_states(self):
+        instance_ref, network_info = self._get_running_instance()
+        missing_ref = dict(instance_ref.iteritems())
+        missing_ref.update(uuid='fake-uuid', name='fake-name')
+        power_states = self.connection.get_power_states([instance_ref,
+                                                         missing_ref])
+        self.assertEqual(
+                {instance_ref['uuid']:
+                    self.connection.get_info(instance_ref)['state'],
+                 'fake-uuid': power_state.NOSTATE},
+                power_states)
+
     @catch_notimplementederror
     def test_snapshot_not_running(self):
         instance_ref = test_utils.get_test_instance()
@@ -387,6 +387,15 @@ class XenAPIVMTestCase(stubs.XenAPITestBase):
         self.assertEqual(len(uuids), len(instance_uuids))
         self.assertEqual(set(uuids), set(instance_uuids))
 
+    def test_get_power_states(self):
+        instances = [self._create_instance(x) for x in xrange(1, 3)]
+        self.conn.power_off(instances[1])
+        missing = self._create_instance(3, spawn=False)
+        self.assertEqual({instances[0]['uuid']: power_state.RUNNING,
+                          instances[1]['uuid']: power_state.SHUTDOWN,
+                          missing['uuid']: power_state.NOSTATE},
+                         self.conn.get_power_states(instances + [missing]))
+
     def test_get_rrd_server(self):
         self.flags(xenapi_connection_url='myscheme://myaddress/')
         server_info = vm_utils._get_rrd_server()
@@ -17,7 +17,10 @@
 
 """Profiling/timing methods."""
 
+import bisect
+import contextlib
 import functools
+import time
 
 from eventlet import corolocal
 
@@ -83,3 +86,71 @@ def timequeries(f):
             del(local.db_method_name)
 
     return inner
+
+
+def timemethod(name):
+    """Decorator that records the time to execute a method in the
+    Timings found in the timings attribute of its object.
+    """
+    def outer(f):
+        @functools.wraps(f)
+        def inner(self, *args, **kwargs):
+            with self.timings.timer(name):
+                return f(self, *args, **kwargs)
+        return inner
+    return outer
+
+
+class Timings(object):
+    """Counters and histograms of the time taken by named operations."""
+
+    # Upper bounds, in seconds, of the histogram buckets.  One more
+    # bucket counts anything slower.
+    buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self._stats = {}
+
+    def add(self, name, secs):
+        """Record that name took secs seconds once more."""
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = {'count': 0, 'total': 0.0, 'max': 0.0,
+                     'histogram': [0] * (len(self.buckets) + 1)}
+            self._stats[name] = stats
+        stats['count'] += 1
+        stats['total'] += secs
+        stats['max'] = max(stats['max'], secs)
+        stats['histogram'][bisect.bisect_left(self.buckets, secs)] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Context manager recording the time taken by its block."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - start)
+
+    def get_stats(self):
+        """Return a copy of the timings made of primitive types.
+
+        Example format::
+
+            {name: {'count': 2, 'total': 0.012, 'max': 0.010,
+                    'histogram': [[0.001, 0], [0.005, 1], ...,
+                                  [5.0, 0], [None, 0]]}}
+
+        where each histogram entry is the upper bound of a bucket in
+        seconds and the number of times that fell in it.
+        """
+        bounds = list(self.buckets) + [None]
+        return dict((name, {'count': stats['count'],
+                            'total': stats['total'],
+                            'max': stats['max'],
+                            'histogram': [list(bucket) for bucket in
+                                          zip(bounds, stats['histogram'])]})
+                    for name, stats in self._stats.iteritems())
+
+    def reset(self):
+        self._stats = {}
@@ -102,6 +102,16 @@ BYTE_MULTIPLIERS = {
 synchronized = lockutils.synchronized_with_prefix('nova-')
 
 
+def synchronized_held(name):
+    """Returns whether a greenthread holds the synchronized lock of name.
+
+    Only the in process semaphore is looked at, and the answer only stays
+    true until the caller yields.
+    """
+    sem = lockutils._semaphores.get(name)
+    return sem is not None and sem.locked()
+
+
 def vpn_ping(address, port, timeout=0.05, session_id=None):
     """Sends a vpn negotiation packet and returns the server session.
 
@@ -26,6 +26,8 @@ import sys
 
 from oslo.config import cfg
 
+from nova.compute import power_state
+from nova import exception
 from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
 from nova import utils
@@ -154,6 +156,28 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_power_states(self, instances):
+        """Return the power states of instances, by instance uuid.
+
+        Instances the hypervisor doesn't know about are given
+        power_state.NOSTATE.
+
+        .. note::
+
+            This implementation works for all drivers, but it is
+            not particularly efficient. Maintainers of the virt drivers are
+            encouraged to override this method with something that lists
+            the states of all the domains at once.
+        """
+        power_states = {}
+        for instance in instances:
+            try:
+                state = self.get_info(instance)['state']
+            except exception.InstanceNotFound:
+                state = power_state.NOSTATE
+            power_states[instance['uuid']] = state
+        return power_states
+
     def get_num_instances(self):
         """Return the total number of virtual machines.
 
@@ -648,6 +648,24 @@ class LibvirtDriver(driver.ComputeDriver):
         """Efficient override of base instance_exists method."""
         return self._conn.numOfDomains()
 
+    def get_power_states(self, instances):
+        """Efficient override of base get_power_states method."""
+        try:
+            domains = self._conn.listAllDomains(0)
+        except (AttributeError, libvirt.libvirtError):
+            # NOTE: listAllDomains() needs libvirt 0.9.13 or later.
+            return super(LibvirtDriver, self).get_power_states(instances)
+        states = {}
+        for domain in domains:
+            try:
+                states[domain.name()] = LIBVIRT_POWER_STATE[domain.info()[0]]
+            except libvirt.libvirtError:
+                # Domain was undefined while listing... ignore it
+                pass
+        return dict((instance['uuid'],
+                     states.get(instance['name'], power_state.NOSTATE))
+                    for instance in instances)
+
     def instance_exists(self, instance_name):
         """Efficient override of base instance_exists method."""
         try:
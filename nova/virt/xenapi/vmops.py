@@ -1479,6 +1479,21 @@ class VMOps(object):
         vm_rec = self._session.call_xenapi("VM.get_record", vm_ref)
         return vm_utils.compile_info(vm_rec)
 
+    def get_power_states(self, instances):
+        """Return the power states of instances, by instance uuid, from
+        the records of all the VMs.
+        """
+        states = {}
+        vm_recs = self._session.call_xenapi('VM.get_all_records')
+        for vm_rec in vm_recs.itervalues():
+            if vm_rec['is_a_template'] or vm_rec['is_control_domain']:
+                continue
+            states[vm_rec['name_label']] = vm_utils.XENAPI_POWER_STATE[
+                    vm_rec['power_state']]
+        return dict((instance['uuid'],
+                     states.get(instance['name'], power_state.NOSTATE))
+                    for instance in instances)
+
     def get_diagnostics(self, instance):
         """Return data about VM diagnostics."""
         vm_ref = self._get_vm_opaque_ref(instance)
@@ -17,7 +17,22 @@
 Pluggable Weighing support
 """
 
+import heapq
+
 from nova import loadables
+from nova import timing
+
+
+def best_weighed_objects(weighed_objs, num_best=None):
+    """Return the num_best highest weighed objects, highest first.
+
+    Objects with equal weights keep their relative order.  If num_best is
+    None, all objects are returned.
+    """
+    key = lambda x: x.weight
+    if num_best is None or num_best >= len(weighed_objs):
+        return sorted(weighed_objs, key=key, reverse=True)
+    return heapq.nlargest(num_best, weighed_objs, key=key)
 
 
 class WeighedObject(object):
@@ -56,16 +71,26 @@ class BaseWeigher(object):
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
+    def __init__(self, loadable_cls_type):
+        super(BaseWeightHandler, self).__init__(loadable_cls_type)
+        # Time taken by each weigher class, by class name.
+        self.timings = timing.Timings()
+
     def get_weighed_objects(self, weigher_classes, obj_list,
-            weighing_properties):
-        """Return a sorted (highest score first) list of WeighedObjects."""
+            weighing_properties, num_best=None):
+        """Return a sorted (highest score first) list of WeighedObjects.
+
+        If num_best is given, only the num_best highest weighed objects
+        are returned and the rest of the list is not sorted.
+        """
 
         if not obj_list:
             return []
 
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
         for weigher_cls in weigher_classes:
-            weigher = weigher_cls()
-            weigher.weigh_objects(weighed_objs, weighing_properties)
+            with self.timings.timer(weigher_cls.__name__):
+                weigher = weigher_cls()
+                weigher.weigh_objects(weighed_objs, weighing_properties)
 
-        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+        return best_weighed_objects(weighed_objs, num_best)
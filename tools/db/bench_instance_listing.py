@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmark of instance_get_all_by_filters() on a synthetic dataset.
+
+Fills the instances table of an empty database with generated instances,
+then times listing pages deep into a project and into all the projects
+with uuid markers and with keyset markers, and filtering on names with
+regexes and with the exact and prefix forms that can use an index.  The
+timings are taken before and after the indexes of migration 182 are
+created.
+
+Run like:
+
+    ./tools/db/bench_instance_listing.py --instances 500000
+    ./tools/db/bench_instance_listing.py \\
+        --connection mysql://root@localhost/nova_bench
+"""
+
+import argparse
+import datetime
+import gettext
+import imp
+import os
+import sys
+import time
+import uuid
+
+possible_topdir = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir, os.pardir, os.pardir))
+if os.path.exists(os.path.join(possible_topdir, 'nova', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+gettext.install('nova', unicode=1)
+
+from oslo.config import cfg
+
+from nova import context
+from nova import db
+from nova.db.sqlalchemy import api as sqlalchemy_api
+from nova.db.sqlalchemy import models
+
+CONF = cfg.CONF
+
+MIGRATION_182 = os.path.join(possible_topdir, 'nova', 'db', 'sqlalchemy',
+                             'migrate_repo', 'versions',
+                             '182_add_listing_indexes_to_instances.py')
+
+
+def fill(engine, num_instances, num_projects, chunk_size=5000):
+    instances = models.Instance.__table__
+    start = datetime.datetime(2013, 1, 1)
+    for first in xrange(0, num_instances, chunk_size):
+        rows = []
+        for i in xrange(first, min(first + chunk_size, num_instances)):
+            rows.append({'uuid': str(uuid.uuid4()),
+                         'project_id': 'project%d' % (i % num_projects),
+                         'user_id': 'user%d' % (i % num_projects),
+                         'display_name': 'server-%07d' % i,
+                         'hostname': 'server-%07d' % i,
+                         'vm_state': 'active',
+                         'created_at': start + datetime.timedelta(seconds=i),
+                         'deleted': 0})
+        engine.execute(instances.insert(), rows)
+
+
+def analyze(engine):
+    """Refresh the statistics the query planner picks indexes with."""
+    if engine.name == 'sqlite':
+        engine.execute('ANALYZE')
+    elif engine.name == 'mysql':
+        engine.execute('ANALYZE TABLE instances')
+    else:
+        engine.execute('ANALYZE instances')
+
+
+def timed(name, func, repeat):
+    best = None
+    for _i in xrange(repeat):
+        start = time.time()
+        result = func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print '  %-44s %8.2f ms  (%d rows)' % (name, best * 1000, len(result))
+    return result
+
+
+def list_page(ctxt, filters, page_size, marker=None):
+    return db.instance_get_all_by_filters(ctxt, dict(filters),
+                                          'created_at', 'desc',
+                                          limit=page_size, marker=marker,
+                                          columns_to_join=[])
+
+
+def run(ctxt, args):
+    for scope, filters in (('project', {'deleted': False,
+                                        'project_id': 'project0'}),
+                           ('all projects', {'deleted': False})):
+        # Walk to the page to time with keyset markers, like a client
+        # following the next links would.
+        marker = None
+        page = []
+        for _i in xrange(args.page):
+            page = list_page(ctxt, filters, args.page_size, marker)
+            if not page:
+                break
+            marker = db.instance_pagination_marker(page[-1])
+        if not page:
+            print '  not enough instances in %s for page %d' % (scope,
+                                                                args.page)
+            continue
+        uuid_marker = page[-1]['uuid']
+        timed('%s page %d, uuid marker' % (scope, args.page),
+              lambda: list_page(ctxt, filters, args.page_size, uuid_marker),
+              args.repeat)
+        timed('%s page %d, keyset marker' % (scope, args.page),
+              lambda: list_page(ctxt, filters, args.page_size, marker),
+              args.repeat)
+
+    name = 'server-%07d' % (args.instances // 2)
+    for label, regex in (('name regex', name[:-2] + '.*'),
+                         ('name prefix', '^' + name[:-2]),
+                         ('name exact', '^%s$' % name)):
+        filters = {'deleted': False, 'display_name': regex}
+        timed('%s %s' % (label, regex),
+              lambda: list_page(ctxt, filters, args.page_size),
+              args.repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--connection',
+                        default='sqlite:////tmp/nova_bench_listing.sqlite',
+                        help='SQLAlchemy url of an empty database')
+    parser.add_argument('--instances', type=int, default=500000)
+    parser.add_argument('--projects', type=int, default=50)
+    parser.add_argument('--page', type=int, default=5,
+                        help='Number of the page to time')
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    CONF.set_override('sql_connection', args.connection)
+    engine = sqlalchemy_api.get_engine()
+    models.BASE.metadata.create_all(engine)
+    ctxt = context.get_admin_context()
+
+    start = time.time()
+    fill(engine, args.instances, args.projects)
+    print 'Filled %d instances in %.1f s' % (args.instances,
+                                             time.time() - start)
+    analyze(engine)
+
+    print 'Without the listing indexes:'
+    run(ctxt, args)
+
+    migration = imp.load_source('migration_182', MIGRATION_182)
+    start = time.time()
+    migration.upgrade(engine)
+    analyze(engine)
+    print 'Created the listing indexes in %.1f s' % (time.time() - start)
+
+    print 'With the listing indexes:'
+    run(ctxt, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Concurrency benchmark of the quota drivers.
+
+Threads of a single project reserve quota for an instance, commit the
+reservation, then reserve and commit its release, like concurrent boots
+and deletes would.  The time taken, the reservations refused for being
+over quota and the database errors (deadlocks, lock timeouts) are
+reported for each driver, and the usages are checked to be back to 0 at
+the end.
+
+Run like:
+
+    ./tools/db/bench_quota_reserve.py --threads 50
+    ./tools/db/bench_quota_reserve.py \\
+        --connection mysql://root@localhost/nova_bench --threads 200
+"""
+
+import argparse
+import collections
+import gettext
+import os
+import sys
+import threading
+import time
+
+possible_topdir = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir, os.pardir, os.pardir))
+if os.path.exists(os.path.join(possible_topdir, 'nova', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+gettext.install('nova', unicode=1)
+
+from oslo.config import cfg
+
+from nova import context
+from nova import db
+from nova.db.sqlalchemy import api as sqlalchemy_api
+from nova.db.sqlalchemy import models
+from nova import exception
+from nova import quota
+
+CONF = cfg.CONF
+
+DRIVERS = ('nova.quota.DbQuotaDriver', 'nova.quota.AtomicDbQuotaDriver')
+
+
+def worker(engine, ctxt, iterations, stats, lock):
+    deltas = dict(instances=1, cores=1, ram=512)
+    release = dict((resource, -delta) for resource, delta in deltas.items())
+    for _i in xrange(iterations):
+        try:
+            reservations = engine.reserve(ctxt, **deltas)
+        except exception.OverQuota:
+            with lock:
+                stats['over quota'] += 1
+            continue
+        except Exception as exc:
+            with lock:
+                stats[exc.__class__.__name__] += 1
+            continue
+        try:
+            engine.commit(ctxt, reservations)
+            engine.commit(ctxt, engine.reserve(ctxt, **release))
+            with lock:
+                stats['boots'] += 1
+        except Exception as exc:
+            with lock:
+                stats[exc.__class__.__name__] += 1
+
+
+def run(driver, ctxt, args):
+    engine = quota.QuotaEngine(quota_driver_class=driver)
+    engine.register_resources(quota.QUOTAS._resources.values())
+    stats = collections.defaultdict(int)
+    lock = threading.Lock()
+    threads = [threading.Thread(target=worker,
+                                args=(engine, ctxt, args.iterations, stats,
+                                      lock))
+               for _i in xrange(args.threads)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    usages = db.quota_usage_get_all_by_project(ctxt, ctxt.project_id)
+    leaked = dict((resource, usage) for resource, usage in usages.items()
+                  if resource != 'project_id' and
+                  (usage['in_use'] or usage['reserved']))
+    print '%s:' % driver
+    print '  %d boots in %.2f s, %.1f boots/s' % (
+        stats['boots'], elapsed, stats['boots'] / elapsed)
+    for name, count in sorted(stats.items()):
+        if name != 'boots':
+            print '  %s: %d' % (name, count)
+    if leaked:
+        print '  usages not back to 0: %s' % leaked
+    db.quota_destroy_all_by_project(context.get_admin_context(),
+                                    ctxt.project_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--connection',
+                        default='sqlite:////tmp/nova_bench_quota.sqlite',
+                        help='SQLAlchemy url of an empty database')
+    parser.add_argument('--threads', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=20,
+                        help='Boots per thread')
+    parser.add_argument('--quota-instances', type=int, default=-1,
+                        help='Instances quota of the project, below the '
+                             'number of threads for over quota refusals')
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    CONF.set_override('sql_connection', args.connection)
+    CONF.set_override('quota_instances', args.quota_instances)
+    CONF.set_override('quota_cores', -1)
+    CONF.set_override('quota_ram', -1)
+    models.BASE.metadata.create_all(sqlalchemy_api.get_engine())
+    ctxt = context.RequestContext('bench', 'bench_project', is_admin=False)
+
+    for driver in DRIVERS:
+        run(driver, ctxt, args)
+
+
+if __name__ == '__main__':
+    main()